@@ -0,0 +1,396 @@
+"""Benchmark suite for the solvers, the puzzle operations and the web view.
+
+Every benchmark runs on a fixed corpus of puzzles, so two runs of this
+module can be compared with each other:
+
+    python benchmark.py --output before.json
+    ... change the code ...
+    python benchmark.py --output after.json --baseline before.json
+
+For every case the median time per call is reported, along with the number
+of states the solver explored and the peak memory allocated during one call.
+The generator cases report how many puzzles of each size are generated per
+minute, against a target of GENERATOR_TARGET.
+Searches which explore more than a fixed budget of states are stopped and
+reported as such, so a slow change cannot make the suite run forever.
+"""
+from solver import solve, hint
+from sudoku_generator import from_line, generate_many
+from sudoku_puzzle import SudokuPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+import urllib.request
+from urllib.parse import quote
+
+# (name, board written by sudoku_generator.to_line)
+SUDOKU_CORPUS = [
+    ('sudoku 4x4', '...AD.B.C....B.D'),
+    ('sudoku 9x9 easy', 'EC..G....F..AIE....IH....F.H...F...CD..H.C..AG...B...F.F....BH....DAI..E....H..GI'),
+    ('sudoku 9x9 medium', '.H.G.D..C..C....E..E...CA...AH.G.B.....D....E.G......H.....AF......B..D....F..HBI'),
+    ('sudoku 9x9 expert', '..G...BD.....AC....EI......CI..E..A....F.........HG.F....E..D..I....A.C.DAH..F...'),
+    ('sudoku 9x9 hardest', 'H..........CF......G..I.B...E...G.......DEG.....A...C...A....FH..HE...A..I....D..'),
+    ('sudoku 16x16', 'N.GKLED.OBH.AI.P.D.E.P.IK...MH.O...O.K.NP......EIC....B.E..L..FK.MN.JDG..AOHI.LCO.HB...KC..'
+                     'IJ..D.LI.HBAODG.JNKM..GJDIC..FMK..O.BD.E..L.CMHF.OBI..HKM..N..I.OP.J..J..OAI.G.DEK.H........F'
+                     'LJC.EDNGGKDN.J..HO.F..PIAPBIF...J.LC.G...E..BIPANK.D..OH.OFH..KGI..B..EJ'),
+    ('sudoku 25x25', '.S.PQXUWYH.GN.R.MKB.VEDLO.R.N..EOVLUYX.WTQFPSA.B.CV..DL.F.TQ....CYHUX..I.JR.WUXHB...MEVD..GJ.N'
+                     'RTFPQSA.K.MN.R.J.TPQSVLE.OY..HW..H..OMAEDL.WX.F.JSGKQCB.FGJSPWL.UXH..N..B.C.EMODAUV.W..Q.....O'
+                     'DA.NH..FJSPG..M.D.J..PQK.B..X.W..H..YKTQ.B.HYI..FS.GE.MOA.LWXVR.Y.IM.B.EV.L.DSFGJ.CTQK.SNG..LV'
+                     '.WU...IX..T.POAM.BWD.LUQ.P..AOME.RIYH.S..FN...QK.YXRIGS.FN.EA.BW.L.DOBAMEJG.SFT.Q.P.UVLDRYHIXQ'
+                     'FPTCYXUHRN.GS.M.BA.LD.WEJIN.SVD.L.XHYR.QC.TFMBAO.M.B..GNIJSPQTCFL.DVE..YR.LEDV..P.Q.BMAO.H.XY.'
+                     'JN.S..UXYRABK...LVWEJSN.I.PTC...CKAIR..GSPFT.D.O..XW.YL.M.EV.SJ.TC.K..XYWULN.IGH.LWUY.C.BAOD..'
+                     'MNG.IHP.F.J.JS.TUWL..R.IGHB..KQD.EVMN.RIGEO.DVWXU..P.SF.B..AQ'),
+]
+
+# (name, start word, target word)
+LADDER_CORPUS = [
+    ('ladder 3 letters', 'cat', 'dog'),
+    ('ladder 4 letters', 'rock', 'taco'),
+    ('ladder 5 letters', 'stone', 'slate'),
+    ('ladder 6 letters', 'marker', 'sanger'),
+    ('ladder 7 letters', 'lockers', 'hoppers'),
+]
+
+# A search which explores more states than this is stopped.
+NODE_BUDGET = 200000
+
+# The port of the WebView server started for the web benchmarks.
+WEB_PORT = 8000
+
+# The names of the web benchmark cases, each a round trip of one action.
+WEB_CASES = ('web: display', 'web: hint')
+
+# (name, n, node bound of every uniqueness check) of the generator benchmarks, as sudoku_generator.py runs them.
+GENERATOR_CASES = [
+    ('generate 9x9', 9, None),
+    ('generate 16x16', 16, 32),
+    ('generate 25x25', 25, 50),
+]
+# The number of puzzles each generator benchmark generates, and the number it should generate per minute.
+GENERATOR_COUNT = 5
+GENERATOR_TARGET = 1000
+
+# The time, in seconds, in which a fresh interpreter running controller.py should show its first prompt.
+STARTUP_TARGET = 0.1
+# The first prompt of controller.py.
+FIRST_PROMPT = b'Do you want to play'
+
+
+class _BudgetExceeded(Exception):
+    """Raised by a _NodeCounter to stop a search which explored too many states."""
+    pass
+
+
+class _NodeCounter:
+    """Solver listener counting the states explored, which stops the search after <budget> states."""
+    # === Public attributes ===
+    # @type nodes: int
+    #     The number of states explored so far.
+    # === Private attributes ===
+    # @type _budget: int | None
+    #     The number of states after which the search is stopped, or None for no limit.
+    def __init__(self, budget=None):
+        """Create a new counter.
+
+        @type self: _NodeCounter
+        @type budget: int | None
+        @rtype: None
+        """
+        self.nodes = 0
+        self._budget = budget
+
+    def __call__(self, event, state, depth):
+        """Count an explored state.
+
+        @type self: _NodeCounter
+        @type event: str
+        @type state: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if event == 'expand':
+            self.nodes += 1
+            if self._budget is not None and self.nodes > self._budget:
+                raise _BudgetExceeded()
+
+
+def _first_move(puzzle):
+    """Return a valid move for <puzzle>, written the way a player would enter it.
+
+    @type puzzle: Puzzle
+    @rtype: str
+    """
+    return puzzle.generate_strings(puzzle.extensions()[0])
+
+
+def _puzzle_cases():
+    """Return the benchmark cases of the puzzle operations and solvers.
+
+    Every case is a tuple (name, function), where the function takes a solver
+    listener, or None if the case does not run a search.
+
+    @rtype: list[(str, (str, Puzzle, int) -> None | None) -> object)]
+    """
+    cases = []
+    for name, line in SUDOKU_CORPUS:
+        puzzle = SudokuPuzzle(from_line(line))
+        move = _first_move(puzzle)
+        cases.extend([
+            (name + ': extensions', lambda listener, p=puzzle: p.extensions()),
+            (name + ': is_solved', lambda listener, p=puzzle: p.is_solved()),
+            (name + ': move', lambda listener, p=puzzle, m=move: p.move(m)),
+            (name + ': hint', lambda listener, p=puzzle: hint(p, listener)),
+            (name + ': solve', lambda listener, p=puzzle: solve(p, listener=listener)),
+        ])
+    for name, start, target in LADDER_CORPUS:
+        puzzle = WordLadderPuzzle(start, target)
+        move = _first_move(puzzle)
+        cases.extend([
+            (name + ': extensions', lambda listener, p=puzzle: p.extensions()),
+            (name + ': is_solved', lambda listener, p=puzzle: p.is_solved()),
+            (name + ': move', lambda listener, p=puzzle, m=move: p.move(m)),
+            (name + ': hint', lambda listener, p=puzzle: hint(p, listener)),
+            (name + ': solve', lambda listener, p=puzzle: solve(p, listener=listener)),
+        ])
+    return cases
+
+
+def _web_cases():
+    """Return the benchmark cases of the web view, or an empty list if its server cannot be started.
+
+    A WebView server for the 4x4 Sudoku of the corpus is started in the
+    background. Every case is a round trip of one action over HTTP.
+
+    @rtype: list[(str, (str, Puzzle, int) -> None | None) -> object)]
+    """
+    # Imported here so that the controller's dependencies are only loaded for the web benchmarks.
+    from controller import Controller
+
+    puzzle = SudokuPuzzle(from_line(SUDOKU_CORPUS[0][1]))
+    server = threading.Thread(target=Controller, args=(puzzle, 'web'), daemon=True)
+    server.start()
+    url = 'http://localhost:' + str(WEB_PORT) + '/actions?action='
+    for _ in range(50):
+        try:
+            urllib.request.urlopen(url + ':DISPLAY').read()
+            break
+        except OSError:
+            time.sleep(0.1)
+    else:
+        return []
+    if not server.is_alive():
+        # Something else is listening on the port.
+        return []
+
+    def request(action):
+        return urllib.request.urlopen(url + quote(action)).read()
+
+    actions = {'web: display': ':DISPLAY', 'web: hint': ':HINT'}
+    return [(name, lambda listener, action=actions[name]: request(action)) for name in WEB_CASES]
+
+
+def measure(func, repeat):
+    """Return the measurements of one benchmark case.
+
+    The result contains the median time per call in seconds, the number of
+    states explored during one call and the rate at which they were explored,
+    and the peak memory allocated during one call in bytes. If the call
+    explores more than NODE_BUDGET states, it is stopped and only the time
+    of that one call is reported.
+
+    @type func: ((str, Puzzle, int) -> None | None) -> object
+    @type repeat: int
+    @rtype: dict
+    """
+    counter = _NodeCounter(NODE_BUDGET)
+    start = time.perf_counter()
+    try:
+        func(counter)
+    except _BudgetExceeded:
+        return {'status': 'budget exceeded', 'median': time.perf_counter() - start, 'nodes': counter.nodes}
+
+    timer = timeit.Timer(lambda: func(None))
+    number, _ = timer.autorange()
+    samples = [total / number for total in timer.repeat(repeat, number)]
+    median = statistics.median(samples)
+
+    tracemalloc.start()
+    func(None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {'status': 'ok', 'median': median, 'runs': repeat * number, 'peak_memory': peak}
+    if counter.nodes > 0:
+        result['nodes'] = counter.nodes
+        result['nodes_per_second'] = counter.nodes / median if median > 0 else None
+    return result
+
+
+def measure_startup(repeat):
+    """Return the measurements of the time controller.py takes to show its first prompt.
+
+    Every sample starts a fresh interpreter, as a short-lived grading job
+    does. The result contains the median time in seconds and whether it is
+    within STARTUP_TARGET.
+
+    @type repeat: int
+    @rtype: dict
+    """
+    samples = []
+    for _ in range(max(repeat, 5)):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, 'controller.py'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+        output = b''
+        while FIRST_PROMPT not in output:
+            chunk = process.stdout.read1(1024)
+            if not chunk:
+                break
+            output += chunk
+        samples.append(time.perf_counter() - start)
+        process.kill()
+        process.wait()
+        process.stdout.close()
+        process.stdin.close()
+        if FIRST_PROMPT not in output:
+            return {'status': 'no prompt', 'median': samples[-1]}
+    median = statistics.median(samples)
+    return {'status': 'ok' if median <= STARTUP_TARGET else 'over target', 'median': median, 'runs': len(samples),
+            'target': STARTUP_TARGET}
+
+
+def measure_generation(n, max_nodes, repeat):
+    """Return the measurements of the Sudoku generator on n-by-n boards.
+
+    Every sample generates GENERATOR_COUNT puzzles from a fixed seed. The
+    result contains the median time per puzzle in seconds, the puzzles
+    generated per minute and whether that is within GENERATOR_TARGET.
+
+    @type n: int
+    @type max_nodes: int | None
+    @type repeat: int
+    @rtype: dict
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in generate_many(n, GENERATOR_COUNT, 0, max_nodes):
+            pass
+        samples.append((time.perf_counter() - start) / GENERATOR_COUNT)
+    median = statistics.median(samples)
+    per_minute = 60 / median if median > 0 else None
+    return {'status': 'ok' if per_minute is None or per_minute >= GENERATOR_TARGET else 'under target',
+            'median': median, 'runs': repeat * GENERATOR_COUNT, 'per_minute': per_minute, 'target': GENERATOR_TARGET}
+
+
+def run(repeat=3, only=None, web=True):
+    """Run the benchmarks and return their results.
+
+    Only the cases whose name contains <only> are run, if given.
+
+    @type repeat: int
+    @type only: str | None
+    @type web: bool
+    @rtype: dict
+    """
+    cases = _puzzle_cases()
+    # The web server is only started if a web case is to be run.
+    if web and (only is None or any(only in name for name in WEB_CASES)):
+        # The server logs every request; keep that out of the report.
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            cases.extend(_web_cases())
+    results = {}
+    if only is None or only in 'startup: first prompt':
+        results['startup: first prompt'] = measure_startup(repeat)
+        print(_format_line('startup: first prompt', results['startup: first prompt']))
+    for name, n, max_nodes in GENERATOR_CASES:
+        if only is None or only in name:
+            results[name] = measure_generation(n, max_nodes, repeat)
+            print(_format_line(name, results[name]))
+    for name, func in cases:
+        if only is None or only in name:
+            if web and name.startswith('web'):
+                with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                    results[name] = measure(func, repeat)
+            else:
+                results[name] = measure(func, repeat)
+            print(_format_line(name, results[name]))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'node_budget': NODE_BUDGET,
+        'results': results,
+    }
+
+
+def _format_line(name, result, baseline=None):
+    """Return one line of the report for the benchmark <name>.
+
+    @type name: str
+    @type result: dict
+    @type baseline: dict | None
+    @rtype: str
+    """
+    line = '{:<36} {:>12.6f}s'.format(name, result['median'])
+    if 'nodes_per_second' in result and result['nodes_per_second'] is not None:
+        line += ' {:>12.0f} nodes/s'.format(result['nodes_per_second'])
+    elif result.get('per_minute') is not None:
+        line += ' {:>11.0f} puzzles/min'.format(result['per_minute'])
+    else:
+        line += ' ' * 21
+    if 'peak_memory' in result:
+        line += ' {:>10.1f} KiB'.format(result['peak_memory'] / 1024)
+    if result['status'] != 'ok':
+        line += '  (' + result['status'] + ')'
+    if baseline is not None and baseline.get('status') == 'ok' and result['status'] == 'ok':
+        line += '  x{:.2f} vs baseline'.format(baseline['median'] / result['median'])
+    return line
+
+
+def compare(report, baseline):
+    """Print every result of <report> next to its speed-up over the same case in <baseline>.
+
+    @type report: dict
+    @type baseline: dict
+    @rtype: None
+    """
+    print('\nCompared to the baseline (higher is faster):')
+    for name, result in report['results'].items():
+        print(_format_line(name, result, baseline['results'].get(name)))
+
+
+def main():
+    """Run the benchmarks from the command line.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the puzzle solvers and operations.')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed samples per case')
+    parser.add_argument('--only', help='only run the cases whose name contains this text')
+    parser.add_argument('--no-web', action='store_true', help='skip the web view benchmarks')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results saved in this JSON file')
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.only, not args.no_web)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
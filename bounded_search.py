@@ -0,0 +1,423 @@
+"""Breadth-first searches whose memory use is bounded.
+
+solve_in_breadth keeps every state of the frontier in memory, as a full
+puzzle object. The searches here keep less:
+
+- solve_spilled holds at most <max_states> states of a layer in memory, as
+  their positions and keys, and writes the rest to temporary files, sorted
+  and compressed, from which they are streamed back one at a time. Duplicate
+  positions are dropped by merging the sorted files rather than by keeping
+  sets of positions. It finds a shortest solution, like solve_breadth.
+- solve_beam only keeps the <width> states of every layer which look closest
+  to a solution (see Puzzle.estimate), so its memory use does not grow with
+  the depth at all. It may miss a solution, or find a longer one.
+
+Both skip states whose position (see Puzzle.position) was already reached in
+the previous, current or next layer. This finds every duplicate as long as
+every move can be undone, or every move leads one layer deeper, which is the
+case for every puzzle in the game, without keeping the positions of the
+whole search.
+
+Both return the solution found, or None, and a report of the memory used:
+the most states and positions held in memory at once, the states and bytes
+written to disk and, while tracemalloc is tracing, the peak memory the search allocated.
+"""
+from puzzle import puzzle_type
+import gzip
+import heapq
+import tempfile
+import tracemalloc
+
+# The default number of states of a layer solve_spilled holds in memory.
+MAX_STATES = 10000
+
+# The default number of states of a layer solve_beam keeps.
+BEAM_WIDTH = 100
+
+
+class _Layer:
+    """One layer of a breadth-first search: (position, key) records sorted by position, with no position twice.
+
+    A small layer is held in memory; a larger one is written to a temporary
+    file, compressed, and streamed back one record at a time.
+    """
+    # === Private attributes ===
+    # @type _records: list[(str, str)] | None
+    #     The records, if the layer is held in memory.
+    # @type _file: file | None
+    #     The temporary file holding the records otherwise.
+    # === Public attributes ===
+    # @type size: int
+    #     The number of records in the layer.
+    # @type spilled_bytes: int
+    #     The number of bytes written to the file.
+    def __init__(self, records, in_memory):
+        """Create a layer of the sorted <records>, held in memory if <in_memory> is True and in a file otherwise.
+
+        @type self: _Layer
+        @type records: iterable[(str, str)]
+        @type in_memory: bool
+        @rtype: None
+        """
+        if in_memory:
+            self._records = list(records)
+            self._file = None
+            self.size = len(self._records)
+            self.spilled_bytes = 0
+        else:
+            self._records = None
+            self._file, self.size = _write_records(records)
+            self.spilled_bytes = self._file.tell()
+
+    def in_memory(self):
+        """Return the number of records of the layer held in memory.
+
+        @type self: _Layer
+        @rtype: int
+        """
+        return len(self._records) if self._records is not None else 0
+
+    def __iter__(self):
+        """Yield the records of the layer, in order of position.
+
+        @type self: _Layer
+        @rtype: iterator[(str, str)]
+        """
+        if self._records is not None:
+            return iter(self._records)
+        return _read_records(self._file)
+
+    def close(self):
+        """Delete the file of the layer, if any.
+
+        @type self: _Layer
+        @rtype: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _LayerBuilder:
+    """The states reached from one layer, collected as records and written to disk in sorted runs of <max_states>."""
+    # === Private attributes ===
+    # @type _max_states: int
+    #     The number of records held in memory before they are sorted and written out as a run.
+    # @type _buffer: list[(str, str)]
+    #     The records added since the last run was written.
+    # @type _runs: list[file]
+    #     The temporary files of the runs written so far, each sorted by position with no position twice.
+    # === Public attributes ===
+    # @type spilled: int
+    #     The number of records written to runs.
+    # @type spilled_bytes: int
+    #     The number of bytes written to runs.
+    def __init__(self, max_states):
+        """Create an empty layer builder.
+
+        @type self: _LayerBuilder
+        @type max_states: int
+        @rtype: None
+        """
+        self._max_states = max_states
+        self._buffer = []
+        self._runs = []
+        self.spilled = 0
+        self.spilled_bytes = 0
+
+    def in_memory(self):
+        """Return the number of records held in memory.
+
+        @type self: _LayerBuilder
+        @rtype: int
+        """
+        return len(self._buffer)
+
+    def add(self, position, key):
+        """Add the state with the given position and key, writing out a run once enough records are held.
+
+        @type self: _LayerBuilder
+        @type position: str
+        @type key: str
+        @rtype: None
+        """
+        self._buffer.append((position, key))
+        if len(self._buffer) >= self._max_states:
+            self._buffer.sort()
+            run, count = _write_records(_unique(self._buffer))
+            self._buffer = []
+            self._runs.append(run)
+            self.spilled += count
+            self.spilled_bytes += run.tell()
+
+    def finish(self, previous, current):
+        """Return the layer of the records added, without duplicates or the positions of <previous> or <current>.
+
+        The runs are merged, so the layer is held in memory only if no run was
+        written out.
+
+        @type self: _LayerBuilder
+        @type previous: _Layer
+        @type current: _Layer
+        @rtype: _Layer
+        """
+        self._buffer.sort()
+        records = heapq.merge(self._buffer, *[_read_records(run) for run in self._runs])
+        layer = _Layer(_without(_unique(records), [previous, current]), not self._runs)
+        self._buffer = []
+        return layer
+
+    def close(self):
+        """Delete the files of the runs.
+
+        @type self: _LayerBuilder
+        @rtype: None
+        """
+        for run in self._runs:
+            run.close()
+        self._runs = []
+
+
+def _write_records(records):
+    """Write <records> to a new temporary file, compressed, and return the file and the number of records written.
+
+    Every record takes two lines, its position and its key.
+
+    @type records: iterable[(str, str)]
+    @rtype: (file, int)
+    """
+    file = tempfile.TemporaryFile()
+    count = 0
+    with gzip.GzipFile(fileobj=file, mode='wb', compresslevel=1) as writer:
+        for position, key in records:
+            writer.write(position.encode('utf-8') + b'\n' + key.encode('utf-8') + b'\n')
+            count += 1
+    return file, count
+
+
+def _read_records(file):
+    """Yield the records written to <file> by _write_records.
+
+    @type file: file
+    @rtype: iterator[(str, str)]
+    """
+    file.seek(0)
+    with gzip.GzipFile(fileobj=file, mode='rb') as reader:
+        for position in reader:
+            yield position[:-1].decode('utf-8'), reader.readline()[:-1].decode('utf-8')
+
+
+def _unique(records):
+    """Yield the first record of every position of <records>, which are sorted by position.
+
+    @type records: iterable[(str, str)]
+    @rtype: iterator[(str, str)]
+
+    >>> list(_unique([('a', '1'), ('a', '2'), ('b', '3')]))
+    [('a', '1'), ('b', '3')]
+    """
+    last = None
+    for record in records:
+        if record[0] != last:
+            last = record[0]
+            yield record
+
+
+def _without(records, layers):
+    """Yield the records whose position is in none of <layers>, all sorted by position, by merging them.
+
+    @type records: iterable[(str, str)]
+    @type layers: list[_Layer]
+    @rtype: iterator[(str, str)]
+
+    >>> list(_without([('a', '1'), ('b', '2'), ('c', '3')], [_Layer([('b', '4')], True), _Layer([], True)]))
+    [('a', '1'), ('c', '3')]
+    """
+    others = [iter(layer) for layer in layers]
+    heads = [next(other, None) for other in others]
+    for record in records:
+        seen = False
+        for i, other in enumerate(others):
+            while heads[i] is not None and heads[i][0] < record[0]:
+                heads[i] = next(other, None)
+            if heads[i] is not None and heads[i][0] == record[0]:
+                seen = True
+        if not seen:
+            yield record
+
+
+def solve_spilled(puzzle, max_states=MAX_STATES, listener=None):
+    """Return a shortest solution of the puzzle and a report, by a breadth-first search spilling layers to disk.
+
+    Every state is kept as a record of its position and key. The states
+    reached from a layer are collected in memory and, every <max_states> of
+    them, sorted and written to a temporary file as a run. Once the layer is
+    expanded, the runs are merged, dropping duplicate positions and those of
+    the two layers before, into the next layer. So at most <max_states>
+    records of each of the previous, current and next layer are held in
+    memory, 3 * <max_states> in all, and the report's 'peak_states' and
+    'peak_positions' count them.
+
+    @type puzzle: Puzzle
+    @type max_states: int
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name ('expand' or 'solution'), the state and its depth as the search runs.
+    @rtype: (Puzzle | None, dict)
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> solution, report = solve_spilled(WordLadderPuzzle('cat', 'dog'), max_states=10)
+    >>> solution.used_words()
+    ('cat', 'cot', 'cog', 'dog')
+    >>> report['peak_states'] <= 3 * 10, report['spilled_states'] > 0
+    (True, True)
+    >>> solve_spilled(WordLadderPuzzle('cat', 'dog'))[1]['spilled_states']
+    0
+    """
+    report = _start_report()
+    puzzle_class = puzzle_type(puzzle).puzzle_class
+    if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, 0)
+        return puzzle, _finish_report(report)
+    previous = _Layer([], True)
+    layer = _Layer([(puzzle.position(), puzzle.key())], True)
+    depth = 0
+    try:
+        while layer.size > 0:
+            builder = _LayerBuilder(max_states)
+            try:
+                for _, key in layer:
+                    state = puzzle_class.from_key(key)
+                    report['expanded'] += 1
+                    if listener is not None:
+                        listener('expand', state, depth)
+                    for extension in state.iter_extensions():
+                        if extension.is_solved():
+                            if listener is not None:
+                                listener('solution', extension, depth + 1)
+                            return extension, _finish_report(report)
+                        builder.add(extension.position(), extension.key())
+                        held = previous.in_memory() + layer.in_memory() + builder.in_memory()
+                        report['peak_states'] = max(report['peak_states'], held)
+                next_layer = builder.finish(previous, layer)
+            finally:
+                builder.close()
+            report['peak_positions'] = report['peak_states']
+            report['spilled_states'] += builder.spilled + (next_layer.size if next_layer.spilled_bytes else 0)
+            report['spilled_bytes'] += builder.spilled_bytes + next_layer.spilled_bytes
+            previous.close()
+            previous, layer = layer, next_layer
+            depth += 1
+        return None, _finish_report(report)
+    finally:
+        previous.close()
+        layer.close()
+
+
+def solve_beam(puzzle, width=BEAM_WIDTH, listener=None):
+    """Return a solution of the puzzle and a report, by a beam search keeping <width> states of every layer.
+
+    The states kept are those with the lowest estimate. The solution found
+    need not be a shortest one, and None is returned if every state which
+    leads to a solution was dropped.
+
+    @type puzzle: Puzzle
+    @type width: int
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name ('expand' or 'solution'), the state and its depth as the search runs.
+    @rtype: (Puzzle | None, dict)
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> solution, report = solve_beam(WordLadderPuzzle('cat', 'dog'), width=5)
+    >>> solution.used_words()
+    ('cat', 'cot', 'cog', 'dog')
+    >>> report['peak_states'] <= 5 * 2 + 1
+    True
+    """
+    report = _start_report()
+    if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, 0)
+        return puzzle, _finish_report(report)
+    layer = [puzzle]
+    previous, current = set(), {puzzle.position()}
+    depth = 0
+    found = []
+    while layer:
+        following = set()
+        candidates = _beam_candidates(layer, depth, previous, current, following, found, report, listener)
+        # nsmallest only holds <width> states at a time, however many candidates there are.
+        next_layer = heapq.nsmallest(width, candidates, key=lambda state: state.estimate())
+        if found:
+            if listener is not None:
+                listener('solution', found[0], depth + 1)
+            return found[0], _finish_report(report)
+        report['peak_states'] = max(report['peak_states'], len(layer) + len(next_layer))
+        layer = next_layer
+        previous, current = current, {state.position() for state in layer}
+        report['peak_positions'] = max(report['peak_positions'], len(previous) + len(current) + len(following))
+        depth += 1
+    return None, _finish_report(report)
+
+
+def _beam_candidates(layer, depth, previous, current, following, found, report, listener):
+    """Yield the new states reached from <layer>, stopping at the first solution, which is added to <found>.
+
+    The positions of the states yielded are added to <following>.
+
+    @type layer: list[Puzzle]
+    @type depth: int
+    @type previous: set[str]
+    @type current: set[str]
+    @type following: set[str]
+    @type found: list[Puzzle]
+    @type report: dict
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: iterator[Puzzle]
+    """
+    for state in layer:
+        report['expanded'] += 1
+        if listener is not None:
+            listener('expand', state, depth)
+        for extension in state.iter_extensions():
+            position = extension.position()
+            if position in previous or position in current or position in following:
+                continue
+            if extension.is_solved():
+                found.append(extension)
+                return
+            following.add(position)
+            yield extension
+
+
+def _start_report():
+    """Return a new, empty report of a search, and start measuring the peak memory if tracemalloc is tracing.
+
+    Until the search ends, 'peak_memory' holds the memory allocated before it started.
+
+    @rtype: dict
+    """
+    before = None
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    return {'expanded': 0, 'peak_states': 1, 'peak_positions': 1, 'spilled_states': 0, 'spilled_bytes': 0,
+            'peak_memory': before}
+
+
+def _finish_report(report):
+    """Complete <report> with the peak memory allocated by the search, if tracemalloc is tracing, and return it.
+
+    @type report: dict
+    @rtype: dict
+    """
+    if report['peak_memory'] is not None and tracemalloc.is_tracing():
+        report['peak_memory'] = tracemalloc.get_traced_memory()[1] - report['peak_memory']
+    else:
+        report['peak_memory'] = None
+    return report
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
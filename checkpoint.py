@@ -0,0 +1,422 @@
+"""Searches for every solution which save checkpoints and can be resumed.
+
+solve_all_checkpointed finds the same solutions, in the same order, as
+solve_all, but keeps its search on an explicit stack rather than the Python
+call stack, so the search can be saved at any step. Every <interval> seconds
+it writes that stack to a checkpoint file; every solution is appended to a
+second file, <path>.solutions, as soon as it is found. If the process is
+stopped, the search started again with the same checkpoint file, or with
+resume, goes on from the last checkpoint instead of from the start. Only the
+work done since that checkpoint is repeated.
+
+What the stack holds depends on the solve-all strategy of the puzzle type:
+
+- 'complete' (Sudoku): the key of every state on the current path, and the
+  number of its extensions explored so far. iter_extensions always gives the
+  extensions of a state in the same order, so on resume those are skipped.
+- 'shortest ladders' (word and edit ladders): the graph of the words on a
+  shortest ladder (see solver.shortest_ladder_graph), which is built once and
+  saved with the checkpoint, and the words of the ladder being read off it,
+  with the number of following words tried so far.
+
+A checkpoint is written as JSON to a temporary file, which then replaces the
+old checkpoint, so a crash never leaves a half-written one. A finished search
+leaves a checkpoint with an empty stack, from which resume returns the
+solutions without searching.
+
+    python checkpoint.py run board.ckpt --sudoku GRID --interval 60
+    python checkpoint.py resume board.ckpt
+
+On SIGINT or SIGTERM the command line saves a checkpoint and exits, so a
+batch job can be pre-empted and rescheduled.
+"""
+from puzzle import puzzle_type
+from session_store import puzzle_key, puzzle_from_key
+from solver import shortest_ladder_graph
+import argparse
+import json
+import os
+import signal
+import time
+
+# The default number of seconds between two checkpoints.
+INTERVAL = 60.0
+
+# The version of the checkpoint file format.
+_VERSION = 1
+
+
+class _Checkpoint:
+    """The checkpoint file of one search and the solutions it found.
+
+    === Public attributes ===
+    @type solutions: list[Puzzle]
+        The solutions found so far, including those found before the search was resumed.
+    @type stopped: bool
+        Whether the search was asked to stop.
+    """
+    # === Private attributes ===
+    # @type _path: str
+    #     The checkpoint file.
+    # @type _header: dict
+    #     The fields of every checkpoint which do not change as the search runs.
+    # @type _interval: float
+    #     The number of seconds between two checkpoints.
+    # @type _stop: () -> bool | None
+    #     Called at every step of the search; the search saves a checkpoint and stops once it returns True.
+    # @type _next: float
+    #     The time.monotonic() at which the next checkpoint is due.
+    # @type _file: file
+    #     The file the keys of the solutions are appended to, one JSON string per line.
+    def __init__(self, puzzle, path, strategy, state, interval, stop):
+        """Open the checkpoint <path> of a search of <puzzle>, keeping the solutions saved with <state>, if any.
+
+        @type self: _Checkpoint
+        @type puzzle: Puzzle
+        @type path: str
+        @type strategy: str
+        @type state: dict | None
+            The last checkpoint, or None if the search starts from the beginning.
+        @type interval: float
+        @type stop: () -> bool | None
+        @rtype: None
+        """
+        name, key = puzzle_key(puzzle)
+        self._path = path
+        self._header = {'version': _VERSION, 'type': name, 'puzzle': key, 'strategy': strategy}
+        self._interval = interval
+        self._stop = stop
+        self._next = time.monotonic() + interval
+        self.stopped = False
+        self.solutions = []
+
+        # Solutions found after the last checkpoint are dropped: the search finds them again.
+        count = state['solutions'] if state is not None else 0
+        self._file = open(path + '.solutions', 'a+b')
+        try:
+            self._file.seek(0)
+            puzzle_class = type(puzzle)
+            for _ in range(count):
+                line = self._file.readline()
+                if not line.endswith(b'\n'):
+                    raise ValueError(path + '.solutions has fewer solutions than its checkpoint')
+                self.solutions.append(puzzle_class.from_key(json.loads(line.decode('utf-8'))))
+            self._file.truncate(self._file.tell())
+        except BaseException:
+            self._file.close()
+            raise
+
+    def found(self, solution):
+        """Record the new solution <solution>.
+
+        @type self: _Checkpoint
+        @type solution: Puzzle
+        @rtype: None
+        """
+        self.solutions.append(solution)
+        self._file.write(json.dumps(solution.key()).encode('utf-8') + b'\n')
+
+    def due(self):
+        """Return whether a checkpoint should be saved now, because it is time or because the search must stop.
+
+        @type self: _Checkpoint
+        @rtype: bool
+        """
+        if self._stop is not None and self._stop():
+            self.stopped = True
+            return True
+        return time.monotonic() >= self._next
+
+    def save(self, fields, done=False):
+        """Save a checkpoint of the search with the search-specific <fields>.
+
+        The solutions are written to disk before the checkpoint which counts
+        them.
+
+        @type self: _Checkpoint
+        @type fields: dict
+        @type done: bool
+            Whether the search has finished.
+        @rtype: None
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        state = dict(self._header)
+        state['solutions'] = len(self.solutions)
+        state['done'] = done
+        state.update(fields)
+        temporary = self._path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._path)
+        self._next = time.monotonic() + self._interval
+
+    def close(self):
+        """Close the file of the solutions.
+
+        @type self: _Checkpoint
+        @rtype: None
+        """
+        self._file.close()
+
+
+def solve_all_checkpointed(puzzle, path, interval=INTERVAL, listener=None, stop=None):
+    """Return all solutions of the puzzle, as solve_all finds them, saving checkpoints of the search to <path>.
+
+    If <path> already holds a checkpoint of this puzzle, the search goes on
+    from there. Return None if <stop> asked the search to stop before it
+    finished; a checkpoint is saved first. Raise a ValueError if <path> holds
+    the checkpoint of another puzzle, or if the solve-all strategy of the
+    puzzle cannot be checkpointed.
+
+    @type puzzle: Puzzle
+    @type path: str
+    @type interval: float
+        The number of seconds between two checkpoints.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see solver.py), the state and its depth as the search runs.
+    @type stop: () -> bool | None
+        Called at every step of the search, which stops once it returns True.
+    @rtype: list[Puzzle] | None
+
+    >>> import os, tempfile
+    >>> from solver import solve_all
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> path = os.path.join(tempfile.mkdtemp(), 'board.ckpt')
+    >>> puzzle = SudokuPuzzle([['A', '', '', ''], ['', '', 'A', ''], ['', 'A', '', ''], ['', '', '', 'A']])
+    >>> steps = []
+    >>> solve_all_checkpointed(puzzle, path, stop=lambda: len(steps) > 20,
+    ...                        listener=lambda event, state, depth: steps.append(event)) is None
+    True
+    >>> [solution.key() for solution in resume(path)] == [solution.key() for solution in solve_all(puzzle)]
+    True
+    """
+    state = None
+    if os.path.exists(path):
+        state = _load(path)
+        if (state['type'], state['puzzle']) != puzzle_key(puzzle):
+            raise ValueError(path + ' is the checkpoint of another puzzle')
+    return _run(puzzle, path, state, interval, listener, stop)
+
+
+def resume(path, interval=INTERVAL, listener=None, stop=None):
+    """Go on with the search saved in the checkpoint <path> and return all solutions of its puzzle.
+
+    Return None if <stop> asked the search to stop again before it finished.
+
+    @type path: str
+    @type interval: float
+    @type listener: (str, Puzzle, int) -> None | None
+    @type stop: () -> bool | None
+    @rtype: list[Puzzle] | None
+    """
+    state = _load(path)
+    return _run(puzzle_from_key(state['type'], state['puzzle']), path, state, interval, listener, stop)
+
+
+def _load(path):
+    """Return the checkpoint saved in <path>.
+
+    @type path: str
+    @rtype: dict
+    """
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != _VERSION:
+        raise ValueError(path + ' is not a checkpoint of this version')
+    return state
+
+
+def _run(puzzle, path, state, interval, listener, stop):
+    """Run or resume from <state> the checkpointed search of <puzzle>, as solve_all_checkpointed does.
+
+    @type puzzle: Puzzle
+    @type path: str
+    @type state: dict | None
+    @type interval: float
+    @type listener: (str, Puzzle, int) -> None | None
+    @type stop: () -> bool | None
+    @rtype: list[Puzzle] | None
+    """
+    strategy = puzzle_type(puzzle).solve_all
+    if strategy not in SEARCHES:
+        raise ValueError("the '" + strategy + "' strategy cannot be checkpointed")
+    if state is not None and state['strategy'] != strategy:
+        raise ValueError(path + " is the checkpoint of a '" + state['strategy'] + "' search")
+    checkpoint = _Checkpoint(puzzle, path, strategy, state, interval, stop)
+    try:
+        if state is None or not state['done']:
+            SEARCHES[strategy](puzzle, state, checkpoint, listener)
+        return None if checkpoint.stopped else checkpoint.solutions
+    finally:
+        checkpoint.close()
+
+
+def _search_complete(puzzle, state, checkpoint, listener):
+    """Find every solution of the puzzle by depth-first search, as solver.solve_complete does, from <state> if given.
+
+    @type puzzle: Puzzle
+    @type state: dict | None
+    @type checkpoint: _Checkpoint
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: None
+    """
+    # Every entry of the path is [state, its extensions not explored yet, the number explored].
+    path = []
+    if state is not None:
+        puzzle_class = type(puzzle)
+        for key, explored in state['stack']:
+            current = puzzle_class.from_key(key)
+            extensions = current.iter_extensions()
+            for _ in range(explored):
+                next(extensions)
+            path.append([current, extensions, explored])
+    else:
+        if listener is not None:
+            listener('expand', puzzle, 0)
+        if puzzle.is_solved():
+            if listener is not None:
+                listener('solution', puzzle, 0)
+            checkpoint.found(puzzle)
+        else:
+            path.append([puzzle, puzzle.iter_extensions(), 0])
+
+    while path:
+        if checkpoint.due():
+            checkpoint.save({'stack': [[current.key(), explored] for current, _, explored in path]})
+            if checkpoint.stopped:
+                return
+        entry = path[-1]
+        new_state = next(entry[1], None)
+        if new_state is None:
+            path.pop()
+            if listener is not None:
+                listener('backtrack' if entry[2] else 'prune', entry[0], len(path))
+            continue
+        entry[2] += 1
+        depth = len(path)
+        if listener is not None:
+            listener('expand', new_state, depth)
+        if new_state.is_solved():
+            if listener is not None:
+                listener('solution', new_state, depth)
+            checkpoint.found(new_state)
+        else:
+            path.append([new_state, new_state.iter_extensions(), 0])
+    checkpoint.save({'stack': []}, done=True)
+
+
+def _search_shortest_ladders(puzzle, state, checkpoint, listener):
+    """Find every shortest ladder of the word ladder puzzle, as solver.iter_shortest_ladders does, from <state> if given.
+
+    @type puzzle: WordLadderPuzzle
+    @type state: dict | None
+    @type checkpoint: _Checkpoint
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: None
+    """
+    target = puzzle.target_word()
+    # Every entry of the path is [state, its current word, the number of following words tried].
+    path = []
+    if state is not None:
+        children = state['graph']
+        current = puzzle
+        for i, (word, tried) in enumerate(state['stack']):
+            if i > 0:
+                current = current.apply_move(word)
+            path.append([current, word, tried])
+    elif puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, 0)
+        checkpoint.found(puzzle)
+        children = {}
+    else:
+        children = shortest_ladder_graph(puzzle, listener)
+        if children:
+            path.append([puzzle, puzzle.start_word(), 0])
+
+    while path:
+        if checkpoint.due():
+            checkpoint.save({'graph': children, 'stack': [[word, tried] for _, word, tried in path]})
+            if checkpoint.stopped:
+                return
+        entry = path[-1]
+        current, word, tried = entry
+        if tried == len(children[word]):
+            path.pop()
+            continue
+        new_word = children[word][tried]
+        entry[2] += 1
+        if new_word == target:
+            solution = current.apply_move(new_word)
+            if listener is not None:
+                listener('solution', solution, len(path))
+            checkpoint.found(solution)
+        else:
+            path.append([current.apply_move(new_word), new_word, 0])
+    checkpoint.save({'graph': {}, 'stack': []}, done=True)
+
+
+# The checkpointed search for every solve-all strategy which has one, by the name of the strategy.
+SEARCHES = {
+    'complete': _search_complete,
+    'shortest ladders': _search_shortest_ladders,
+}
+
+
+def main():
+    """Run or resume a checkpointed search from the command line, stopping cleanly on SIGINT or SIGTERM.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Find every solution of a puzzle, saving checkpoints to resume from.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='search a puzzle, or go on with its search if the checkpoint exists')
+    run.add_argument('path', help='the checkpoint file')
+    game = run.add_mutually_exclusive_group(required=True)
+    game.add_argument('--sudoku', metavar='GRID', help='a Sudoku grid on one line, with . for empty squares')
+    game.add_argument('--ladder', nargs=2, metavar=('START', 'TARGET'), help='a word ladder')
+    run.add_argument('--edits', action='store_true', help='let ladder moves also insert or delete a letter')
+    again = commands.add_parser('resume', help='go on with the search saved in a checkpoint')
+    again.add_argument('path', help='the checkpoint file')
+    for command in (run, again):
+        command.add_argument('--interval', type=float, default=INTERVAL, help='seconds between two checkpoints')
+        command.add_argument('--quiet', action='store_true', help='only print the number of solutions')
+    args = parser.parse_args()
+
+    signals = []
+    for number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(number, lambda received, frame: signals.append(received))
+
+    def stop():
+        """Return whether a signal asked the search to stop.
+
+        @rtype: bool
+        """
+        return bool(signals)
+
+    start = time.perf_counter()
+    if args.command == 'resume':
+        solutions = resume(args.path, args.interval, stop=stop)
+    else:
+        from load_test import make_puzzle
+        if args.sudoku:
+            puzzle = make_puzzle({'type': 'sudoku', 'grid': args.sudoku})
+        else:
+            kind = 'edit ladder' if args.edits else 'word ladder'
+            puzzle = make_puzzle({'type': kind, 'start': args.ladder[0], 'target': args.ladder[1]})
+        solutions = solve_all_checkpointed(puzzle, args.path, args.interval, stop=stop)
+    elapsed = time.perf_counter() - start
+    if solutions is None:
+        print('Stopped after {:.2f}s; go on with: python checkpoint.py resume {}'.format(elapsed, args.path))
+        return
+    if not args.quiet:
+        for solution in solutions:
+            print(solution)
+    print('{} solutions in {:.2f}s'.format(len(solutions), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 """Module containing the Controller class."""
 from view import TextView, WebView
-from puzzle import Puzzle
-from solver import solve, solve_complete, hint_by_depth, hint_by_breadth
+from puzzle import Puzzle, puzzle_type
+from solver import solve, solve_all, hint
+import argparse
 
 
 class Controller:
@@ -10,37 +11,151 @@ class Controller:
     # === Private Attributes ===
     # @type _puzzle: Puzzle
     #     The puzzle associated with this game controller.
-    # @type _view: View
-    #     The view associated with this game controller.
+    # @type _view: View | None
+    #     The view associated with this game controller, or None if the game is driven by calling act.
     # @type _tree: _ControllerTree
     #     The entire tree associated with this controller.
     # @type _current_tree: _ControllerTree
     #     The tree that represents the current state of the puzzle.
-
-    def __init__(self, puzzle, mode='text'):
+    # @type _nodes: list[_ControllerTree]
+    #     Every tree of the game, indexed by its node number.
+    # @type _store: SessionStore | None
+    #     The store the game is saved to as it is played, if any.
+    # @type _session: str | None
+    #     The id of the game in _store.
+    # @type _stats: ActionStats | None
+    #     The statistics every action is recorded in, if profiling is on.
+    # @type _hints: HintWorker | None
+    #     The worker computing hints in the background, if speculative hints are on.
+    # @type _replay_error: str | None
+    #     Why the saved game could not be replayed in full, if it could not.
+
+    def __init__(self, puzzle, mode='text', port=8000, store=None, session=None, stats=None, speculate=False):
         """Create a new controller.
 
         <mode> is either 'text' or 'web', representing the type of view
         to use.
 
-        By default, <mode> has a value of 'text'.
+        By default, <mode> has a value of 'text'. <port> is the port the
+        web view listens on. If <mode> is None, no view is started and the
+        game is played by calling act, as scripted_driver does.
 
-        @type puzzle: Puzzle
-        @type mode: str
+        If a session store is given, every move is saved to it under the id
+        <session>. If that session is already in the store, the saved game is
+        resumed instead of starting a new game, and <puzzle> may be None.
+
+        If <stats> is given, the latency and solver effort of every action is
+        recorded in it, and shown by the :STATS command.
+
+        If <speculate> is True, the hint of every new state is computed in the
+        background while the player thinks, so that :HINT can answer at once.
+
+        @type puzzle: Puzzle | None
+        @type mode: str | None
+        @type port: int
+        @type store: SessionStore | None
+        @type session: str | None
+        @type stats: ActionStats | None
+        @type speculate: bool
         @rtype: None
         """
-        self._puzzle = puzzle
-        self._tree = _ControllerTree(puzzle)
-        self._current_tree = self._tree
-        if mode == 'text':
+        self._store = store
+        self._stats = stats
+        self._hints = None
+        self._session = session
+        self._replay_error = None
+        if store is not None and session is not None and session in store:
+            self._restore()
+        else:
+            self._puzzle = puzzle
+            self._tree = _ControllerTree(puzzle)
+            self._current_tree = self._tree
+            self._nodes = [self._tree]
+            if store is not None:
+                self._session = store.create(puzzle, session)
+        if speculate:
+            from hint_worker import HintWorker
+            self._hints = HintWorker()
+            self._hints.submit(self._puzzle)
+        if mode is None:
+            self._view = None
+        elif mode == 'text':
             self._view = TextView(self)
         elif mode == 'web':
-            self._view = WebView(self)
+            self._view = WebView(self, port)
         else:
             raise ValueError()
 
         # Start the game.
-        self._view.run()
+        if self._view is not None:
+            if self._replay_error is not None:
+                print(self._replay_error)
+            self._view.run()
+
+    def _restore(self):
+        """Rebuild the game saved in the session store by replaying its moves.
+
+        A move which is no longer valid, e.g. a word since removed from the
+        dictionary, stops the replay: it and every later move are dropped from
+        the store, the game resumes at the state the move was made in if the
+        player was past it, and replay_error tells which move failed.
+
+        @type self: Controller
+        @rtype: None
+
+        >>> from session_store import SessionStore
+        >>> from word_ladder_puzzle import WordLadderPuzzle, add_words, remove_words
+        >>> store = SessionStore(':memory:')
+        >>> add_words(['cqt'])
+        ['cqt']
+        >>> game = Controller(WordLadderPuzzle('cat', 'dog'), None, store=store, session='s')
+        >>> game.act('cqt')[1]
+        False
+        >>> remove_words(['cqt'])
+        ['cqt']
+        >>> resumed = Controller(None, None, store=store, session='s')
+        >>> resumed.replay_error()
+        "Could not replay move 1 ('cqt') of session s: cqt is not a one-letter change from cat; resuming before it."
+        >>> resumed.state() == str(WordLadderPuzzle('cat', 'dog'))
+        True
+        >>> resumed.act('cot')[1], store.load('s')[1]
+        (False, [(1, 0, 'cot')])
+        """
+        puzzle, moves, current = self._store.load(self._session)
+        self._tree = _ControllerTree(puzzle)
+        self._nodes = [self._tree]
+        for node, parent, move in moves:
+            parent_tree = self._nodes[parent]
+            try:
+                state = parent_tree.puzzle().move(move)
+            except ValueError as error:
+                if current >= node:
+                    current = parent
+                self._store.truncate(self._session, node, current)
+                self._replay_error = ('Could not replay move {} ({!r}) of session {}: {}; resuming before it.'
+                                      .format(node, move, self._session, str(error) or 'invalid move'))
+                break
+            subtree = _ControllerTree(state, move, node)
+            parent_tree.add_subtree(subtree)
+            self._nodes.append(subtree)
+        self._current_tree = self._nodes[current]
+        self._puzzle = self._current_tree.puzzle()
+
+    def replay_error(self):
+        """Return why the saved game could not be replayed in full, or None if it was.
+
+        @type self: Controller
+        @rtype: str | None
+        """
+        return self._replay_error
+
+    def session(self):
+        """Return the id under which this game is saved, or None if it is not saved.
+
+        @type self: Controller
+        @rtype: str | None
+        """
+        return self._session
 
     def state(self):
         """Return a string representation of the current puzzle state.
@@ -51,30 +166,77 @@ class Controller:
         """
         return str(self._puzzle)
 
-    def act(self, action):
+    def stats(self):
+        """Return the statistics of the actions of this game, or None if profiling is off.
+
+        @type self: Controller
+        @rtype: ActionStats | None
+        """
+        return self._stats
+
+    def state_key(self):
+        """Return the type and the key of the current puzzle state, a compact form for programs rather than players.
+
+        @type self: Controller
+        @rtype: (str, str)
+        """
+        return puzzle_type(self._puzzle).name, self._puzzle.key()
+
+    def act(self, action, listener=None):
         """Run an action represented by string <action>.
 
         Return a string representing either the new state or an error message,
         and whether the program should end.
 
+        <listener> is passed on to the solver for the :SOLVE, :SOLVE-ALL and
+        :HINT actions, so that a view can report the progress of a long search.
+
         @type self: Controller
         @type action: str
             The user input.
+        @type listener: (str, Puzzle, int) -> None | None
         @rtype: (str, bool)
             The current state of the puzzle or a message and whether the program should end.
         """
+        if action == ':STATS':
+            return self._act_stats()
+        elif self._stats is not None:
+            result = self._stats.record(action, lambda counter: self._act(action, counter), listener)
+        else:
+            result = self._act(action, listener)
+        if result[1]:
+            self.close()
+        return result
+
+    def close(self):
+        """Stop the background work of the game, if any. act calls this once the game ends.
+
+        @type self: Controller
+        @rtype: None
+        """
+        if self._hints is not None:
+            self._hints.close()
+
+    def _act(self, action, listener=None):
+        """Run an action represented by string <action>, as act does, without recording it.
+
+        @type self: Controller
+        @type action: str
+        @type listener: (str, Puzzle, int) -> None | None
+        @rtype: (str, bool)
+        """
         if action == 'exit':
             return '', True
         elif action == ':SOLVE':
-            return self._act_solve()
+            return self._act_solve(listener)
         elif action == ':SOLVE-ALL':
-            return self._act_solve_all()
+            return self._act_solve_all(listener)
         elif action == ':UNDO':
             return self._act_undo()
         elif action == ':ATTEMPTS':
             return self._act_attempts()
         elif action == ":HINT":
-            return self._act_hint()
+            return self._act_hint(listener)
         elif action == ":DISPLAY":
             return str(self._puzzle), False
         else:
@@ -83,30 +245,33 @@ class Controller:
             except ValueError:
                 return 'Sorry, that is not a valid move. Please try again.', False
 
-    def _act_solve(self):
+    def _act_solve(self, listener=None):
         """Returns a solution of the puzzle if there is one or 'There are no solutions.' if no solutions exist, and
         tells the program to end.
 
         @type self: Controller
+        @type listener: (str, Puzzle, int) -> None | None
         @rtype: (str, bool)
         """
-        solution = solve(self._puzzle)
+        if self._known_unsolvable(listener):
+            return 'There are no solutions.', True
+        solution = solve(self._puzzle, listener=listener)
         if solution is not None:
             return str(solution), True
         else:
             return 'There are no solutions.', True
 
-    def _act_solve_all(self):
+    def _act_solve_all(self, listener=None):
         """Returns all the solution of the puzzle if there exists any or 'There are no solutions.' if no solutions
         exist, and tells the program to end.
 
         @type self: Controller
+        @type listener: (str, Puzzle, int) -> None | None
         @rtype: (str, bool)
         """
-        all_solutions = ''
-        solutions = solve_complete(self._puzzle)
-        for solution in solutions:
-            all_solutions += str(solution) + '\n'
+        if self._known_unsolvable(listener):
+            return 'There are no solutions.', True
+        all_solutions = ''.join([str(solution) + '\n' for solution in solve_all(self._puzzle, listener)])
         if all_solutions != '':
             return all_solutions, True
         else:
@@ -123,12 +288,16 @@ class Controller:
         if previous_state_tree is not None:
             self._current_tree = previous_state_tree[0]
             self._puzzle = previous_state_tree[1]
+            if self._store is not None:
+                self._store.set_current(self._session, self._current_tree.node())
+            if self._hints is not None:
+                self._hints.submit(self._puzzle)
             return self.state(), False
         else:
             return 'You have not made any moves.', False
 
     def _act_attempts(self):
-        """Prints all the puzzle states that have been reached from this puzzle state and tells the program not to end.
+        """Returns all the puzzle states that have been reached from this puzzle state and tells the program not to end.
 
         @type self: Controller
         @rtype: (str, bool)
@@ -137,24 +306,46 @@ class Controller:
         if len(puzzle_state) == 0:
             return 'You have never reached this state before.', False
         else:
-            for i in range(len(puzzle_state)):
-                print('You attempted... \n' + str(puzzle_state[i]) + "\nYour move was '" + move[i] + "'\n")
-            return '', False
+            return '\n'.join(['You attempted... \n' + str(puzzle_state[i]) + "\nYour move was '" + move[i] + "'\n"
+                              for i in range(len(puzzle_state))]), False
 
-    def _act_hint(self):
+    def _act_hint(self, listener=None):
         """Returns a hint that will either solve the puzzle, or if the the puzzle leads to no more moves, return
         'No possible extensions!'. If the puzzle is already solved, return 'Already at a solution!'. Also, tells the
         program not to end.
 
         @type self: Controller
+        @type listener: (str, Puzzle, int) -> None | None
         @rtype: (str, bool)
         """
-        if type(self._puzzle) == WordLadderPuzzle:
-            hint = hint_by_breadth(self._puzzle)
-        else:
-            hint = hint_by_depth(self._puzzle)
+        if self._hints is not None:
+            return 'Try entering: ' + self._hints.hint(self._puzzle, listener), False
+        return 'Try entering: ' + hint(self._puzzle, listener), False
+
+    def _known_unsolvable(self, listener=None):
+        """Return whether the hint worker has already found that the current state cannot be solved.
+
+        If so, <listener> is sent a single 'cached' event in place of a search.
+
+        @type self: Controller
+        @type listener: (str, Puzzle, int) -> None | None
+        @rtype: bool
+        """
+        if self._hints is None or self._hints.solvable(self._puzzle) is not False:
+            return False
+        if listener is not None:
+            listener('cached', self._puzzle, 0)
+        return True
 
-        return 'Try entering: ' + hint, False
+    def _act_stats(self):
+        """Returns the statistics of the actions so far, and tells the program not to end.
+
+        @type self: Controller
+        @rtype: (str, bool)
+        """
+        if self._stats is None:
+            return 'Profiling is off. Start the game with --stats to record statistics.', False
+        return self._stats.report(), False
 
     def _act_move(self, action):
         """Updates the state of the puzzle according to <action>. Returns 'Congratulations, you solved it!' and tells
@@ -169,12 +360,19 @@ class Controller:
         self._puzzle = self._puzzle.move(action)
         if self._current_tree.in_subtree(self._puzzle):
             self._current_tree = self._current_tree.in_subtree(self._puzzle)
+            if self._store is not None:
+                self._store.set_current(self._session, self._current_tree.node())
         else:
-            new_subtree = _ControllerTree(self._puzzle, action)
+            new_subtree = _ControllerTree(self._puzzle, action, len(self._nodes))
+            self._nodes.append(new_subtree)
+            if self._store is not None:
+                self._store.add_move(self._session, new_subtree.node(), self._current_tree.node(), action)
             self._current_tree.add_subtree(new_subtree)
             self._current_tree = new_subtree
         if self._puzzle.is_solved():
             return 'Congratulations, you solved it!', True
+        if self._hints is not None:
+            self._hints.submit(self._puzzle)
         return self.state(), False
 
 
@@ -189,21 +387,41 @@ class _ControllerTree:
     #     The user input that led to the puzzle state.
     # @type _subtrees: [_ControllerTree]
     #     A list of the puzzle states that resulted from making one move to this puzzle state.
+    # @type _node: int
+    #     The number of this puzzle state, in the order the states were reached. The initial state is 0.
 
     # === Representation Invariants ===
     # An empty _ControllerTree cannot be created, it must have a valid puzzle state associated with it.
     # Only the initial _ControllerTree, which has no parent, has _user_input is None.
-    def __init__(self, puzzle, move=None):
+    def __init__(self, puzzle, move=None, node=0):
         """Initialize a new _ControllerTree representing a puzzle state. The puzzle state and the move made to reach
         the puzzle state are saved as attributes.
 
         @type puzzle: Puzzle
         @type move: str
+        @type node: int
         @rtype: None
         """
         self._puzzle = puzzle
         self._user_input = move
         self._subtrees = []
+        self._node = node
+
+    def puzzle(self):
+        """Return the puzzle state associated with this tree.
+
+        @type self: _ControllerTree
+        @rtype: Puzzle
+        """
+        return self._puzzle
+
+    def node(self):
+        """Return the number of the puzzle state associated with this tree.
+
+        @type self: _ControllerTree
+        @rtype: int
+        """
+        return self._node
 
     def add_subtree(self, subtree):
         """Add a new subtree representing a new puzzle state reached by making one move from the original puzzle
@@ -222,8 +440,9 @@ class _ControllerTree:
         @type puzzle_state: Puzzle
         @rtype: _ControllerTree | None
         """
+        key = puzzle_state.key()
         for subtree in self._subtrees:
-            if str(subtree._puzzle) == str(puzzle_state):
+            if subtree._puzzle.key() == key:
                 return subtree
         return None
 
@@ -263,14 +482,99 @@ class _ControllerTree:
 def main():
     """Prompt the user to configure and play the game.
 
+    With --stats, the latency of every action is recorded and shown by the
+    :STATS command; --profile N also keeps the cProfile output of the N
+    slowest actions. With --edits, word ladder moves may also insert or
+    delete a letter. With --watch-dictionary, edits to the word ladder
+    dictionary file are applied to the running game. With --store PATH, the
+    game is saved to that session database as it is played, and --session ID
+    resumes the saved game ID, or saves the new game under that id, so a
+    game survives a restart of the program or of its web server.
+
     @rtype: None
     """
+    parser = argparse.ArgumentParser(description='Play Sudoku or Word Ladder.')
+    parser.add_argument('--stats', action='store_true', help='record the latency of every action')
+    parser.add_argument('--profile', type=int, default=0, metavar='N', help='profile the N slowest actions')
+    parser.add_argument('--speculate', action='store_true', help='compute hints in the background after every move')
+    parser.add_argument('--watch-dictionary', action='store_true',
+                        help='pick up changes to the word ladder dictionary file while playing')
+    parser.add_argument('--edits', action='store_true',
+                        help='let word ladder moves also insert or delete a letter')
+    parser.add_argument('--store', metavar='PATH', help='save the game to this SQLite session database')
+    parser.add_argument('--session', metavar='ID', help='the id of the saved game to resume, or to save a new game as')
+    args = parser.parse_args()
+    stats = None
+    if args.stats or args.profile > 0:
+        from profiling import ActionStats
+        stats = ActionStats(args.profile)
+
+    if args.watch_dictionary:
+        from dictionary_watcher import DictionaryWatcher
+        DictionaryWatcher()
+
+    store = None
+    session = args.session
+    if args.store:
+        from session_store import SessionStore
+        store = SessionStore(args.store)
+    if store is not None and session is not None and session in store:
+        # The saved game is replayed by the Controller; only the view is left to choose.
+        g = None
+        view_type = _ask_view_type()
+        print("\n\nResuming game " + session + ".")
+    else:
+        g, view_type = _new_game(args)
+        if store is not None:
+            if session is None:
+                import uuid
+                session = uuid.uuid4().hex
+            print("This game is saved as session " + session + ". To resume it, start the game with --store " +
+                  args.store + " --session " + session + ".")
+
+    if view_type == "text":
+        print("To quit the game, type exit.")
+        print("To ask for a solution, type :SOLVE.")
+        print("To ask for a hint, type :HINT.")
+        print("To undo a move, type :UNDO.")
+        print("To look at your past moves from this current game state, type :ATTEMPTS.")
+        if stats is not None:
+            print("To see how long your actions took, type :STATS.")
+        print()
+
+    try:
+        Controller(g, mode=view_type, store=store, session=session, stats=stats, speculate=args.speculate)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _ask_view_type():
+    """Prompt the user for the view to play in, and return 'text' or 'web'.
+
+    @rtype: str
+    """
+    view_type = input("Would you like to play in text mode or web mode? ").lower()
+    if view_type != "web"and view_type != "text":
+        print("That is not a valid mode, you will be playing in text mode.")
+        view_type = "text"
+    return view_type
+
+
+def _new_game(args):
+    """Prompt the user to choose a new game, and return its puzzle and the view to play it in.
+
+    @type args: argparse.Namespace
+    @rtype: (Puzzle, str)
+    """
     game = input("Do you want to play Sudoku (s) or Word Ladder (w)? ")
     while game != "s" and game != "w":
         print("That is not a valid input.")
         game = input("Do you want to play Sudoku (s) or Word Ladder (w)? ").lower()
 
+    # Each puzzle module is only imported once the player picked its game.
     if game == "s":
+        from sudoku_puzzle import SudokuPuzzle
         view_type = "text"
         g = SudokuPuzzle([['', '', '', 'A'],
                       ['D', '', 'B', ''],
@@ -278,12 +582,13 @@ def main():
                       ['', 'B', '', 'D']])
         print("\n\nTo make a move: use the format (<row>, <column>) -> letter.")
     elif game == "w":
-        view_type = input("Would you like to play in text mode or web mode? ").lower()
-        if view_type != "web"and view_type != "text":
-            print("That is not a valid mode, you will be playing in text mode.")
-            view_type = "text"
+        from word_ladder_puzzle import WordLadderPuzzle
+        view_type = _ask_view_type()
         choice = input("Do you want to choose your start and end words? (y/n) ")
-        if choice == "y":
+        if choice == "y" and args.edits:
+            start = input("What would you like your starting word to be? ")
+            end = input("What would you like your ending word to be? ")
+        elif choice == "y":
             print("Your starting and ending words should have the same length.")
             start = input("What would you like your starting word to be? ")
             end = input("What would you like your ending word to be? ")
@@ -292,23 +597,18 @@ def main():
                 start = input("What would you like your starting word to be? ")
                 end = input("What would you like your ending word to be? ")
         else:
-            start = "rock"
-            end = "taco"
-        g = WordLadderPuzzle(start, end)
-        print("\n\nTo make a move, type a word which does not differ by more than one letter from the current word.")
-
-    if view_type == "text":
-        print("To quit the game, type exit.")
-        print("To ask for a solution, type :SOLVE.")
-        print("To ask for a hint, type :HINT.")
-        print("To undo a move, type :UNDO.")
-        print("To look at your past moves from this current game state, type :ATTEMPTS.\n")
-
-    c = Controller(g, mode=view_type)
+            from word_ladder_generator import generate_pairs
+            start, end = generate_pairs(4, 5, 1)[0]
+        if args.edits:
+            from edit_ladder_puzzle import EditLadderPuzzle
+            g = EditLadderPuzzle(start, end)
+            print("\n\nTo make a move, type a word which changes, inserts or deletes one letter of the current word.")
+        else:
+            g = WordLadderPuzzle(start, end)
+            print("\n\nTo make a move, type a word which does not differ by more than one letter from the current "
+                  "word.")
+    return g, view_type
 
 
 if __name__ == '__main__':
-    from sudoku_puzzle import SudokuPuzzle
-    from word_ladder_puzzle import WordLadderPuzzle
-
     main()
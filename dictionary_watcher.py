@@ -0,0 +1,121 @@
+"""Reloading of the word ladder dictionary while games are running.
+
+A DictionaryWatcher checks the modification time and size of the dictionary
+file every few seconds, and applies the words added to or removed from it to
+the loaded dictionary (see word_ladder_puzzle.reload_words). A change is only
+reloaded once two checks in a row see the same modification time and size,
+so that a file still being written is not read half way, which would remove
+most of the dictionary. Running games, and
+the word graphs of the generator, then use the new words at once, without a
+restart and without rebuilding anything from scratch.
+"""
+from word_ladder_puzzle import WORDS_FILE, reload_words
+import os
+import threading
+
+# The default number of seconds between two checks of the dictionary file.
+INTERVAL = 2.0
+
+
+class DictionaryWatcher:
+    """A background thread reloading the dictionary whenever its file changes.
+
+    === Public attributes ===
+    @type interval: float
+        The number of seconds between two checks of the file.
+    @type reloads: int
+        The number of times the file was reloaded.
+    """
+    # === Private attributes ===
+    # @type _loaded: (int, int) | None
+    #     The modification time and size of the file when it was last loaded, or None to load it again.
+    # @type _changed: (int, int) | None
+    #     The modification time and size of a change seen by the last check but not loaded yet, if any.
+    # @type _stopped: threading.Event
+    #     Set once the watcher should stop.
+    # @type _thread: threading.Thread
+    #     The background thread.
+    def __init__(self, interval=INTERVAL):
+        """Start watching the dictionary file.
+
+        @type self: DictionaryWatcher
+        @type interval: float
+        @rtype: None
+        """
+        self.interval = interval
+        self.reloads = 0
+        self._loaded = self._signature()
+        self._changed = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the file.
+
+        @type self: DictionaryWatcher
+        @rtype: None
+        """
+        self._stopped.set()
+        self._thread.join()
+
+    def check(self):
+        """Reload the dictionary if its file changed and then stayed the same since the last check.
+
+        Return the words added and removed.
+
+        @type self: DictionaryWatcher
+        @rtype: (list[str], list[str])
+
+        >>> watcher = DictionaryWatcher(60)
+        >>> watcher.check(), watcher.reloads
+        (([], []), 0)
+        >>> watcher._loaded = None
+        >>> watcher.check(), watcher.reloads
+        (([], []), 0)
+        >>> watcher.check(), watcher.reloads
+        (([], []), 1)
+        >>> watcher.stop()
+        """
+        signature = self._signature()
+        if signature is None or signature == self._loaded:
+            self._changed = None
+            return [], []
+        if signature != self._changed:
+            # The file may still be being written; wait for the next check to see it unchanged.
+            self._changed = signature
+            return [], []
+        self._loaded = signature
+        self._changed = None
+        self.reloads += 1
+        return reload_words()
+
+    def _signature(self):
+        """Return the modification time and size of the dictionary file, or None if it cannot be read.
+
+        @type self: DictionaryWatcher
+        @rtype: (int, int) | None
+        """
+        try:
+            stat = os.stat(WORDS_FILE)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self):
+        """Check the file every <interval> seconds until stopped. Runs in the background thread.
+
+        @type self: DictionaryWatcher
+        @rtype: None
+        """
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except OSError:
+                # The file is being rewritten; try again at the next checks.
+                self._loaded = None
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,157 @@
+"""Edit ladder module.
+
+An edit ladder is a word ladder whose moves may also insert or delete one
+letter, so the words of a ladder need not all have the same length:
+
+    Start word: 'cat'
+    Target word: 'coast'
+    Solution:
+        cat
+        cast
+        coast
+
+The words one edit away from a word are found with a symmetric deletion
+index. Every word is indexed under itself and under each word obtained by
+deleting one of its letters. Two words are at most one edit apart only if
+deleting at most one letter from each gives the same string, so the
+candidates for a word are the words indexed under the word itself and under
+its own deletions, and only those few are checked. The index is built one
+key length at a time, as the search reaches words of new lengths, and follows
+the changes made to the loaded dictionary.
+"""
+from puzzle import register
+from word_ladder_puzzle import WordLadderPuzzle, load_words, on_dictionary_change
+
+# Maps a key length to the index of the words under the keys of that length:
+# every word of that length under itself, and every word one letter longer under each of its deletions.
+_deletion_index = {}
+
+
+def deletion_index(length):
+    """Return the deletion index of the keys with <length> letters, building it the first time.
+
+    @type length: int
+    @rtype: dict[str, list[str]]
+    """
+    if length not in _deletion_index:
+        index = {}
+        for word in load_words(length)[0]:
+            index.setdefault(word, []).append(word)
+        for word in load_words(length + 1)[0]:
+            for key in set(_deletions(word)):
+                index.setdefault(key, []).append(word)
+        _deletion_index[length] = index
+    return _deletion_index[length]
+
+
+def one_edit_apart(word1, word2):
+    """Return whether <word1> becomes <word2> by changing, inserting or deleting exactly one letter.
+
+    @type word1: str
+    @type word2: str
+    @rtype: bool
+
+    >>> one_edit_apart('cat', 'cast'), one_edit_apart('cast', 'cat'), one_edit_apart('cat', 'cot')
+    (True, True, True)
+    >>> one_edit_apart('cat', 'act'), one_edit_apart('cat', 'cat')
+    (False, False)
+    """
+    if len(word1) > len(word2):
+        word1, word2 = word2, word1
+    if len(word2) - len(word1) > 1 or word1 == word2:
+        return False
+    i = 0
+    while i < len(word1) and word1[i] == word2[i]:
+        i += 1
+    if len(word1) == len(word2):
+        return word1[i + 1:] == word2[i + 1:]
+    return word1[i:] == word2[i + 1:]
+
+
+def _deletions(word):
+    """Return every word obtained by deleting one letter of <word>.
+
+    @type word: str
+    @rtype: list[str]
+
+    >>> _deletions('cat')
+    ['at', 'ct', 'ca']
+    """
+    return [word[:i] + word[i + 1:] for i in range(len(word))]
+
+
+def _update_index(added, removed):
+    """Apply a change to the dictionary to the deletion indexes already built.
+
+    @type added: list[str]
+    @type removed: list[str]
+    @rtype: None
+    """
+    for word in added:
+        if len(word) in _deletion_index:
+            _deletion_index[len(word)].setdefault(word, []).append(word)
+        if len(word) - 1 in _deletion_index:
+            for key in set(_deletions(word)):
+                _deletion_index[len(word) - 1].setdefault(key, []).append(word)
+    for word in removed:
+        keys = []
+        if len(word) in _deletion_index:
+            keys.append((_deletion_index[len(word)], word))
+        if len(word) - 1 in _deletion_index:
+            keys.extend((_deletion_index[len(word) - 1], key) for key in set(_deletions(word)))
+        for index, key in keys:
+            words = index.get(key, [])
+            if word in words:
+                words.remove(word)
+                if not words:
+                    del index[key]
+
+
+on_dictionary_change(_update_index)
+
+
+class EditLadderPuzzle(WordLadderPuzzle):
+    """A word ladder puzzle whose moves may also insert or delete one letter."""
+
+    def neighbours(self, word):
+        """Return, in alphabetical order, the dictionary words one edit away from <word> which are not in the ladder.
+
+        @type self: EditLadderPuzzle
+        @type word: str
+        @rtype: list[str]
+
+        >>> EditLadderPuzzle('cat', 'coast').neighbours('cast')[:6]
+        ['bast', 'canst', 'cant', 'cart', 'casa', 'case']
+        """
+        candidates = set(deletion_index(len(word)).get(word, ()))
+        if len(word) > 1:
+            index = deletion_index(len(word) - 1)
+            for key in set(_deletions(word)):
+                candidates.update(index.get(key, ()))
+        return sorted(candidate for candidate in candidates
+                      if candidate not in self._used_words and one_edit_apart(word, candidate))
+
+    def _is_possible_word(self, word):
+        """Return whether <word> is one of the words _possible_words would return.
+
+        @type self: EditLadderPuzzle
+        @type word: str
+        @rtype: bool
+
+        >>> EditLadderPuzzle('cat', 'coast')._is_possible_word('cast')
+        True
+        """
+        if word not in load_words(len(word))[1]:
+            return False
+        if word in self._used_words or word in self._tried_words:
+            return False
+        return one_edit_apart(word, self._start)
+
+
+register(EditLadderPuzzle, 'edit ladder', solve='breadth', solve_all='shortest ladders', hint='breadth',
+         count='shortest ladders')
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
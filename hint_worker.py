@@ -0,0 +1,200 @@
+"""Speculative hint computation in the background.
+
+While the player thinks about the next move, a HintWorker already searches
+for the hint of the current state, so that most :HINT actions are answered
+from its cache. Only the latest state is worth a search: submitting a new
+state cancels the search still running for the previous one.
+
+Whether a state can still be solved is cached next to its hint, so that the
+controller can answer :SOLVE on a dead end without searching again. A hint or
+answer taken from the cache sends a single 'cached' event to the listener
+instead of the search events, so that progress and statistics still show it.
+"""
+from solver import hint
+import threading
+
+# The number of hints kept per game; the oldest are dropped first.
+CACHE_SIZE = 256
+
+# The hint of a state which cannot lead to a solution.
+NO_SOLUTION = 'No possible extensions!'
+
+
+class _Cancelled(Exception):
+    """Raised by the solver listener of a HintWorker to stop a search which is no longer needed."""
+    pass
+
+
+class HintWorker:
+    """A background thread computing the hints of submitted puzzle states, with a cache of the results."""
+    # === Private attributes ===
+    # @type _cache: dict[str, (str, bool)]
+    #     Maps the key of every state searched to its hint and whether it can be solved, oldest first.
+    # @type _pending: Puzzle | None
+    #     The state the thread should search next, if any.
+    # @type _running: str | None
+    #     The key of the state the thread is searching, if any.
+    # @type _generation: int
+    #     The number of states submitted so far. A search stops once it is no longer for the latest state.
+    # @type _closed: bool
+    #     Whether close was called, after which the thread ends.
+    # @type _condition: threading.Condition
+    #     Guards every other attribute, and wakes up the thread and the callers of hint.
+    # @type _thread: threading.Thread
+    #     The background thread.
+    def __init__(self):
+        """Create a new hint worker and start its thread.
+
+        @type self: HintWorker
+        @rtype: None
+        """
+        self._cache = {}
+        self._pending = None
+        self._running = None
+        self._generation = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, puzzle):
+        """Start computing the hint of <puzzle> in the background, cancelling the search of any earlier state.
+
+        Does nothing once the worker is closed.
+
+        @type self: HintWorker
+        @type puzzle: Puzzle
+        @rtype: None
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._generation += 1
+            if puzzle.key() in self._cache:
+                self._pending = None
+            else:
+                self._pending = puzzle
+            self._condition.notify_all()
+
+    def hint(self, puzzle, listener=None):
+        """Return the hint of <puzzle>, from the cache if possible.
+
+        If the thread is searching <puzzle> right now, wait for it rather than
+        searching twice. Otherwise search in the calling thread.
+
+        @type self: HintWorker
+        @type puzzle: Puzzle
+        @type listener: (str, Puzzle, int) -> None | None
+            Sent the search events if the search runs in the calling thread,
+            and a single 'cached' event otherwise.
+        @rtype: str
+
+        >>> from sudoku_puzzle import SudokuPuzzle
+        >>> worker = HintWorker()
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['C', 'D', 'A', 'B'], ['B', 'A', '', ''], ['D', 'C', '', '']])
+        >>> worker.submit(s)
+        >>> events = []
+        >>> worker.hint(s, lambda event, state, depth: events.append(event))
+        '(2, 2) -> D'
+        >>> events
+        ['cached']
+        >>> worker.close()
+        >>> worker.hint(s)
+        '(2, 2) -> D'
+        """
+        key = puzzle.key()
+        with self._condition:
+            while key not in self._cache and (self._running == key or
+                                              (self._pending is not None and self._pending.key() == key)):
+                self._condition.wait()
+            if key in self._cache:
+                if listener is not None:
+                    listener('cached', puzzle, 0)
+                return self._cache[key][0]
+        result = hint(puzzle, listener)
+        with self._condition:
+            self._store(key, result)
+        return result
+
+    def solvable(self, puzzle):
+        """Return whether <puzzle> can lead to a solution, or None if its hint has not been computed yet.
+
+        @type self: HintWorker
+        @type puzzle: Puzzle
+        @rtype: bool | None
+
+        >>> from sudoku_puzzle import SudokuPuzzle
+        >>> worker = HintWorker()
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['C', 'D', 'A', 'B'], ['B', '', '', ''], ['', '', 'D', '']])
+        >>> worker.solvable(s) is None
+        True
+        >>> worker.hint(s)
+        'No possible extensions!'
+        >>> worker.solvable(s)
+        False
+        >>> worker.close()
+        """
+        with self._condition:
+            entry = self._cache.get(puzzle.key())
+        return None if entry is None else entry[1]
+
+    def close(self):
+        """Stop the thread, cancelling its search, and wait for it to end. Later hints are searched by the caller.
+
+        @type self: HintWorker
+        @rtype: None
+        """
+        with self._condition:
+            self._closed = True
+            self._generation += 1
+            self._pending = None
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _store(self, key, result):
+        """Cache the hint <result> of the state with key <key> and whether it can be solved. The condition must be held.
+
+        @type self: HintWorker
+        @type key: str
+        @type result: str
+        @rtype: None
+        """
+        self._cache[key] = (result, result != NO_SOLUTION)
+        if len(self._cache) > CACHE_SIZE:
+            del self._cache[next(iter(self._cache))]
+        self._condition.notify_all()
+
+    def _work(self):
+        """Search the submitted states one at a time, until the worker is closed. Runs in the background thread.
+
+        @type self: HintWorker
+        @rtype: None
+        """
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                puzzle, self._pending = self._pending, None
+                generation = self._generation
+                key = self._running = puzzle.key()
+
+            def cancel_if_stale(event, state, depth):
+                if self._generation != generation:
+                    raise _Cancelled()
+
+            try:
+                result = hint(puzzle, cancel_if_stale)
+            except _Cancelled:
+                result = None
+            with self._condition:
+                self._running = None
+                if result is not None:
+                    self._store(key, result)
+                self._condition.notify_all()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
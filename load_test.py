@@ -0,0 +1,331 @@
+"""Load generator for the web view.
+
+Replays game sessions against WebView servers on localhost and reports the
+latency of every type of action and the overall throughput.
+
+A WebView server plays a single game, so every session gets a server of its
+own, started in a separate process on a port the system picks, which it
+sends back once it listens. Up to <concurrency> sessions are replayed at the
+same time. Only the HTTP requests of a session are timed, not the start of
+its server, and the throughput is the number of requests over the time at
+least one request was in flight.
+
+A session is a dictionary with the puzzle to play and the actions to send:
+
+    {"puzzle": {"type": "sudoku", "grid": "...AD.B.C....B.D"},
+     "actions": [":DISPLAY", "(0, 0) -> B", ":HINT", ":UNDO", ":SOLVE"]}
+
+    {"puzzle": {"type": "word ladder", "start": "cat", "target": "dog"},
+     "actions": [":DISPLAY", "cot", ":HINT", ":SOLVE"]}
+
+The type is the name of a registered puzzle type (see puzzle.register), and
+the rest of the puzzle is read by its from_spec; {"type": ..., "key": ...}
+works for every type. 'ladder' is accepted as an alias of 'word ladder', as
+written by older session files.
+
+Sessions are either loaded from a JSON file holding a list of them, or
+generated from the benchmark corpus:
+
+    python load_test.py --sessions 40 --concurrency 8 --save-sessions sessions.json
+    python load_test.py --replay sessions.json --concurrency 16
+"""
+from benchmark import SUDOKU_CORPUS, LADDER_CORPUS
+from profiling import action_type
+from puzzle import puzzle_type_named
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import urllib.request
+from urllib.parse import quote
+
+# The fraction of synthetic actions of each type; the rest are moves.
+HINT_RATE = 0.15
+UNDO_RATE = 0.15
+INVALID_RATE = 0.05
+
+# Other names accepted for registered puzzle types in session files.
+TYPE_ALIASES = {'ladder': 'word ladder'}
+
+
+def make_puzzle(spec):
+    """Return a new puzzle described by the session puzzle <spec>.
+
+    Raise a ValueError if its type is not registered.
+
+    @type spec: dict
+    @rtype: Puzzle
+
+    >>> make_puzzle({'type': 'ladder', 'start': 'cat', 'target': 'dog'}).key()
+    '[["cat"], "dog"]'
+    >>> type(make_puzzle({'type': 'edit ladder', 'key': '[["cat"], "coast"]'})).__name__
+    'EditLadderPuzzle'
+    """
+    name = TYPE_ALIASES.get(spec['type'], spec['type'])
+    return puzzle_type_named(name).puzzle_class.from_spec(spec)
+
+
+def synthetic_session(spec, length, rng):
+    """Return a session of at most <length> actions playing the puzzle of <spec>.
+
+    Moves are picked from the valid moves of the current state, with hints,
+    undos and the occasional invalid move in between. The session ends with
+    :SOLVE, unless one of its moves already solved the puzzle.
+
+    @type spec: dict
+    @type length: int
+    @type rng: random.Random
+    @rtype: dict
+    """
+    puzzle = make_puzzle(spec)
+    history = []
+    actions = [':DISPLAY']
+    for _ in range(length):
+        choice = rng.random()
+        if choice < HINT_RATE:
+            actions.append(':HINT')
+        elif choice < HINT_RATE + UNDO_RATE:
+            actions.append(':UNDO')
+            if history:
+                puzzle = history.pop()
+        elif choice < HINT_RATE + UNDO_RATE + INVALID_RATE:
+            actions.append('not a move')
+        else:
+            extensions = puzzle.extensions()
+            if not extensions:
+                actions.append(':UNDO')
+                if history:
+                    puzzle = history.pop()
+                continue
+            extension = rng.choice(extensions)
+            actions.append(puzzle.generate_strings(extension))
+            history.append(puzzle)
+            puzzle = extension
+            if puzzle.is_solved():
+                return {'puzzle': spec, 'actions': actions}
+    actions.append(':SOLVE')
+    return {'puzzle': spec, 'actions': actions}
+
+
+def synthetic_sessions(count, length=20, games=('sudoku', 'word ladder'), seed=None):
+    """Return <count> synthetic sessions on puzzles of the benchmark corpus.
+
+    @type count: int
+    @type length: int
+    @type games: tuple[str]
+        The puzzle types played: 'sudoku' and 'word ladder' (or its alias 'ladder').
+    @type seed: int | None
+    @rtype: list[dict]
+    """
+    rng = random.Random(seed)
+    games = [TYPE_ALIASES.get(game, game) for game in games]
+    specs = []
+    if 'sudoku' in games:
+        # The big boards are left out; solving them dominates every other action.
+        specs.extend({'type': 'sudoku', 'grid': line} for _, line in SUDOKU_CORPUS[:3])
+    if 'word ladder' in games:
+        specs.extend({'type': 'word ladder', 'start': start, 'target': target}
+                     for _, start, target in LADDER_CORPUS[:2])
+    return [synthetic_session(rng.choice(specs), length, rng) for _ in range(count)]
+
+
+def _serve(spec, sender):
+    """Play the puzzle of <spec> in a WebView server on a free port, and send the port to <sender>.
+
+    Runs in a server process. Binding to port 0 lets the system pick the
+    port, so no other process can take it between choosing and binding it.
+
+    @type spec: dict
+    @type sender: multiprocessing.connection.Connection
+    @rtype: None
+    """
+    from controller import Controller
+    from view import WebView
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            WebView(Controller(make_puzzle(spec), None), 0, sender.send).run()
+
+
+def _wait_for_port(receiver, process, timeout=30.0):
+    """Return the port the server started by <process> listens on, once it is sent to <receiver>.
+
+    Raise a RuntimeError if it is not within <timeout> seconds.
+
+    @type receiver: multiprocessing.connection.Connection
+    @type process: multiprocessing.Process
+    @type timeout: float
+    @rtype: int
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.is_alive():
+        if receiver.poll(0.05):
+            return receiver.recv()
+    raise RuntimeError('the server did not start')
+
+
+def replay(session):
+    """Replay <session> against a server of its own and return the start and latency of every action.
+
+    @type session: dict
+    @rtype: list[(str, float, float)]
+        The type, the start time (on the time.perf_counter clock) and the
+        latency in seconds of every action sent.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve, args=(session['puzzle'], sender), daemon=True)
+    process.start()
+    latencies = []
+    try:
+        port = _wait_for_port(receiver, process)
+        url = 'http://localhost:' + str(port) + '/actions?action='
+        for action in session['actions']:
+            start = time.perf_counter()
+            urllib.request.urlopen(url + quote(action)).read()
+            latencies.append((action_type(action), start, time.perf_counter() - start))
+    finally:
+        process.terminate()
+        process.join()
+        receiver.close()
+        sender.close()
+    return latencies
+
+
+def _percentile(samples, fraction):
+    """Return the <fraction> percentile of <samples>, using the nearest rank.
+
+    @type samples: list[float]
+    @type fraction: float
+    @rtype: float
+
+    >>> _percentile([4.0, 1.0, 3.0, 2.0], 0.5)
+    2.0
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _busy_time(intervals):
+    """Return the time during which at least one of the (start, end) <intervals> is going on.
+
+    @type intervals: list[(float, float)]
+    @rtype: float
+
+    >>> _busy_time([(0.0, 2.0), (5.0, 6.0), (1.0, 3.0)])
+    4.0
+    """
+    busy = 0.0
+    end = None
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            busy += stop - start
+            end = stop
+        elif stop > end:
+            busy += stop - end
+            end = stop
+    return busy
+
+
+def run(sessions, concurrency=4):
+    """Replay <sessions>, <concurrency> at a time, and return the report.
+
+    The report has the latency percentiles of every action type, the mean
+    latency of all requests, and the throughput: the number of requests over
+    the time at least one request was in flight, which leaves out the time
+    spent only starting servers.
+
+    @type sessions: list[dict]
+    @type concurrency: int
+    @rtype: dict
+    """
+    by_type = {}
+    intervals = []
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        for latencies in executor.map(replay, sessions):
+            for kind, sent, latency in latencies:
+                by_type.setdefault(kind, []).append(latency)
+                intervals.append((sent, sent + latency))
+    elapsed = time.perf_counter() - start
+    requests = len(intervals)
+    busy = _busy_time(intervals)
+
+    actions = {}
+    for kind, samples in sorted(by_type.items()):
+        actions[kind] = {
+            'count': len(samples),
+            'p50': _percentile(samples, 0.50),
+            'p99': _percentile(samples, 0.99),
+            'mean': statistics.mean(samples),
+        }
+    return {
+        'sessions': len(sessions),
+        'concurrency': concurrency,
+        'requests': requests,
+        'elapsed': elapsed,
+        'busy': busy,
+        'throughput': requests / busy if busy > 0 else None,
+        'mean_latency': statistics.mean(stop - sent for sent, stop in intervals) if requests else None,
+        'actions': actions,
+    }
+
+
+def print_report(report):
+    """Print <report> as a table.
+
+    @type report: dict
+    @rtype: None
+    """
+    print('{} sessions, {} at a time, {} requests in {:.2f}s'.format(
+        report['sessions'], report['concurrency'], report['requests'], report['elapsed']))
+    if report['throughput'] is not None:
+        print('throughput: {:.1f} requests/s over {:.2f}s with requests in flight, mean latency {:.2f} ms'.format(
+            report['throughput'], report['busy'], report['mean_latency'] * 1000))
+    print('{:<12} {:>7} {:>12} {:>12}'.format('action', 'count', 'p50 (ms)', 'p99 (ms)'))
+    for kind, stats in report['actions'].items():
+        print('{:<12} {:>7} {:>12.2f} {:>12.2f}'.format(kind, stats['count'], stats['p50'] * 1000,
+                                                       stats['p99'] * 1000))
+
+
+def main():
+    """Run the load test from the command line.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Replay game sessions against local WebView servers.')
+    parser.add_argument('--replay', help='replay the sessions saved in this JSON file')
+    parser.add_argument('--sessions', type=int, default=20, help='number of synthetic sessions')
+    parser.add_argument('--length', type=int, default=20, help='number of actions per synthetic session')
+    parser.add_argument('--game', choices=['sudoku', 'word ladder', 'ladder', 'both'], default='both')
+    parser.add_argument('--seed', type=int, help='seed for the synthetic sessions')
+    parser.add_argument('--concurrency', type=int, default=4, help='number of sessions replayed at once')
+    parser.add_argument('--save-sessions', help='save the sessions to this JSON file')
+    parser.add_argument('--output', help='save the report to this JSON file')
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay) as f:
+            sessions = json.load(f)
+    else:
+        games = ('sudoku', 'word ladder') if args.game == 'both' else (args.game, )
+        sessions = synthetic_sessions(args.sessions, args.length, games, args.seed)
+    if args.save_sessions:
+        with open(args.save_sessions, 'w') as f:
+            json.dump(sessions, f, indent=1)
+
+    report = run(sessions, args.concurrency)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Opt-in instrumentation of the actions a Controller runs.
+
+An ActionStats records, for every type of action, a latency histogram and
+the number of states the solver explored. It can also run every action under
+cProfile and keep the profiles of the slowest few, so that slow puzzles can
+be found in a live game without attaching a debugger.
+
+The statistics are shown by the :STATS command, and served as JSON by the
+/metrics endpoint of the web view.
+"""
+import heapq
+import io
+import time
+
+# The upper bounds, in milliseconds, of the latency histogram buckets. The last bucket has no upper bound.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# The number of functions shown in every profile kept.
+PROFILE_LINES = 20
+
+
+def action_type(action):
+    """Return the type of <action> under which it is recorded.
+
+    @type action: str
+    @rtype: str
+
+    >>> action_type(':SOLVE-ALL')
+    'solve-all'
+    >>> action_type('(0, 1) -> A')
+    'move'
+    """
+    if action.startswith(':'):
+        return action[1:].lower()
+    elif action == 'exit':
+        return 'exit'
+    else:
+        return 'move'
+
+
+class _Counter:
+    """Solver listener which counts the states explored and passes every event on to another listener."""
+    # === Private attributes ===
+    # @type _listener: (str, Puzzle, int) -> None | None
+    #     The listener every event is passed on to.
+    # === Public attributes ===
+    # @type nodes: int
+    #     The number of states explored so far.
+    # @type cached: bool
+    #     Whether the action was answered from a cache instead of searching.
+    def __init__(self, listener):
+        """Create a new counter passing events on to <listener>.
+
+        @type self: _Counter
+        @type listener: (str, Puzzle, int) -> None | None
+        @rtype: None
+        """
+        self._listener = listener
+        self.nodes = 0
+        self.cached = False
+
+    def __call__(self, event, state, depth):
+        """Count one solver event and pass it on.
+
+        @type self: _Counter
+        @type event: str
+        @type state: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if event == 'expand':
+            self.nodes += 1
+        elif event == 'cached':
+            self.cached = True
+        if self._listener is not None:
+            self._listener(event, state, depth)
+
+
+class ActionStats:
+    """Latency histograms, solver node counts and profiles of the actions of one game.
+
+    === Public attributes ===
+    @type slowest: int
+        The number of slowest actions whose cProfile output is kept; 0 to not profile.
+    """
+    # === Private attributes ===
+    # @type _types: dict[str, dict]
+    #     The statistics of every action type: count, total and max seconds, nodes and histogram bucket counts.
+    # @type _profiles: list[(float, int, str, str)]
+    #     A min-heap of the (seconds, sequence number, action, profile text) of the slowest actions.
+    # @type _sequence: int
+    #     The number of actions recorded, which breaks ties between equally slow actions in _profiles.
+    def __init__(self, slowest=0):
+        """Create empty statistics, keeping the profiles of the <slowest> slowest actions.
+
+        @type self: ActionStats
+        @type slowest: int
+        @rtype: None
+        """
+        self.slowest = slowest
+        self._types = {}
+        self._profiles = []
+        self._sequence = 0
+
+    def record(self, action, run, listener=None):
+        """Run the action <action> by calling <run> with a solver listener, record it and return its result.
+
+        <run> is passed a listener which counts the states the solver explores
+        and passes every event on to <listener>.
+
+        @type self: ActionStats
+        @type action: str
+        @type run: ((str, Puzzle, int) -> None) -> object
+        @type listener: (str, Puzzle, int) -> None | None
+        @rtype: object
+
+        >>> stats = ActionStats()
+        >>> stats.record(':HINT', lambda listener: 'Try entering: cot')
+        'Try entering: cot'
+        >>> stats.to_dict()['actions']['hint']['count']
+        1
+        >>> stats.record(':HINT', lambda listener: listener('cached', None, 0))
+        >>> stats.to_dict()['actions']['hint']['cached']
+        1
+        """
+        counter = _Counter(listener)
+        profile = None
+        if self.slowest > 0:
+            # Imported here so that recording latencies alone does not load the profiler.
+            import cProfile
+            profile = cProfile.Profile()
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            return run(counter)
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            self._add(action_type(action), elapsed, counter.nodes, counter.cached)
+            if profile is not None:
+                self._keep_profile(action, elapsed, profile)
+
+    def _add(self, kind, elapsed, nodes, cached=False):
+        """Add one action of type <kind> which took <elapsed> seconds and explored <nodes> states.
+
+        @type self: ActionStats
+        @type kind: str
+        @type elapsed: float
+        @type nodes: int
+        @type cached: bool
+            Whether the action was answered from a cache instead of searching.
+        @rtype: None
+        """
+        if kind not in self._types:
+            self._types[kind] = {'count': 0, 'total': 0.0, 'max': 0.0, 'nodes': 0, 'cached': 0,
+                                 'histogram': [0] * (len(BUCKETS) + 1)}
+        stats = self._types[kind]
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        stats['nodes'] += nodes
+        if cached:
+            stats['cached'] += 1
+        milliseconds = elapsed * 1000
+        bucket = 0
+        while bucket < len(BUCKETS) and milliseconds > BUCKETS[bucket]:
+            bucket += 1
+        stats['histogram'][bucket] += 1
+
+    def _keep_profile(self, action, elapsed, profile):
+        """Keep the profile of <action> if it is one of the slowest actions so far.
+
+        @type self: ActionStats
+        @type action: str
+        @type elapsed: float
+        @type profile: cProfile.Profile
+        @rtype: None
+        """
+        self._sequence += 1
+        if len(self._profiles) >= self.slowest and elapsed <= self._profiles[0][0]:
+            return
+        import pstats
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        entry = (elapsed, self._sequence, action, text.getvalue())
+        if len(self._profiles) < self.slowest:
+            heapq.heappush(self._profiles, entry)
+        else:
+            heapq.heapreplace(self._profiles, entry)
+
+    def to_dict(self):
+        """Return the statistics as a dictionary which can be written as JSON.
+
+        Times are in milliseconds. The histogram maps the upper bound of every
+        bucket, or 'inf' for the last one, to the number of actions in it.
+
+        @type self: ActionStats
+        @rtype: dict
+        """
+        actions = {}
+        for kind, stats in sorted(self._types.items()):
+            bounds = [str(bound) for bound in BUCKETS] + ['inf']
+            actions[kind] = {
+                'count': stats['count'],
+                'mean': stats['total'] * 1000 / stats['count'],
+                'max': stats['max'] * 1000,
+                'nodes': stats['nodes'],
+                'cached': stats['cached'],
+                'histogram': dict(zip(bounds, stats['histogram'])),
+            }
+        profiles = [{'action': action, 'time': elapsed * 1000, 'profile': text}
+                    for elapsed, _, action, text in sorted(self._profiles, reverse=True)]
+        return {'actions': actions, 'profiles': profiles}
+
+    def report(self):
+        """Return the statistics as a table for the player, followed by the profiles kept.
+
+        @type self: ActionStats
+        @rtype: str
+        """
+        data = self.to_dict()
+        if not data['actions']:
+            return 'No actions recorded yet.'
+        lines = ['{:<12} {:>7} {:>11} {:>11} {:>10} {:>7}'.format('action', 'count', 'mean (ms)', 'max (ms)', 'nodes',
+                                                                 'cached')]
+        for kind, stats in data['actions'].items():
+            lines.append('{:<12} {:>7} {:>11.2f} {:>11.2f} {:>10} {:>7}'.format(kind, stats['count'], stats['mean'],
+                                                                               stats['max'], stats['nodes'],
+                                                                               stats['cached']))
+            buckets = [('>' + str(BUCKETS[-1]) if bound == 'inf' else '<=' + bound) + 'ms: ' + str(count)
+                       for bound, count in stats['histogram'].items() if count > 0]
+            lines.append('    ' + ', '.join(buckets))
+        for profile in data['profiles']:
+            lines.append('')
+            lines.append('Profile of ' + repr(profile['action']) + ' ({:.2f} ms):'.format(profile['time']))
+            lines.append(profile['profile'].rstrip())
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -2,7 +2,13 @@
 
 Works in conjunction with solver.py to enable a generic algorithm
 to solve one-player puzzles.
+
+Every type of puzzle is registered with register(), which records the
+solver strategies that suit it. The solver and the controller look the
+strategies up here instead of checking the type of a puzzle, so a new
+type of puzzle only needs to subclass Puzzle and register itself.
 """
+import importlib
 
 
 class Puzzle:
@@ -17,11 +23,19 @@ class Puzzle:
     and 'extensions' methods.
 
     Subclasses are responsible for tracking the internal state
-    of the puzzle, and implementing four methods:
+    of the puzzle, and implementing five methods:
         - __str__
         - is_solved
-        - extensions
+        - possible_moves
+        - apply_move
         - move
+
+    extensions and iter_extensions are built on possible_moves and
+    apply_move, so a search only builds the states it actually visits.
+
+    To be saved and compared by key, they also implement key, from_key
+    and parse_move. The memory-bounded searches of bounded_search.py also
+    use position and estimate, which have defaults.
     """
     def __str__(self):
         """Return a human-readable representation of this puzzle.
@@ -49,6 +63,38 @@ class Puzzle:
         @type self: Puzzle
         @rtype: list[Puzzle]
         """
+        return list(self.iter_extensions())
+
+    def iter_extensions(self):
+        """Yield the possible new states reachable by one move, in the order of extensions.
+
+        Each state is only built when it is asked for.
+
+        @type self: Puzzle
+        @rtype: iterator[Puzzle]
+        """
+        for move in self.possible_moves():
+            yield self.apply_move(move)
+
+    def possible_moves(self):
+        """Yield the possible moves of this puzzle state, without building the states they lead to.
+
+        A move is in whatever form apply_move of the same type of puzzle takes.
+
+        @type self: Puzzle
+        @rtype: iterator[object]
+        """
+        raise NotImplementedError()
+
+    def apply_move(self, move):
+        """Return the new puzzle state after <move>, one of the moves yielded by possible_moves.
+
+        The move is not checked again.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: Puzzle
+        """
         raise NotImplementedError()
 
     def move(self, move):
@@ -72,3 +118,184 @@ class Puzzle:
         @rtype: str
         """
         raise NotImplementedError()
+
+    def key(self):
+        """Return a compact string which identifies this puzzle state.
+
+        Two states of the same type of puzzle have the same key exactly when
+        they are the same state, and from_key rebuilds the state from its key.
+
+        @type self: Puzzle
+        @rtype: str
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def from_key(cls, key):
+        """Return the puzzle state with the given key.
+
+        @type cls: type
+        @type key: str
+        @rtype: Puzzle
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Return the puzzle described by the dictionary <spec>, as written in session files.
+
+        By default the state is rebuilt from spec['key'] with from_key; puzzle
+        types may also accept friendlier fields.
+
+        @type cls: type
+        @type spec: dict
+        @rtype: Puzzle
+        """
+        return cls.from_key(spec['key'])
+
+    def position(self):
+        """Return a string which identifies where this state is in a search, regardless of how it was reached.
+
+        A search need not visit two states with the same position. By
+        default this is the key.
+
+        @type self: Puzzle
+        @rtype: str
+        """
+        return self.key()
+
+    def estimate(self):
+        """Return an estimate of the number of moves left to a solution; lower is better.
+
+        Used to rank states in a beam search. By default every state ranks the same.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return 0
+
+    def parse_move(self, move):
+        """Return the parts of the move written as <move>, as used by this type of puzzle.
+
+        Raise a ValueError if <move> is not written in the format of this
+        type of puzzle. The move is not checked against the puzzle state.
+
+        @type self: Puzzle
+        @type move: str
+        @rtype: tuple
+        """
+        raise NotImplementedError()
+
+
+class PuzzleType:
+    """The registration of one type of puzzle.
+
+    === Public attributes ===
+    @type name: str
+        The name of the puzzle type, e.g. 'sudoku'.
+    @type puzzle_class: type
+        The Puzzle subclass implementing the puzzle type.
+    @type solve: str
+        The name of the solver strategy which finds one solution.
+    @type solve_all: str
+        The name of the solver strategy which finds all solutions.
+    @type hint: str
+        The name of the solver strategy which finds a hint.
+    @type count: str
+        The name of the solver strategy which counts solutions.
+    """
+    def __init__(self, name, puzzle_class, solve, solve_all, hint, count):
+        """Create a new puzzle type registration.
+
+        @type self: PuzzleType
+        @type name: str
+        @type puzzle_class: type
+        @type solve: str
+        @type solve_all: str
+        @type hint: str
+        @type count: str
+        @rtype: None
+        """
+        self.name = name
+        self.puzzle_class = puzzle_class
+        self.solve = solve
+        self.solve_all = solve_all
+        self.hint = hint
+        self.count = count
+
+
+# Maps every registered Puzzle subclass to its PuzzleType.
+_types = {}
+# Maps the name of every registered puzzle type to its PuzzleType.
+_types_by_name = {}
+# The modules of the puzzle types that come with the game, which register them when imported.
+BUILTIN_MODULES = ['sudoku_puzzle', 'word_ladder_puzzle', 'edit_ladder_puzzle']
+
+
+def _import_builtin_types():
+    """Import the modules of the built-in puzzle types, so that they are registered.
+
+    @rtype: None
+    """
+    for module in BUILTIN_MODULES:
+        importlib.import_module(module)
+
+
+def register(puzzle_class, name, solve='depth', solve_all='complete', hint='depth', count='enumerate'):
+    """Register <puzzle_class> as the puzzle type <name>, solved with the given solver strategies.
+
+    The strategies are names of the strategies in solver.py, e.g. 'depth'
+    for depth-first search or 'breadth' for breadth-first search.
+
+    @type puzzle_class: type
+    @type name: str
+    @type solve: str
+    @type solve_all: str
+    @type hint: str
+    @type count: str
+    @rtype: PuzzleType
+    """
+    puzzle_type = PuzzleType(name, puzzle_class, solve, solve_all, hint, count)
+    _types[puzzle_class] = puzzle_type
+    _types_by_name[name] = puzzle_type
+    return puzzle_type
+
+
+def puzzle_type(puzzle):
+    """Return the registration of the type of <puzzle>.
+
+    A puzzle of an unregistered subclass of a registered class gets the
+    registration of that class.
+
+    @type puzzle: Puzzle
+    @rtype: PuzzleType
+    """
+    cls = type(puzzle)
+    if cls in _types:
+        return _types[cls]
+    for base in cls.__mro__:
+        if base in _types:
+            return _types[base]
+    raise ValueError(cls.__name__ + ' is not a registered puzzle type')
+
+
+def puzzle_type_named(name):
+    """Return the registration of the puzzle type called <name>.
+
+    @type name: str
+    @rtype: PuzzleType
+    """
+    if name not in _types_by_name:
+        _import_builtin_types()
+    if name not in _types_by_name:
+        raise ValueError(name + ' is not a registered puzzle type')
+    return _types_by_name[name]
+
+
+def puzzle_types():
+    """Return the registrations of every puzzle type, in the order they were registered.
+
+    @rtype: list[PuzzleType]
+    """
+    _import_builtin_types()
+    return list(_types_by_name.values())
@@ -0,0 +1,117 @@
+"""Headless driver playing scripted game sessions.
+
+A Controller started without a view is played by feeding the actions of a
+script to Controller.act, one after the other, and collecting what every
+action returned in memory, without any terminal or network I/O. Sessions use
+the same format as load_test.py:
+
+    {"puzzle": {"type": "ladder", "start": "cat", "target": "dog"},
+     "actions": [":DISPLAY", "cot", ":HINT", ":SOLVE"]}
+
+As with the text view, a session stops at the first action which ends the
+game. Many sessions can be played one after the other in this process, or
+spread over a pool of worker processes, since the solver is bound by the CPU
+rather than by I/O:
+
+    python scripted_driver.py --sessions 200 --workers 4 --output results.json
+    python scripted_driver.py --replay sessions.json
+"""
+from controller import Controller
+from load_test import make_puzzle, synthetic_sessions
+import argparse
+import concurrent.futures
+import json
+import time
+
+
+def play(session, speculate=False):
+    """Play <session> in a Controller without a view and return the result of every action.
+
+    Every result has the action, the message and whether the game ended, as
+    Controller.act returns them, the type and key of the state after the
+    action, and the seconds the action took.
+
+    @type session: dict
+    @type speculate: bool
+    @rtype: dict
+
+    >>> result = play({'puzzle': {'type': 'sudoku', 'grid': '...AD.B.C....B.D'},
+    ...                'actions': [':ATTEMPTS', '(0, 0) -> B', ':UNDO', ':ATTEMPTS', ':SOLVE', ':HINT']})
+    >>> [step['done'] for step in result['results']]
+    [False, False, False, False, True]
+    >>> result['results'][3]['message'].splitlines()[-1]
+    "Your move was '(0, 0) -> B'"
+    >>> result['results'][-1]['key']
+    ('sudoku', '...AD.B.C....B.D')
+    """
+    controller = Controller(make_puzzle(session['puzzle']), None, speculate=speculate)
+    results = []
+    try:
+        for action in session['actions']:
+            start = time.perf_counter()
+            message, done = controller.act(action)
+            elapsed = time.perf_counter() - start
+            results.append({'action': action, 'message': message, 'done': done, 'key': controller.state_key(),
+                            'time': elapsed})
+            if done:
+                break
+    finally:
+        # A script may stop before the game ends.
+        controller.close()
+    return {'puzzle': session['puzzle'], 'results': results}
+
+
+def play_all(sessions, workers=1, speculate=False):
+    """Play every session of <sessions> and return their results, in the same order.
+
+    With <workers> greater than 1 the sessions are spread over that many
+    worker processes; otherwise they are played one after the other in this
+    process.
+
+    @type sessions: list[dict]
+    @type workers: int
+    @type speculate: bool
+    @rtype: list[dict]
+    """
+    if workers <= 1:
+        return [play(session, speculate) for session in sessions]
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(play, sessions, [speculate] * len(sessions)))
+
+
+def main():
+    """Play scripted sessions from the command line and report how long they took.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Play scripted game sessions without a view.')
+    parser.add_argument('--replay', help='play the sessions saved in this JSON file')
+    parser.add_argument('--sessions', type=int, default=20, help='number of synthetic sessions')
+    parser.add_argument('--length', type=int, default=20, help='number of actions per synthetic session')
+    parser.add_argument('--game', choices=['sudoku', 'word ladder', 'ladder', 'both'], default='both')
+    parser.add_argument('--seed', type=int, help='seed for the synthetic sessions')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--speculate', action='store_true', help='compute hints in the background after every move')
+    parser.add_argument('--output', help='save the results of every action to this JSON file')
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay) as f:
+            sessions = json.load(f)
+    else:
+        games = ('sudoku', 'word ladder') if args.game == 'both' else (args.game, )
+        sessions = synthetic_sessions(args.sessions, args.length, games, args.seed)
+
+    start = time.perf_counter()
+    results = play_all(sessions, args.workers, args.speculate)
+    elapsed = time.perf_counter() - start
+    actions = sum(len(result['results']) for result in results)
+    print('{} sessions, {} actions in {:.2f}s ({:.1f} actions/s)'.format(len(results), actions, elapsed,
+                                                                        actions / elapsed if elapsed > 0 else 0.0))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+"""Compact binary traces of solver searches, and their offline analysis.
+
+A TraceWriter is a solver listener (see solver.py), so any search of any
+solver entry point can be traced by passing one as its listener. It writes
+every event (expand, solution, prune, backtrack) to a file with the key and
+depth of its state and the time since the previous event. Each key is only
+written out the first time it appears; later events refer to it by number.
+All numbers are varints and the whole file is gzip-compressed, so a trace
+costs a few bytes per event rather than a printed board.
+
+analyze reads a trace back and reports:
+
+- the number of events of every kind and the time the search took;
+- re-expansions: states expanded more than once, which is wasted work;
+- the branching-factor profile: how many states were expanded, pruned and
+  backtracked from at every depth, and how many states each of them led to;
+- hot subtrees: the largest subtrees of a depth-first search which held no
+  solution, each reported at the point where the search went wrong.
+
+    python search_trace.py record slow.trace --sudoku '...AD.B.C....B.D' --entry solve-all
+    python search_trace.py analyze slow.trace --top 5
+"""
+from solver import solve, solve_all, hint, count_solutions
+import argparse
+import gzip
+import heapq
+import time
+
+# The first bytes of every trace file.
+MAGIC = b'PZTRACE1\n'
+
+# The events of the solver listener, by their code in a trace.
+EVENTS = ('expand', 'solution', 'prune', 'backtrack')
+
+# Set in the event byte of a record which introduces a new key.
+_NEW_KEY = 0x80
+
+# The number of bytes of a trace file read at a time.
+_CHUNK = 1 << 16
+
+
+class TraceWriter:
+    """Solver listener which writes every event to a trace file, and passes it on to another listener.
+
+    === Public attributes ===
+    @type events: int
+        The number of events written so far.
+    """
+    # === Private attributes ===
+    # @type _file: gzip.GzipFile
+    #     The compressed trace file.
+    # @type _listener: (str, Puzzle, int) -> None | None
+    #     The listener every event is passed on to.
+    # @type _keys: dict[str, int]
+    #     Maps every key written so far to its number.
+    # @type _last: float
+    #     The time of the previous event, in seconds.
+    def __init__(self, path, listener=None):
+        """Start a new trace in the file <path>.
+
+        @type self: TraceWriter
+        @type path: str
+        @type listener: (str, Puzzle, int) -> None | None
+        @rtype: None
+        """
+        self._file = gzip.open(path, 'wb', compresslevel=1)
+        self._file.write(MAGIC)
+        self._listener = listener
+        self._keys = {}
+        self._last = time.perf_counter()
+        self.events = 0
+
+    def __call__(self, event, state, depth):
+        """Write one solver event and pass it on.
+
+        @type self: TraceWriter
+        @type event: str
+        @type state: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        now = time.perf_counter()
+        key = state.key()
+        code = EVENTS.index(event)
+        number = self._keys.get(key)
+        if number is None:
+            self._keys[key] = len(self._keys)
+            data = key.encode('utf-8')
+            record = bytes([code | _NEW_KEY]) + _varint(len(data)) + data
+        else:
+            record = bytes([code]) + _varint(number)
+        record += _varint(depth) + _varint(int((now - self._last) * 1000000))
+        self._file.write(record)
+        self._last = now
+        self.events += 1
+        if self._listener is not None:
+            self._listener(event, state, depth)
+
+    def close(self):
+        """Finish the trace file.
+
+        @type self: TraceWriter
+        @rtype: None
+        """
+        self._file.close()
+
+
+def read_trace(path):
+    """Yield the events of the trace file <path> as (event, key, depth, seconds since the search started) tuples.
+
+    Raise a ValueError if <path> is not a trace file.
+
+    @type path: str
+    @rtype: iterator[(str, str, int, float)]
+
+    >>> import os, tempfile
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> path = os.path.join(tempfile.mkdtemp(), 'hint.trace')
+    >>> writer = TraceWriter(path)
+    >>> hint(SudokuPuzzle([['A', 'B', 'C', 'D'], ['C', 'D', 'A', 'B'], ['B', 'A', '', ''], ['D', 'C', '', '']]), writer)
+    '(2, 2) -> D'
+    >>> writer.close()
+    >>> [(event, key, depth) for event, key, depth, _ in read_trace(path)][:2]
+    [('expand', 'ABCDCDABBAD.DC..', 1), ('expand', 'ABCDCDABBADCDC..', 2)]
+    """
+    keys = []
+    seconds = 0
+    with gzip.open(path, 'rb') as trace:
+        data = trace.read(_CHUNK)
+        if not data.startswith(MAGIC):
+            raise ValueError(path + ' is not a search trace')
+        i = len(MAGIC)
+        while True:
+            start = i
+            try:
+                code = data[i]
+                i += 1
+                if code & _NEW_KEY:
+                    length, i = _read_varint(data, i)
+                    if i + length > len(data):
+                        raise IndexError()
+                    key = data[i:i + length].decode('utf-8')
+                    i += length
+                else:
+                    number, i = _read_varint(data, i)
+                    key = keys[number]
+                depth, i = _read_varint(data, i)
+                delta, i = _read_varint(data, i)
+            except IndexError:
+                # The record goes on in the next chunk of the file.
+                more = trace.read(_CHUNK)
+                if not more:
+                    if start < len(data):
+                        raise ValueError(path + ' is cut short')
+                    return
+                data = data[start:] + more
+                i = 0
+                continue
+            if code & _NEW_KEY:
+                keys.append(key)
+            seconds += delta
+            yield EVENTS[code & ~_NEW_KEY], key, depth, seconds / 1000000
+
+
+def analyze(path, top=10):
+    """Return the analysis of the trace file <path>, keeping the <top> worst items of every list.
+
+    The analysis is a dictionary which can be written as JSON:
+
+    - 'events' maps every kind of event to its number, and 'seconds' is the
+      time from the first event to the last;
+    - 'states' is the number of different states expanded, and 're_expansions'
+      the number of expansions of states expanded before; 'most_expanded'
+      lists the states expanded most often, as {key, count};
+    - 'depths' lists, for every depth, the states expanded, pruned and
+      backtracked from there, and 'branching', the states expanded at the
+      next depth per state expanded at this one;
+    - 'hot_subtrees' lists the largest subtrees without any solution, as
+      {key, depth, nodes, seconds}. Only subtrees whose parent did lead to a
+      solution, or is where the search started, are listed, since every
+      subtree inside one of them holds no solution either.
+
+    @type path: str
+    @type top: int
+    @rtype: dict
+
+    >>> import os, tempfile
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> path = os.path.join(tempfile.mkdtemp(), 'solve-all.trace')
+    >>> writer = TraceWriter(path)
+    >>> len(solve_all(SudokuPuzzle([['A', '', '', ''], ['', '', 'A', ''], ['', 'A', '', ''], ['', '', '', 'A']]),
+    ...               writer))
+    18
+    >>> writer.close()
+    >>> report = analyze(path)
+    >>> report['events']['solution'], report['re_expansions'], report['depths'][0]['branching']
+    (18, 0, 3.0)
+    """
+    counts = dict.fromkeys(EVENTS, 0)
+    expanded = {}
+    depths = {}
+    # The path of the depth-first search to the current state: [key, depth, expansions before it, start time,
+    # whether it led to a solution, the heap of its largest subtrees without a solution].
+    stack = []
+    hot = []
+    expansions = 0
+    first = last = None
+
+    def close(entry, seconds):
+        """Finish the subtree of a stack entry, passing its subtrees without a solution up to its parent."""
+        key, depth, start, started, fruitful, failed = entry
+        if stack and not fruitful:
+            _keep(stack[-1][5], (expansions - start, key, depth, seconds - started), top)
+        elif fruitful or not stack:
+            for item in failed:
+                _keep(hot, item, top)
+
+    for event, key, depth, seconds in read_trace(path):
+        if first is None:
+            first = seconds
+        last = seconds
+        counts[event] += 1
+        profile = depths.setdefault(depth, {'expanded': 0, 'prune': 0, 'backtrack': 0})
+        if event == 'expand':
+            while stack and stack[-1][1] >= depth:
+                close(stack.pop(), seconds)
+            expanded[key] = expanded.get(key, 0) + 1
+            profile['expanded'] += 1
+            stack.append([key, depth, expansions, seconds, False, []])
+            expansions += 1
+        elif event == 'solution':
+            for entry in stack:
+                entry[4] = True
+        else:
+            profile[event] += 1
+    while stack:
+        close(stack.pop(), last)
+
+    report_depths = []
+    for depth in sorted(depths):
+        profile = depths[depth]
+        following = depths.get(depth + 1, {'expanded': 0})['expanded']
+        report_depths.append({'depth': depth, 'expanded': profile['expanded'], 'pruned': profile['prune'],
+                              'backtracked': profile['backtrack'],
+                              'branching': following / profile['expanded'] if profile['expanded'] else None})
+    repeated = [(count, key) for key, count in expanded.items() if count > 1]
+    return {
+        'events': counts,
+        'seconds': (last - first) if first is not None else 0.0,
+        'states': len(expanded),
+        're_expansions': counts['expand'] - len(expanded),
+        'most_expanded': [{'key': key, 'count': count}
+                          for count, key in heapq.nlargest(top, repeated, key=lambda item: item[0])],
+        'depths': report_depths,
+        'hot_subtrees': [{'key': key, 'depth': depth, 'nodes': nodes, 'seconds': seconds}
+                         for nodes, key, depth, seconds in sorted(hot, reverse=True)],
+    }
+
+
+def format_report(report):
+    """Return the analysis <report> of a trace as text.
+
+    @type report: dict
+    @rtype: str
+    """
+    lines = ['{:.3f}s, '.format(report['seconds']) +
+             ', '.join(str(count) + ' ' + event for event, count in report['events'].items())]
+    lines.append(str(report['states']) + ' states, ' + str(report['re_expansions']) + ' re-expansions')
+    for item in report['most_expanded']:
+        lines.append('    x{:<6} {}'.format(item['count'], item['key']))
+    lines.append('')
+    lines.append('{:>6} {:>10} {:>10} {:>10} {:>10}'.format('depth', 'expanded', 'pruned', 'backtracked',
+                                                           'branching'))
+    for profile in report['depths']:
+        branching = '' if profile['branching'] is None else '{:.2f}'.format(profile['branching'])
+        lines.append('{:>6} {:>10} {:>10} {:>10} {:>10}'.format(profile['depth'], profile['expanded'],
+                                                               profile['pruned'], profile['backtracked'], branching))
+    if report['hot_subtrees']:
+        lines.append('')
+        lines.append('Largest subtrees without a solution:')
+        for item in report['hot_subtrees']:
+            lines.append('{:>10} nodes {:>9.3f}s  depth {:<4} {}'.format(item['nodes'], item['seconds'], item['depth'],
+                                                                     item['key']))
+    return '\n'.join(lines)
+
+
+def _keep(heap, item, top):
+    """Add <item> to the min-heap <heap>, keeping only its <top> largest items.
+
+    @type heap: list
+    @type item: tuple
+    @type top: int
+    @rtype: None
+    """
+    if len(heap) < top:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def _varint(number):
+    """Return <number>, which must not be negative, encoded as a varint: 7 bits per byte, lowest first.
+
+    @type number: int
+    @rtype: bytes
+
+    >>> _varint(5), _varint(300)
+    (b'\\x05', b'\\xac\\x02')
+    """
+    data = bytearray()
+    while number >= 0x80:
+        data.append((number & 0x7f) | 0x80)
+        number >>= 7
+    data.append(number)
+    return bytes(data)
+
+
+def _read_varint(data, i):
+    """Return the varint which starts at index <i> of <data>, and the index after it.
+
+    @type data: bytes
+    @type i: int
+    @rtype: (int, int)
+
+    >>> _read_varint(b'\\xac\\x02', 0)
+    (300, 2)
+    """
+    number = 0
+    shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        number |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return number, i
+        shift += 7
+
+
+def main():
+    """Record or analyze search traces from the command line.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Record and analyze traces of solver searches.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help='trace one search of a puzzle')
+    record.add_argument('path', help='the trace file to write')
+    game = record.add_mutually_exclusive_group(required=True)
+    game.add_argument('--sudoku', metavar='GRID', help='a Sudoku grid on one line, with . for empty squares')
+    game.add_argument('--ladder', nargs=2, metavar=('START', 'TARGET'), help='a word ladder')
+    record.add_argument('--entry', choices=['solve', 'solve-all', 'hint', 'count'], default='solve',
+                        help='the solver entry point to trace')
+    report = commands.add_parser('analyze', help='analyze a trace')
+    report.add_argument('path', help='the trace file to read')
+    report.add_argument('--top', type=int, default=10, help='number of states and subtrees listed')
+    args = parser.parse_args()
+
+    if args.command == 'analyze':
+        print(format_report(analyze(args.path, args.top)))
+        return
+    from load_test import make_puzzle
+    if args.sudoku:
+        puzzle = make_puzzle({'type': 'sudoku', 'grid': args.sudoku})
+    else:
+        puzzle = make_puzzle({'type': 'word ladder', 'start': args.ladder[0], 'target': args.ladder[1]})
+    writer = TraceWriter(args.path)
+    try:
+        if args.entry == 'solve':
+            solve(puzzle, listener=writer)
+        elif args.entry == 'solve-all':
+            for _ in solve_all(puzzle, writer):
+                pass
+        elif args.entry == 'hint':
+            hint(puzzle, writer)
+        else:
+            count_solutions(puzzle, listener=writer)
+    finally:
+        writer.close()
+    print(str(writer.events) + ' events written to ' + args.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Persistent storage of game sessions.
+
+A session is saved as the key of its starting puzzle and the tree of moves
+the player made, not as puzzle objects. Every state in the tree is a node
+numbered in the order it was reached; the starting state is node 0. For
+every other node only its parent node and the move that led to it are
+stored, plus which node the player is currently at.
+
+Saving is incremental: a new move adds one row, and undoing a move or
+repeating an earlier one only updates the current node. Restoring replays
+the moves on the starting puzzle.
+"""
+from puzzle import puzzle_type as registered_type, puzzle_type_named
+import sqlite3
+import uuid
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    puzzle_type TEXT NOT NULL,
+    puzzle_key TEXT NOT NULL,
+    current INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS moves (
+    session TEXT NOT NULL,
+    node INTEGER NOT NULL,
+    parent INTEGER NOT NULL,
+    move TEXT NOT NULL,
+    PRIMARY KEY (session, node)
+);
+'''
+
+
+def puzzle_key(puzzle):
+    """Return the type and the key of <puzzle>, from which puzzle_from_key can build it again.
+
+    @type puzzle: Puzzle
+    @rtype: (str, str)
+
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> puzzle_key(SudokuPuzzle([['A', ''], ['', 'B']]))
+    ('sudoku', 'A..B')
+    """
+    return registered_type(puzzle).name, puzzle.key()
+
+
+def puzzle_from_key(puzzle_type, key):
+    """Return the puzzle with the given type and key, as returned by puzzle_key.
+
+    @type puzzle_type: str
+    @type key: str
+    @rtype: Puzzle
+    """
+    return puzzle_type_named(puzzle_type).puzzle_class.from_key(key)
+
+
+class SessionStore:
+    """Game sessions saved in a SQLite database file."""
+    # === Private attributes ===
+    # @type _connection: sqlite3.Connection
+    #     The connection to the database.
+    def __init__(self, path):
+        """Open the session store in the database file <path>, creating it if needed.
+
+        Use ':memory:' for a store that is not saved to disk.
+
+        @type self: SessionStore
+        @type path: str
+        @rtype: None
+        """
+        self._connection = sqlite3.connect(path)
+        # Every move is one small transaction; the write-ahead log keeps those cheap.
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database.
+
+        @type self: SessionStore
+        @rtype: None
+        """
+        self._connection.close()
+
+    def create(self, puzzle, session=None):
+        """Save a new session starting at <puzzle> and return its id.
+
+        A new id is made up if <session> is None.
+
+        @type self: SessionStore
+        @type puzzle: Puzzle
+        @type session: str | None
+        @rtype: str
+        """
+        if session is None:
+            session = uuid.uuid4().hex
+        puzzle_type, key = puzzle_key(puzzle)
+        with self._connection:
+            self._connection.execute('INSERT INTO sessions VALUES (?, ?, ?, 0)', (session, puzzle_type, key))
+        return session
+
+    def __contains__(self, session):
+        """Return whether the session <session> is saved in this store.
+
+        @type self: SessionStore
+        @type session: str
+        @rtype: bool
+        """
+        row = self._connection.execute('SELECT 1 FROM sessions WHERE id = ?', (session, )).fetchone()
+        return row is not None
+
+    def add_move(self, session, node, parent, move):
+        """Save that <move> at node <parent> led to the new node <node>, which is now the current node.
+
+        @type self: SessionStore
+        @type session: str
+        @type node: int
+        @type parent: int
+        @type move: str
+        @rtype: None
+        """
+        with self._connection:
+            self._connection.execute('INSERT INTO moves VALUES (?, ?, ?, ?)', (session, node, parent, move))
+            self._connection.execute('UPDATE sessions SET current = ? WHERE id = ?', (node, session))
+
+    def set_current(self, session, node):
+        """Save that the player is now at the existing node <node>.
+
+        @type self: SessionStore
+        @type session: str
+        @type node: int
+        @rtype: None
+        """
+        with self._connection:
+            self._connection.execute('UPDATE sessions SET current = ? WHERE id = ?', (node, session))
+
+    def truncate(self, session, node, current):
+        """Delete the moves of <node> and every later node, and save that the player is now at <current>.
+
+        Used when those moves can no longer be replayed; <current> must be an
+        earlier node.
+
+        @type self: SessionStore
+        @type session: str
+        @type node: int
+        @type current: int
+        @rtype: None
+        """
+        with self._connection:
+            self._connection.execute('DELETE FROM moves WHERE session = ? AND node >= ?', (session, node))
+            self._connection.execute('UPDATE sessions SET current = ? WHERE id = ?', (current, session))
+
+    def load(self, session):
+        """Return the starting puzzle, the moves and the current node of <session>.
+
+        The moves are (node, parent, move) tuples, in the order the nodes were
+        reached, so that every parent comes before its children.
+
+        @type self: SessionStore
+        @type session: str
+        @rtype: (Puzzle, list[(int, int, str)], int)
+        """
+        row = self._connection.execute('SELECT puzzle_type, puzzle_key, current FROM sessions WHERE id = ?',
+                                       (session, )).fetchone()
+        if row is None:
+            raise KeyError(session)
+        moves = self._connection.execute('SELECT node, parent, move FROM moves WHERE session = ? ORDER BY node',
+                                         (session, )).fetchall()
+        return puzzle_from_key(row[0], row[1]), moves, row[2]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -2,14 +2,27 @@
 
 This module can be used to take a puzzle and generate one or all
 possible solutions. It can also generate hints for a puzzle.
+
+solve, solve_all, hint and count_solutions use the strategies each type of
+puzzle registered with puzzle.register; the strategies are looked up by name
+in SOLVE_STRATEGIES, SOLVE_ALL_STRATEGIES, HINT_STRATEGIES and
+COUNT_STRATEGIES.
+
+Every search reports its progress to an optional listener, called with an
+event name, a state and its depth. A search sends 'expand' for every state it
+explores and 'solution' for every solution. The depth-first searches also
+send 'prune' for a state they give up on without exploring any extension (it
+has none, or it is at the depth limit), and 'backtrack' when they leave a
+state whose extensions they explored without ending the search there.
+An answer taken from a cache instead of a search (see hint_worker) sends a
+single 'cached' event for the state asked about. Listeners ignore the events
+they do not need.
 """
-from puzzle import Puzzle
-from sudoku_puzzle import SudokuPuzzle
-from word_ladder_puzzle import WordLadderPuzzle
+from puzzle import Puzzle, puzzle_type
 import collections
 
 
-def solve(puzzle, verbose=False):
+def solve(puzzle, verbose=False, listener=None):
     """Return a solution of the puzzle.
 
     Even if there is only one possible solution, just return one of them.
@@ -18,58 +31,144 @@ def solve(puzzle, verbose=False):
     @type puzzle: Puzzle
     @type verbose: bool
         Whether every state explored should be printed out.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: Puzzle | None
         A solution to puzzle or None if the puzzle cannot be solved.
     """
-    if type(puzzle) == SudokuPuzzle:
-        return solve_depth(puzzle)
-    else:
-        return solve_breadth(puzzle)
+    return SOLVE_STRATEGIES[puzzle_type(puzzle).solve](puzzle, verbose, listener)
+
+
+def solve_all(puzzle, listener=None):
+    """Return the solutions of the puzzle, using the solve-all strategy of its type.
+
+    The solutions may be produced lazily, as an iterator. What counts as a
+    solution depends on the strategy: every solution of a Sudoku, but only
+    the shortest ladders of a word ladder.
+
+    @type puzzle: Puzzle
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
+        Every solution is reported as soon as it is found.
+    @rtype: iterable[Puzzle]
+    """
+    return SOLVE_ALL_STRATEGIES[puzzle_type(puzzle).solve_all](puzzle, listener)
+
+
+def hint(puzzle, listener=None):
+    """Return a hint for the puzzle, using the hint strategy of its type.
+
+    If <puzzle> is already solved, return the string 'Already at a solution!'
+    If <puzzle> cannot lead to a solution, return the string 'No possible extensions!'
+
+    @type puzzle: Puzzle
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
+    @rtype: str
+    """
+    return HINT_STRATEGIES[puzzle_type(puzzle).hint](puzzle, listener)
+
+
+def count_solutions(puzzle, limit=None, listener=None):
+    """Return the number of solutions of the puzzle, using the count strategy of its type.
+
+    The count stops as soon as it reaches <limit>, so count_solutions(puzzle, 2)
+    tells 0, 1 or many solutions apart for a fraction of the cost of counting
+    them all. No solution states are kept. A <limit> of 0 or less counts
+    nothing and returns 0 at once.
+
+    What counts as a solution depends on the strategy: every solution of a
+    Sudoku, but only the shortest ladders of a word ladder.
+
+    @type puzzle: Puzzle
+    @type limit: int | None
+        The count at which to stop, or None to count every solution.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
+    @rtype: int
+
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> s = SudokuPuzzle([['A', '', '', ''], ['', '', 'A', ''], ['', 'A', '', ''], ['', '', '', 'A']])
+    >>> count_solutions(s), count_solutions(s, 2)
+    (18, 2)
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> count_solutions(WordLadderPuzzle('stone', 'slate'))
+    6
+    >>> count_solutions(s, 0), count_solutions(WordLadderPuzzle('stone', 'slate'), 0)
+    (0, 0)
+    """
+    if limit is not None and limit <= 0:
+        return 0
+    return COUNT_STRATEGIES[puzzle_type(puzzle).count](puzzle, limit, listener)
 
 
-def solve_depth(puzzle, verbose=False):
+def solve_depth(puzzle, verbose=False, listener=None):
     """Return a solution of the puzzle by searching possible game states using depth-first search.
 
     In 'verbose' mode, print out every state explored in addition to
     the final solution. By default 'verbose' mode is disabled.
 
     Uses a recursive algorithm to exhaustively try all possible
-    sequences of moves (using the 'extensions' method of the Puzzle
+    sequences of moves (using the 'iter_extensions' method of the Puzzle
     interface) until it finds a solution.
 
     @type puzzle: SudokuPuzzle
     @type verbose: bool
         Whether every state explored should be printed out.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: Puzzle | None
         A solution to puzzle or None if the puzzle cannot be solved.
     """
+    return _solve_depth(puzzle, verbose, listener, 0)
+
+
+def _solve_depth(puzzle, verbose, listener, depth):
+    """Helper for solve_depth which keeps track of the depth of <puzzle> in the search.
+
+    @type puzzle: Puzzle
+    @type verbose: bool
+    @type listener: (str, Puzzle, int) -> None | None
+    @type depth: int
+    @rtype: Puzzle | None
+    """
+    if listener is not None:
+        listener('expand', puzzle, depth)
     if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, depth)
         return puzzle
     else:
-        for new_state in puzzle.extensions():
+        explored = False
+        for new_state in puzzle.iter_extensions():
+            explored = True
             if verbose:
                 print(new_state)
-            state = solve_depth(new_state, verbose)
+            state = _solve_depth(new_state, verbose, listener, depth + 1)
             if state:
                 return state
+        if listener is not None:
+            listener('backtrack' if explored else 'prune', puzzle, depth)
         return None
 
 
-def solve_breadth(puzzle):
+def solve_breadth(puzzle, listener=None):
     """Return a solution of the puzzle using breadth-first search.
 
     @type puzzle: WordLadderPuzzle
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: Puzzle | None
         A solution to puzzle or None if the puzzle cannot be solved.
     """
-    solution = solve_in_breadth(puzzle, hint=False)
+    solution = solve_in_breadth(puzzle, hint=False, listener=listener)
     if solution[0]:
         return solution[1]
     else:
         return None
 
 
-def solve_complete(puzzle, verbose=False):
+def solve_complete(puzzle, verbose=False, listener=None):
     """Return all solutions of the puzzle.
 
     Return an empty list if there are no possible solutions.
@@ -78,28 +177,51 @@ def solve_complete(puzzle, verbose=False):
     the final solution. By default 'verbose' mode is disabled.
 
     Uses a recursive algorithm to exhaustively try all possible
-    sequences of moves (using the 'extensions' method of the Puzzle
+    sequences of moves (using the 'iter_extensions' method of the Puzzle
     interface) until it finds all solutions.
 
     @type puzzle: Puzzle
     @type verbose: bool
         Whether every state explored should be printed out.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
+        Every solution is reported as soon as it is found.
     @rtype: list[Puzzle] | None
         A list of all solutions to the puzzle.
     """
+    solutions = []
+    _solve_complete(puzzle, verbose, listener, 0, solutions)
+    return solutions
+
+
+def _solve_complete(puzzle, verbose, listener, depth, solutions):
+    """Helper for solve_complete which appends every solution reachable from <puzzle> to <solutions>.
+
+    @type puzzle: Puzzle
+    @type verbose: bool
+    @type listener: (str, Puzzle, int) -> None | None
+    @type depth: int
+    @type solutions: list[Puzzle]
+    @rtype: None
+    """
+    if listener is not None:
+        listener('expand', puzzle, depth)
     if puzzle.is_solved():
-        return [puzzle]
+        if listener is not None:
+            listener('solution', puzzle, depth)
+        solutions.append(puzzle)
     else:
-        solutions = []
-        for new_state in puzzle.extensions():
+        explored = False
+        for new_state in puzzle.iter_extensions():
+            explored = True
             if verbose:
                 print(new_state)
-            if solve_complete(new_state, verbose):
-                solutions.extend(solve_complete(new_state, verbose))
-        return solutions
+            _solve_complete(new_state, verbose, listener, depth + 1, solutions)
+        if listener is not None:
+            listener('backtrack' if explored else 'prune', puzzle, depth)
 
 
-def hint_by_depth(puzzle, n=100):
+def hint_by_depth(puzzle, n=100, listener=None):
     """Return a hint for the given puzzle state using depth-first search. Used for Sudoku puzzle.
 
     If <puzzle> is already solved, return the string 'Already at a solution!'
@@ -108,13 +230,15 @@ def hint_by_depth(puzzle, n=100):
     @type puzzle: SudokuPuzzle
     @type n: int
         The 'depth' / number of moves that should be explored. Default is 100 to prevent search from taking too long.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: str
     """
     if puzzle.is_solved():
         return 'Already at a solution!'
     else:
-        for extension in puzzle.extensions():
-            if solve_in_depth(extension, n - 1):
+        for extension in puzzle.iter_extensions():
+            if _solve_in_depth(extension, n - 1, listener, 1):
                 return puzzle.generate_strings(extension)
         # for extension in puzzle.extensions():
         #     if valid_state(extension, n - 1):
@@ -122,23 +246,47 @@ def hint_by_depth(puzzle, n=100):
         return 'No possible extensions!'
 
 
-def solve_in_depth(puzzle, n):
+def solve_in_depth(puzzle, n, listener=None):
     """Returns whether or not the puzzle can be solved in the next <n> steps.
 
     @type puzzle: Puzzle
     @type n: int
         The 'depth' / number of moves that should be explored.
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: bool
     """
+    return _solve_in_depth(puzzle, n, listener, 0)
+
+
+def _solve_in_depth(puzzle, n, listener, depth):
+    """Helper for solve_in_depth which keeps track of the depth of <puzzle> in the search.
+
+    @type puzzle: Puzzle
+    @type n: int
+    @type listener: (str, Puzzle, int) -> None | None
+    @type depth: int
+    @rtype: bool
+    """
+    if listener is not None:
+        listener('expand', puzzle, depth)
     if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, depth)
         return True
     elif n == 0:
+        if listener is not None:
+            listener('prune', puzzle, depth)
         return False
     else:
-        for extension in puzzle.extensions():
-            sol = solve_in_depth(extension, n - 1)
+        explored = False
+        for extension in puzzle.iter_extensions():
+            explored = True
+            sol = _solve_in_depth(extension, n - 1, listener, depth + 1)
             if sol:
                 return sol
+        if listener is not None:
+            listener('backtrack' if explored else 'prune', puzzle, depth)
     return False
 
 
@@ -151,49 +299,58 @@ def valid_state(puzzle, n):
     @rtype: bool
     """
     if n == 0:
-        if len(puzzle.extensions()) > 0:
+        if next(puzzle.iter_extensions(), None) is not None:
             return True
     else:
-        for extension in puzzle.extensions():
+        for extension in puzzle.iter_extensions():
             sol = valid_state(extension, n - 1)
             if sol:
                 return sol
     return False
 
 
-def hint_by_breadth(puzzle):
+def hint_by_breadth(puzzle, listener=None):
     """Return a hint for the given puzzle. Used for word ladder puzzle.
 
     If <puzzle> is already solved, return the string 'Already at a solution!'
     If <puzzle> cannot lead to a solution, return the string 'No possible extensions!'
 
     @type puzzle: WordLadderPuzzle
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: str
     """
     if puzzle.is_solved():
         return 'Already at a solution!'
     else:
-        solution = solve_in_breadth(puzzle)
+        solution = solve_in_breadth(puzzle, listener=listener)
         if solution[0]:
             return solution[1]
         return 'No possible extensions!'
 
 
-def solve_in_breadth(puzzle, hint=True):
+def solve_in_breadth(puzzle, hint=True, listener=None):
     """Returns whether or not the puzzle can be solved using breadth-first search . If it can be solved, return the
     next word to be inputted if hint is true, otherwise return the final solved puzzle.
 
     @type puzzle: WordLadderPuzzle
+    @type hint: bool
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
     @rtype: (bool, str)
     """
     queue = collections.deque()
-    queue.append(puzzle)
+    queue.append((puzzle, 0))
     used_words = []
     while len(queue) > 0:
-        extensions = queue.popleft().extensions()
-        for extension in extensions:
+        state, depth = queue.popleft()
+        if listener is not None:
+            listener('expand', state, depth)
+        for extension in state.iter_extensions():
             extension.add_tried_words(used_words)
             if extension.is_solved():
+                if listener is not None:
+                    listener('solution', extension, depth + 1)
                 if hint:
                     chain = extension.used_words()
                     i = chain.index(puzzle.start_word())
@@ -201,6 +358,264 @@ def solve_in_breadth(puzzle, hint=True):
                 else:
                     return True, extension
             else:
-                queue.append(extension)
+                queue.append((extension, depth + 1))
                 used_words.append(puzzle.generate_strings(extension))
     return False, None
+
+
+def _solve_breadth(puzzle, verbose=False, listener=None):
+    """Return solve_breadth, for SOLVE_STRATEGIES. Breadth-first search has no verbose mode.
+
+    @type puzzle: Puzzle
+    @type verbose: bool
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: Puzzle | None
+    """
+    return solve_breadth(puzzle, listener)
+
+
+def _hint_by_depth(puzzle, listener=None):
+    """Return hint_by_depth with the default depth, for HINT_STRATEGIES.
+
+    @type puzzle: Puzzle
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: str
+    """
+    return hint_by_depth(puzzle, listener=listener)
+
+
+def _count_by_enumeration(puzzle, limit=None, listener=None):
+    """Return the number of solutions of the puzzle, up to <limit>, by depth-first search over its extensions.
+
+    @type puzzle: Puzzle
+    @type limit: int | None
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: int
+    """
+    return _count_complete(puzzle, limit, listener, 0)
+
+
+def _count_complete(puzzle, limit, listener, depth):
+    """Helper for _count_by_enumeration which counts the solutions reachable from <puzzle>, up to <limit>.
+
+    @type puzzle: Puzzle
+    @type limit: int | None
+    @type listener: (str, Puzzle, int) -> None | None
+    @type depth: int
+    @rtype: int
+    """
+    if listener is not None:
+        listener('expand', puzzle, depth)
+    if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, depth)
+        return 1
+    count = 0
+    explored = False
+    for new_state in puzzle.iter_extensions():
+        explored = True
+        count += _count_complete(new_state, None if limit is None else limit - count, listener, depth + 1)
+        if limit is not None and count >= limit:
+            return count
+    if listener is not None:
+        listener('backtrack' if explored else 'prune', puzzle, depth)
+    return count
+
+
+def _count_by_bitmask(puzzle, limit=None, listener=None):
+    """Return the number of solutions of the Sudoku puzzle, up to <limit>, with the bitmask counter of the generator.
+
+    The counter does not build puzzle states, so it cannot report them: a
+    count with a listener is done by _count_by_enumeration instead, so that the
+    listener sees every state. The counter also only knows rows, columns and
+    the default subsquares, so boards of any other shape are enumerated too.
+
+    @type puzzle: SudokuPuzzle
+    @type limit: int | None
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: int
+
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['C', 'D', 'A', 'B'], ['B', 'A', '', ''], ['D', 'C', '', '']])
+    >>> events = []
+    >>> _count_by_bitmask(s, listener=lambda event, state, depth: events.append(event))
+    1
+    >>> events.count('expand'), events.count('solution')
+    (5, 1)
+    """
+    if listener is not None or puzzle.geometry().spec:
+        return _count_by_enumeration(puzzle, limit, listener)
+    from sudoku_generator import count_solutions as count_grid_solutions
+    return count_grid_solutions(puzzle.grid(), limit)[0]
+
+
+def _count_shortest_ladders(puzzle, limit=None, listener=None):
+    """Return the number of shortest ladders of the word ladder puzzle, up to <limit>, by breadth-first search.
+
+    Every word counts the shortest ladders reaching it, which is the sum of
+    the counts of the words of the previous layer next to it, so no ladder is
+    ever built. The count stops as soon as it reaches <limit> for the target.
+
+    @type puzzle: WordLadderPuzzle
+    @type limit: int | None
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: int
+    """
+    if puzzle.is_solved():
+        return 1
+    target = puzzle.target_word()
+    counts = {puzzle.start_word(): 1}
+    for word, new_word in _shortest_ladder_edges(puzzle, listener):
+        counts[new_word] = counts.get(new_word, 0) + counts[word]
+        if limit is not None and counts[new_word] >= limit:
+            counts[new_word] = limit
+            if new_word == target:
+                return limit
+    return counts.get(target, 0)
+
+
+def _shortest_ladder_edges(puzzle, listener=None):
+    """Yield the edges (word, new word) of the breadth-first layers of the word ladder puzzle, layer by layer.
+
+    The search starts at the current word and only follows words not in
+    the ladder yet. An edge joins a word to a word of the next layer, so every
+    shortest ladder to a word is made of edges. The search stops once the
+    layer of the target word is complete.
+
+    @type puzzle: WordLadderPuzzle
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: iterator[(str, str)]
+    """
+    start, target = puzzle.start_word(), puzzle.target_word()
+    depths = {start: 0}
+    layer = [start]
+    depth = 0
+    while layer and target not in depths:
+        next_layer = []
+        for word in layer:
+            if listener is not None:
+                listener('expand', puzzle if word == start else puzzle.apply_move(word), depth)
+            for new_word in puzzle.neighbours(word):
+                if new_word not in depths:
+                    depths[new_word] = depth + 1
+                    next_layer.append(new_word)
+                if depths[new_word] == depth + 1:
+                    yield word, new_word
+        layer = next_layer
+        depth += 1
+
+
+def shortest_ladder_graph(puzzle, listener=None):
+    """Return the words which follow every word on a shortest ladder of the unsolved word ladder puzzle.
+
+    The graph maps every word of a shortest ladder, from the current word on,
+    to the words which follow it on some shortest ladder, in alphabetical
+    order. It is empty if the target cannot be reached.
+
+    @type puzzle: WordLadderPuzzle
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: dict[str, list[str]]
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> shortest_ladder_graph(WordLadderPuzzle('cat', 'dog'))['cot']
+    ['cog', 'dot']
+    """
+    target = puzzle.target_word()
+    parents = {}
+    for word, new_word in _shortest_ladder_edges(puzzle, listener):
+        parents.setdefault(new_word, []).append(word)
+    if target not in parents:
+        return {}
+
+    # Keep the edges on a shortest ladder to the target, from the target back to the start.
+    children = {}
+    stack = [target]
+    seen = {target}
+    while stack:
+        word = stack.pop()
+        for parent in parents.get(word, []):
+            children.setdefault(parent, []).append(word)
+            if parent not in seen:
+                seen.add(parent)
+                stack.append(parent)
+    for words in children.values():
+        words.sort()
+    return children
+
+
+def iter_shortest_ladders(puzzle, listener=None):
+    """Yield every shortest solution of the word ladder puzzle, in alphabetical order of their ladders.
+
+    The layers of a breadth-first search are built once, as a graph of the
+    edges between consecutive layers. Only the words with a path on to the
+    target are kept, and the ladders are then read off that graph one at a
+    time, so no dead end is ever explored twice.
+
+    @type puzzle: WordLadderPuzzle
+    @type listener: (str, Puzzle, int) -> None | None
+        Called with an event name (see above), the state and its depth as the search runs.
+    @rtype: iterator[WordLadderPuzzle]
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> for solution in iter_shortest_ladders(WordLadderPuzzle('cat', 'dog')):
+    ...     print(' -> '.join(solution.used_words()))
+    cat -> cot -> cog -> dog
+    cat -> cot -> dot -> dog
+    """
+    if puzzle.is_solved():
+        if listener is not None:
+            listener('solution', puzzle, 0)
+        yield puzzle
+        return
+    target = puzzle.target_word()
+    children = shortest_ladder_graph(puzzle, listener)
+    if not children:
+        return
+
+    # Read the ladders off the graph depth-first, one state per word on the current ladder.
+    path = [(puzzle, iter(children[puzzle.start_word()]))]
+    while path:
+        state, words = path[-1]
+        word = next(words, None)
+        if word is None:
+            path.pop()
+        elif word == target:
+            solution = state.apply_move(word)
+            if listener is not None:
+                listener('solution', solution, len(path))
+            yield solution
+        else:
+            path.append((state.apply_move(word), iter(children[word])))
+
+
+def _solve_all_complete(puzzle, listener=None):
+    """Return solve_complete, for SOLVE_ALL_STRATEGIES.
+
+    @type puzzle: Puzzle
+    @type listener: (str, Puzzle, int) -> None | None
+    @rtype: list[Puzzle]
+    """
+    return solve_complete(puzzle, listener=listener)
+
+
+# The strategies a type of puzzle can register, by name. Every solve strategy
+# is called with (puzzle, verbose, listener), every solve-all and hint
+# strategy with (puzzle, listener) and every count strategy with
+# (puzzle, limit, listener).
+SOLVE_STRATEGIES = {
+    'depth': solve_depth,
+    'breadth': _solve_breadth,
+}
+HINT_STRATEGIES = {
+    'depth': _hint_by_depth,
+    'breadth': hint_by_breadth,
+}
+SOLVE_ALL_STRATEGIES = {
+    'complete': _solve_all_complete,
+    'shortest ladders': iter_shortest_ladders,
+}
+COUNT_STRATEGIES = {
+    'enumerate': _count_by_enumeration,
+    'bitmask': _count_by_bitmask,
+    'shortest ladders': _count_shortest_ladders,
+}
@@ -0,0 +1,246 @@
+"""Batch validation and screening of many Sudoku boards at once.
+
+Boards are loaded into one integer array of shape (k, n, n), where 0 is an
+empty square and 1 to n stand for the letters A to the n-th letter. Rows,
+columns and subsquares of all k boards are then checked, and the possible
+letters of every empty square computed, with whole-array NumPy operations
+instead of one SudokuPuzzle at a time. The boards which survive the screen
+can then be handed to the regular solver.
+
+NumPy is optional. Without it, the same functions work on nested lists,
+one board at a time.
+"""
+from sudoku_puzzle import SudokuPuzzle
+from sudoku_geometry import CHARS
+from solver import solve
+from math import sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The number of boards checked per NumPy operation, which bounds the memory used.
+CHUNK_SIZE = 4096
+
+
+def load_boards(lines):
+    """Return the boards written on <lines> (see sudoku_generator.to_line) as an array of shape (k, n, n).
+
+    Empty squares are 0 and letters are numbered from 1. A character which is
+    not a letter available on the board is stored as n + 1, so that the board
+    fails check_boards. All boards must have the same size. Without NumPy, a
+    list of boards, each a list of rows, is returned instead.
+
+    @type lines: list[str]
+    @rtype: numpy.ndarray | list[list[list[int]]]
+
+    >>> boards = load_boards(['A...' + '.' * 12, 'BA.E' + '.' * 12])
+    >>> [int(value) for value in boards[1][0]]
+    [2, 1, 0, 5]
+    """
+    boards = [_parse(line) for line in lines]
+    if numpy is None:
+        return boards
+    if not boards:
+        return numpy.zeros((0, 0, 0), dtype=numpy.int8)
+    return numpy.array(boards, dtype=numpy.int8)
+
+
+def _parse(line):
+    """Return the board written on <line> as a list of rows of numbered letters.
+
+    @type line: str
+    @rtype: list[list[int]]
+    """
+    n = int(sqrt(len(line)))
+    if n * n != len(line) or int(sqrt(n)) ** 2 != n:
+        raise ValueError('a board of ' + str(len(line)) + ' squares is not a Sudoku board')
+    values = []
+    for letter in line:
+        if letter == '.':
+            values.append(0)
+        elif letter in CHARS[:n]:
+            values.append(CHARS.index(letter) + 1)
+        else:
+            values.append(n + 1)
+    return [values[r * n:(r + 1) * n] for r in range(n)]
+
+
+def to_grid(board):
+    """Return <board>, one board of load_boards, as a grid for SudokuPuzzle.
+
+    @type board: numpy.ndarray | list[list[int]]
+    @rtype: list[list[str]]
+    """
+    return [[CHARS[value - 1] if value > 0 else '' for value in row] for row in _rows(board)]
+
+
+def _rows(board):
+    """Return the rows of <board> as lists of ints.
+
+    @type board: numpy.ndarray | list[list[int]]
+    @rtype: list[list[int]]
+    """
+    if numpy is not None and isinstance(board, numpy.ndarray):
+        return board.tolist()
+    return board
+
+
+def _units(boards):
+    """Return the rows, columns and subsquares of every board, as an array of shape (k, 3n, n).
+
+    @type boards: numpy.ndarray
+    @rtype: numpy.ndarray
+    """
+    k, n = boards.shape[0], boards.shape[1]
+    m = int(sqrt(n))
+    # Axes: board, band, row in band, stack, column in stack.
+    boxes = boards.reshape(k, m, m, m, m).transpose(0, 1, 3, 2, 4).reshape(k, n, n)
+    return numpy.concatenate([boards, boards.transpose(0, 2, 1), boxes], axis=1)
+
+
+def check_boards(boards):
+    """Return whether each board has only available letters, none of them twice in a row, column or subsquare.
+
+    @type boards: numpy.ndarray | list[list[list[int]]]
+    @rtype: numpy.ndarray | list[bool]
+
+    >>> [bool(valid) for valid in check_boards(load_boards(['A..B' + '.' * 12, 'AA..' + '.' * 12, 'E' + '.' * 15]))]
+    [True, False, False]
+    """
+    if numpy is None:
+        return [_check_board(board) for board in boards]
+    result = numpy.ones(len(boards), dtype=bool)
+    for start in range(0, len(boards), CHUNK_SIZE):
+        chunk = boards[start:start + CHUNK_SIZE]
+        n = chunk.shape[1]
+        units = numpy.sort(_units(chunk), axis=2)
+        repeated = (units[:, :, 1:] == units[:, :, :-1]) & (units[:, :, 1:] > 0)
+        unavailable = (chunk > n) | (chunk < 0)
+        result[start:start + CHUNK_SIZE] = ~(repeated.any(axis=(1, 2)) | unavailable.any(axis=(1, 2)))
+    return result
+
+
+def _check_board(board):
+    """Return whether <board> passes check_boards, one board at a time.
+
+    @type board: list[list[int]]
+    @rtype: bool
+    """
+    n = len(board)
+    m = int(sqrt(n))
+    units = [row for row in board]
+    units.extend([row[c] for row in board] for c in range(n))
+    units.extend([board[r + i][c + j] for i in range(m) for j in range(m)]
+                 for r in range(0, n, m) for c in range(0, n, m))
+    for unit in units:
+        values = [value for value in unit if value != 0]
+        if len(values) != len(set(values)) or any(value > n for value in values):
+            return False
+    return True
+
+
+def candidate_masks(boards):
+    """Return the possible letters of every empty square of every board, as a bitmask.
+
+    Bit i is set if the (i + 1)-th letter is not used yet in the row, column
+    or subsquare of the square. Filled in squares have a mask of 0.
+
+    @type boards: numpy.ndarray | list[list[list[int]]]
+    @rtype: numpy.ndarray | list[list[list[int]]]
+
+    >>> [bin(mask) for mask in candidate_masks(load_boards(['A...' + '.' * 12]))[0][0]]
+    ['0b0', '0b1110', '0b1110', '0b1110']
+    """
+    if numpy is None:
+        return [_candidate_mask(board) for board in boards]
+    k, n = boards.shape[0], boards.shape[1]
+    m = int(sqrt(n))
+    full = (1 << n) - 1
+    box_index = (numpy.arange(n)[:, None] // m) * m + numpy.arange(n)[None, :] // m
+    result = numpy.zeros(boards.shape, dtype=numpy.int64)
+    for start in range(0, k, CHUNK_SIZE):
+        chunk = boards[start:start + CHUNK_SIZE].astype(numpy.int64)
+        bits = numpy.where((chunk > 0) & (chunk <= n), numpy.left_shift(1, numpy.maximum(chunk - 1, 0)), 0)
+        used = numpy.bitwise_or.reduce(_units(bits), axis=2)
+        rows, cols, boxes = used[:, :n], used[:, n:2 * n], used[:, 2 * n:]
+        taken = rows[:, :, None] | cols[:, None, :] | boxes[:, box_index]
+        result[start:start + CHUNK_SIZE] = numpy.where(chunk == 0, full & ~taken, 0)
+    return result
+
+
+def _candidate_mask(board):
+    """Return candidate_masks of a single board, one board at a time.
+
+    @type board: list[list[int]]
+    @rtype: list[list[int]]
+    """
+    n = len(board)
+    m = int(sqrt(n))
+    full = (1 << n) - 1
+    rows, cols, boxes = [0] * n, [0] * n, [0] * n
+    for r in range(n):
+        for c in range(n):
+            value = board[r][c]
+            if 0 < value <= n:
+                bit = 1 << (value - 1)
+                rows[r] |= bit
+                cols[c] |= bit
+                boxes[(r // m) * m + c // m] |= bit
+    return [[full & ~(rows[r] | cols[c] | boxes[(r // m) * m + c // m]) if board[r][c] == 0 else 0
+             for c in range(n)] for r in range(n)]
+
+
+def screen(boards):
+    """Return the indices of the boards which pass check_boards and have a possible letter for every empty square.
+
+    Every other board certainly has no solution.
+
+    @type boards: numpy.ndarray | list[list[list[int]]]
+    @rtype: list[int]
+
+    >>> screen(load_boards(['A...' + '.' * 12, 'AA..' + '.' * 12, 'AB......' + '..C...D.']))
+    [0]
+    """
+    valid = check_boards(boards)
+    masks = candidate_masks(boards)
+    if numpy is None:
+        return [i for i in range(len(boards))
+                if valid[i] and not any(board_row[c] == 0 and mask_row[c] == 0
+                                        for board_row, mask_row in zip(boards[i], masks[i])
+                                        for c in range(len(board_row)))]
+    dead = ((boards == 0) & (masks == 0)).any(axis=(1, 2))
+    return numpy.flatnonzero(valid & ~dead).tolist()
+
+
+def solve_boards(lines):
+    """Screen the boards on <lines> and solve the ones that survive with the regular solver.
+
+    Return a list with a solution, or None, for every board. Boards rejected
+    by the screen are not passed to the solver.
+
+    @type lines: list[str]
+    @rtype: list[SudokuPuzzle | None]
+    """
+    boards = load_boards(lines)
+    solutions = [None] * len(lines)
+    for i in screen(boards):
+        solutions[i] = solve(SudokuPuzzle(to_grid(boards[i])))
+    return solutions
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    # Screen and solve a file of boards: python sudoku_batch.py <file>
+    # Each line holds one board, optionally after a tab (as written by sudoku_generator.py).
+    import sys
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            board_lines = [line.strip().split('\t')[-1] for line in f if line.strip()]
+        results = solve_boards(board_lines)
+        solved = sum(1 for result in results if result is not None)
+        print(str(len(board_lines)) + ' boards, ' + str(solved) + ' solved, '
+              + str(len(board_lines) - solved) + ' without a solution')
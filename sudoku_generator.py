@@ -0,0 +1,516 @@
+"""Sudoku puzzle generator.
+
+This module builds new Sudoku puzzles of size n = 4, 9, 16 or 25:
+
+1. A complete, valid grid is built from a fixed pattern and then shuffled
+   with transformations that keep it valid (swapping rows within a band,
+   columns within a stack, whole bands and stacks, and relabelling letters).
+2. Givens are removed in random order, first every given whose letter is
+   forced by the others, which needs no search, then every given left for
+   which a bounded search shows the puzzle still has exactly one solution.
+3. The finished puzzle is rated by how much search it needs.
+
+The solution counter works on integer bitmasks rather than on SudokuPuzzle
+states, which makes it fast enough to run once for every removed given.
+On 16x16 and 25x25 boards the search bound trades the number of givens left
+for speed: with the bound of the command line below, a 16x16 puzzle takes
+about 0.05s and a 25x25 puzzle about 0.5s.
+"""
+from sudoku_puzzle import SudokuPuzzle
+from sudoku_geometry import CHARS, default_box
+from math import sqrt
+import random
+
+# Each rating is given when the number of guesses needed is at most the bound,
+# where the bound is expressed as a multiple of n.
+DIFFICULTIES = [(0, 'easy'), (1, 'medium'), (5, 'hard')]
+HARDEST = 'expert'
+
+# Maps n to the list of (row, column, subsquare) indices of every cell.
+_cell_units = {}
+
+# Maps n to the indices of the cells of every row, column and subsquare.
+_unit_cells = {}
+
+# The number of set bits of every integer below 2 ** 16, used to count the possible letters of a cell.
+_BIT_COUNTS = [bin(i).count('1') for i in range(1 << 16)]
+
+
+def _units(n):
+    """Return the row, column and subsquare index of every cell of an n-by-n board with the default subsquares,
+    in row-major order.
+
+    @type n: int
+    @rtype: list[(int, int, int)]
+    """
+    if n not in _cell_units:
+        rows, cols = default_box(n)
+        _cell_units[n] = [(r, c, (r // rows) * (n // cols) + c // cols) for r in range(n) for c in range(n)]
+    return _cell_units[n]
+
+
+def _units_cells(n):
+    """Return the indices of the cells of every row, column and subsquare of an n-by-n board with the default
+    subsquares.
+
+    @type n: int
+    @rtype: list[list[int]]
+    """
+    if n not in _unit_cells:
+        cells = [[] for _ in range(3 * n)]
+        for i, (r, c, b) in enumerate(_units(n)):
+            cells[r].append(i)
+            cells[n + c].append(i)
+            cells[2 * n + b].append(i)
+        _unit_cells[n] = cells
+    return _unit_cells[n]
+
+
+def count_solutions(grid, limit=2, max_nodes=None):
+    """Return the number of solutions of <grid>, counting no further than <limit>, and the search effort.
+
+    With <limit> None, every solution is counted; with a <limit> of 0 or less, none is.
+    The effort is a pair (nodes, guesses): the number of cells filled in during
+    the search, and how many of those had more than one possible letter.
+    If the search needs more than <max_nodes> nodes it stops, and the count
+    returned is None.
+
+    @type grid: list[list[str]]
+    @type limit: int | None
+    @type max_nodes: int | None
+    @rtype: (int | None, (int, int))
+
+    >>> count_solutions([['A', '', '', ''], ['', '', 'A', ''], ['', 'A', '', ''], ['', '', '', 'A']], limit=100)
+    (18, (135, 16))
+    >>> count_solutions([['A', 'A', '', ''], ['', '', '', ''], ['', '', '', ''], ['', '', '', '']])
+    (0, (0, 0))
+    >>> count_solutions([['', '', '', ''], ['', '', '', ''], ['', '', '', ''], ['', '', '', '']], limit=0)
+    (0, (0, 0))
+    """
+    board = _encode(grid)
+    if board is None or (limit is not None and limit <= 0):
+        return 0, (0, 0)
+    search = _CountingSearch(board, limit, max_nodes)
+    search.run()
+    if search.aborted:
+        return None, (search.nodes, search.guesses)
+    return search.solutions, (search.nodes, search.guesses)
+
+
+def _encode(grid):
+    """Return <grid> encoded as bitmasks, or None if it has a letter twice in a unit or a letter not on the board.
+
+    The encoding is a tuple (cells, rows, cols, boxes), where cells holds the
+    bit of the letter in every cell in row-major order, or 0 for an empty cell,
+    and rows holds the bits of the letters used in every row (and likewise for
+    cols and boxes).
+
+    @type grid: list[list[str]]
+    @rtype: (list[int], list[int], list[int], list[int]) | None
+    """
+    n = len(grid)
+    rows, cols, boxes = [0] * n, [0] * n, [0] * n
+    cells = []
+    for r, c, b in _units(n):
+        letter = grid[r][c]
+        if letter == '':
+            cells.append(0)
+            continue
+        if letter not in CHARS[:n]:
+            return None
+        bit = 1 << CHARS.index(letter)
+        if rows[r] & bit or cols[c] & bit or boxes[b] & bit:
+            return None
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+        cells.append(bit)
+    return cells, rows, cols, boxes
+
+
+class _CountingSearch:
+    """Depth-first solution counter over a Sudoku board encoded as bitmasks.
+
+    Always fills in the empty cell with the fewest possible letters next, so
+    cells with a single possible letter are filled in without guessing. With
+    hidden singles on, a letter which has a single possible cell left in a row,
+    column or subsquare is also filled in without guessing, and a letter with
+    no possible cell left ends the branch; this costs more per node but needs
+    far fewer nodes on sparse boards.
+
+    A search can be run again after the board or the allowed letters have
+    changed, with reset.
+    """
+    # === Public attributes ===
+    # @type solutions: int
+    #     The number of solutions found so far.
+    # @type nodes: int
+    #     The number of cells filled in so far.
+    # @type guesses: int
+    #     The number of filled in cells which had more than one possible letter.
+    # @type aborted: bool
+    #     Whether the search stopped because it ran out of nodes.
+    # === Private attributes ===
+    # @type _cells: list[int]
+    #     The bit of the letter in every cell, in row-major order, or 0 for an empty cell.
+    # @type _rows: list[int]
+    #     The bits of the letters used in every row. _cols and _boxes are the same for columns and subsquares.
+    # @type _allowed: list[int]
+    #     The bits of the letters each cell may hold, regardless of its row, column and subsquare.
+    # @type _limit: int | None
+    #     The search stops once this many solutions are found; None to find them all.
+    # @type _max_nodes: int | None
+    #     The search stops once this many nodes are visited.
+    # @type _empty: list[int]
+    #     The indices of the empty cells. The first <remaining> entries are
+    #     the cells still empty at the current point of the search.
+    # @type _hidden: list[list[int]] | None
+    #     The cells of every unit, if hidden singles are on.
+    # @type _candidates: list[int]
+    #     The possible letters of every empty cell, as last computed.
+    def __init__(self, board, limit, max_nodes, allowed=None, hidden_singles=False):
+        """Create a new search over a board encoded by _encode.
+
+        The board is modified during the search, but restored when it ends.
+
+        @type self: _CountingSearch
+        @type board: (list[int], list[int], list[int], list[int])
+        @type limit: int | None
+        @type max_nodes: int | None
+        @type allowed: list[int] | None
+        @type hidden_singles: bool
+        @rtype: None
+        """
+        self._cells, self._rows, self._cols, self._boxes = board
+        n = len(self._rows)
+        if allowed is None:
+            allowed = [(1 << n) - 1] * (n * n)
+        self._allowed = allowed
+        self._limit = limit
+        self._max_nodes = max_nodes
+        self._units = _units(n)
+        self._hidden = _units_cells(n) if hidden_singles else None
+        self._candidates = [0] * (n * n)
+        self.reset()
+
+    def reset(self):
+        """Get ready to search the board again, as it is now.
+
+        @type self: _CountingSearch
+        @rtype: None
+        """
+        self._empty = [i for i in range(len(self._cells)) if self._cells[i] == 0]
+        self.solutions = 0
+        self.nodes = 0
+        self.guesses = 0
+        self.aborted = False
+
+    def run(self):
+        """Count the solutions, stopping early at the limit.
+
+        @type self: _CountingSearch
+        @rtype: None
+        """
+        self._search(len(self._empty))
+
+    def _hidden_single(self, remaining):
+        """Return a hidden single of the board as (its position in _empty, its bit, 1), or None if there is none.
+
+        Return False if some unit has a letter which fits none of its empty
+        cells. The candidates of the first <remaining> empty cells must be
+        up to date.
+
+        @type self: _CountingSearch
+        @type remaining: int
+        @rtype: (int, int, int) | None | bool
+        """
+        cells, candidates = self._cells, self._candidates
+        full = (1 << len(self._rows)) - 1
+        for unit in self._hidden:
+            placed = once = twice = 0
+            for j in unit:
+                letter = cells[j]
+                if letter:
+                    placed |= letter
+                else:
+                    mask = candidates[j]
+                    twice |= once & mask
+                    once |= mask
+            if once | placed != full:
+                return False
+            single = once & ~twice
+            if single:
+                bit = single & -single
+                for j in unit:
+                    if not cells[j] and candidates[j] & bit:
+                        return self._empty.index(j, 0, remaining), bit, 1
+        return None
+
+    def _search(self, remaining):
+        """Count the solutions of the board, where <remaining> cells are still empty.
+
+        Returns whether the search should stop.
+
+        @type self: _CountingSearch
+        @type remaining: int
+        @rtype: bool
+        """
+        if remaining == 0:
+            self.solutions += 1
+            return self._limit is not None and self.solutions >= self._limit
+        rows, cols, boxes, units, allowed, empty = \
+            self._rows, self._cols, self._boxes, self._units, self._allowed, self._empty
+        bit_counts = _BIT_COUNTS
+
+        # Find the empty cell with the fewest possible letters and move it to the end of the empty cells.
+        hidden = self._hidden
+        candidates = self._candidates
+        best, best_mask, best_count = 0, 0, len(rows) + 1
+        for k in range(remaining):
+            i = empty[k]
+            r, c, b = units[i]
+            mask = allowed[i] & ~(rows[r] | cols[c] | boxes[b])
+            candidates[i] = mask
+            count = bit_counts[mask] if mask < 65536 else bit_counts[mask & 65535] + bit_counts[mask >> 16]
+            if count < best_count:
+                best, best_mask, best_count = k, mask, count
+                if count <= 1:
+                    break
+        if best_count == 0:
+            return False
+        if best_count > 1 and hidden is not None:
+            found = self._hidden_single(remaining)
+            if found is False:
+                return False
+            if found is not None:
+                best, best_mask, best_count = found
+        if best_count > 1:
+            self.guesses += 1
+        last = remaining - 1
+        empty[best], empty[last] = empty[last], empty[best]
+        cell = empty[last]
+
+        r, c, b = units[cell]
+        while best_mask:
+            bit = best_mask & -best_mask
+            best_mask ^= bit
+            self.nodes += 1
+            if self._max_nodes is not None and self.nodes > self._max_nodes:
+                self.aborted = True
+                return True
+            self._cells[cell] = bit
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+            stop = self._search(last)
+            self._cells[cell] = 0
+            rows[r] ^= bit
+            cols[c] ^= bit
+            boxes[b] ^= bit
+            if stop:
+                return True
+        return False
+
+
+def full_grid(n, rng=random):
+    """Return a random, completely filled in and valid n-by-n Sudoku grid.
+
+    @type n: int
+    @type rng: random.Random
+    @rtype: list[list[str]]
+
+    Raise a ValueError if n is not a perfect square: the pattern the grid
+    is built from needs square subsquares.
+
+    >>> SudokuPuzzle(full_grid(9, random.Random(1))).is_solved(full=True)
+    True
+    """
+    m = int(sqrt(n))
+    if m * m != n:
+        raise ValueError('the size of a Sudoku board must be a perfect square')
+
+    def shuffled_lines():
+        # Lines in a random band order, each band in a random order.
+        bands = rng.sample(range(m), m)
+        return [band * m + line for band in bands for line in rng.sample(range(m), m)]
+
+    letters = rng.sample(CHARS[:n], n)
+    rows = shuffled_lines()
+    cols = shuffled_lines()
+    return [[letters[(m * (r % m) + r // m + c) % n] for c in cols] for r in rows]
+
+
+def generate(n, rng=random, max_nodes=None):
+    """Return a new n-by-n Sudoku puzzle with a unique solution, with its difficulty rating.
+
+    Givens are removed from a full grid in two passes over a random order:
+
+    1. A given is removed whenever its letter is forced without it, because
+       it is the only letter left for its cell, or its cell is the only one
+       left for the letter in a row, column or subsquare. Such a removal
+       cannot add a solution, so this pass needs no search at all; it is
+       repeated until it removes nothing, and takes out most givens.
+    2. Every given left is removed if a search, with hidden singles on, finds
+       no solution putting another letter in its cell. One search object is
+       reused for every check. A check which needs more than <max_nodes>
+       nodes counts as failed, which bounds the time spent on large boards.
+
+    @type n: int
+    @type rng: random.Random
+    @type max_nodes: int | None
+    @rtype: (SudokuPuzzle, str)
+
+    >>> puzzle, rating = generate(4, random.Random(0))
+    >>> count_solutions(puzzle.grid())[0]
+    1
+    >>> puzzle, rating = generate(16, random.Random(0), max_nodes=32)
+    >>> count_solutions(puzzle.grid())[0]
+    1
+    """
+    grid = full_grid(n, rng)
+    board = _encode(grid)
+    cells, rows, cols, boxes = board
+    units = _units(n)
+    unit_cells = _units_cells(n)
+    allowed = [(1 << n) - 1] * (n * n)
+    order = list(range(n * n))
+    rng.shuffle(order)
+
+    def remove(i):
+        r, c, b = units[i]
+        bit = cells[i]
+        cells[i] = 0
+        rows[r] ^= bit
+        cols[c] ^= bit
+        boxes[b] ^= bit
+        grid[r][c] = ''
+        return bit
+
+    def restore(i, bit):
+        r, c, b = units[i]
+        cells[i] = bit
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+        grid[r][c] = CHARS[bit.bit_length() - 1]
+
+    def fits(j, bit):
+        r, c, b = units[j]
+        return not cells[j] and allowed[j] & bit and not (rows[r] | cols[c] | boxes[b]) & bit
+
+    def forced(i, bit):
+        # Whether the letter <bit> of the empty cell i follows from the givens: a naked or a hidden single.
+        r, c, b = units[i]
+        if rows[r] | cols[c] | boxes[b] | bit == allowed[i]:
+            return True
+        return any(not any(fits(j, bit) for j in unit_cells[unit] if j != i) for unit in (r, n + c, 2 * n + b))
+
+    removed = True
+    while removed:
+        removed = False
+        for i in order:
+            if cells[i]:
+                bit = remove(i)
+                if forced(i, bit):
+                    removed = True
+                else:
+                    restore(i, bit)
+
+    # The puzzle keeps a unique solution exactly when no solution puts another letter in the removed cell.
+    search = _CountingSearch(board, 1, max_nodes, allowed, hidden_singles=True)
+    for i in order:
+        if not cells[i]:
+            continue
+        bit = remove(i)
+        if forced(i, bit):
+            continue
+        allowed[i] ^= bit
+        search.reset()
+        search.run()
+        allowed[i] ^= bit
+        if search.solutions != 0 or search.aborted:
+            restore(i, bit)
+    return SudokuPuzzle(grid), rate(grid, None if max_nodes is None else 20 * max_nodes)
+
+
+def rate(grid, max_nodes=None):
+    """Return the difficulty rating of the Sudoku puzzle <grid>, which must have a unique solution.
+
+    The rating depends on the number of guesses the solution counter, with
+    hidden singles on, needs to solve the puzzle and to prove that its
+    solution is unique. A puzzle which needs more than <max_nodes> nodes is
+    rated HARDEST.
+
+    @type grid: list[list[str]]
+    @type max_nodes: int | None
+    @rtype: str
+
+    >>> rate(full_grid(4))
+    'easy'
+    """
+    board = _encode(grid)
+    search = _CountingSearch(board, 2, max_nodes, hidden_singles=True)
+    search.run()
+    if search.aborted:
+        return HARDEST
+    n = len(grid)
+    for bound, rating in DIFFICULTIES:
+        if search.guesses <= bound * n:
+            return rating
+    return HARDEST
+
+
+def generate_many(n, count, seed=None, max_nodes=None):
+    """Yield <count> new n-by-n Sudoku puzzles with their difficulty ratings.
+
+    The same <seed> always yields the same puzzles.
+
+    @type n: int
+    @type count: int
+    @type seed: int | None
+    @type max_nodes: int | None
+    @rtype: iterator[(SudokuPuzzle, str)]
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield generate(n, rng, max_nodes)
+
+
+def to_line(grid):
+    """Return <grid> written on one line, row by row, with '.' for an empty square.
+
+    @type grid: list[list[str]]
+    @rtype: str
+
+    >>> to_line([['A', ''], ['', 'B']])
+    'A..B'
+    """
+    return ''.join(letter or '.' for row in grid for letter in row)
+
+
+def from_line(line):
+    """Return the grid written on one line by to_line.
+
+    @type line: str
+    @rtype: list[list[str]]
+
+    >>> from_line('A..B')
+    [['A', ''], ['', 'B']]
+    """
+    n = int(sqrt(len(line)))
+    return [[letter if letter != '.' else '' for letter in line[r * n:(r + 1) * n]] for r in range(n)]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    # Write a pool of puzzles: python sudoku_generator.py <n> <count> [<seed>]
+    import sys
+    if len(sys.argv) >= 3:
+        size, total = int(sys.argv[1]), int(sys.argv[2])
+        pool_seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        # Large boards can take very long to prove unique once they get sparse.
+        budget = None if size <= 9 else 2 * size
+        for puzzle, difficulty in generate_many(size, total, pool_seed, budget):
+            print(difficulty + '\t' + to_line(puzzle.grid()))
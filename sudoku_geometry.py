@@ -0,0 +1,261 @@
+"""Board geometry of Sudoku puzzles.
+
+A Geometry holds everything about a board which does not depend on its
+letters: its units (the rows, columns and boxes, or other regions, which
+must each hold every letter once), the units and peers of every cell, and
+the text layout of the board. It is computed once per board shape and shared
+by every state of every puzzle of that shape, so a search never works out
+box positions again.
+
+Besides the usual square boxes (n = 4, 9, 16, 25), a board may have:
+
+- rectangular boxes, e.g. 2 rows by 3 columns on a 6-by-6 board, or 3 by 4
+  on a 12-by-12 board, which is the default when n is not a square;
+- diagonal units, in which case both main diagonals must also hold every
+  letter once;
+- irregular regions instead of boxes, given as one string per row with the
+  label of the region of every cell.
+"""
+from math import sqrt
+
+CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# The labels of the rows, which cycle 0-9.
+ROW_LABELS = [str(i) + '|' for i in range(10)]
+
+# The characters which separate the parts of a puzzle key with a board shape, which no region label may be.
+_SPEC_SEPARATORS = '/;:'
+
+# Maps the shape of a board, as given to geometry, to its Geometry.
+_geometries = {}
+
+
+class Geometry:
+    """The shape of a Sudoku board.
+
+    === Public attributes ===
+    @type n: int
+        The number of rows, columns and letters of the board.
+    @type letters: str
+        The letters available on the board, in alphabetical order.
+    @type box: (int, int) | None
+        The number of rows and columns of every box, or None if the board has irregular regions.
+    @type diagonal: bool
+        Whether the two main diagonals are units.
+    @type regions: tuple[str] | None
+        The label of the region of every cell, one string per row, or None if the board has boxes.
+    @type units: list[tuple[(int, int)]]
+        The cells of every unit: the rows, then the columns, the boxes or regions, and the diagonals.
+    @type cell_units: list[list[tuple[int]]]
+        The indices in units of the units of every cell.
+    @type peers: list[list[tuple[(int, int)]]]
+        The other cells which share a unit with every cell.
+    @type spec: str
+        The shape written for a puzzle key, or '' for the default shape of an n-by-n board.
+    """
+    # === Private attributes ===
+    # @type _layout: (str, str, set[int], list[(int, int)], str)
+    #     The column labels, the horizontal divider, the rows it follows, the (first, last + 1) columns of every
+    #     stack of boxes, and the text shown below the board.
+    def __init__(self, n, box=None, diagonal=False, regions=None):
+        """Create the geometry of an n-by-n board with boxes of <box> rows and columns, or with <regions>.
+
+        Without either, the board has the default boxes of default_box(n).
+        Raise a ValueError if the boxes or regions do not split the board
+        into n units of n cells, or if a region label is not a single
+        character other than those which separate the parts of a spec.
+
+        @type self: Geometry
+        @type n: int
+        @type box: (int, int) | None
+        @type diagonal: bool
+        @type regions: tuple[str] | None
+        @rtype: None
+        """
+        if n > len(CHARS):
+            raise ValueError('a board has at most ' + str(len(CHARS)) + ' letters')
+        if regions is None and box is None:
+            box = default_box(n)
+        self.n = n
+        self.letters = CHARS[:n]
+        self.box = box
+        self.diagonal = diagonal
+        self.regions = regions
+
+        units = [tuple((r, c) for c in range(n)) for r in range(n)]
+        units.extend(tuple((r, c) for r in range(n)) for c in range(n))
+        if regions is None:
+            rows, cols = box
+            if rows * cols != n:
+                raise ValueError(str(rows) + '-by-' + str(cols) + ' boxes do not fit a ' + str(n) + '-by-' + str(n) +
+                                 ' board')
+            units.extend(tuple((r + i, c + j) for i in range(rows) for j in range(cols))
+                         for r in range(0, n, rows) for c in range(0, n, cols))
+        else:
+            cells = {}
+            if len(regions) != n or any(len(row) != n for row in regions):
+                raise ValueError('the regions must have one label for every cell')
+            for r in range(n):
+                for c in range(n):
+                    label = regions[r][c]
+                    if len(label) != 1 or label in _SPEC_SEPARATORS:
+                        raise ValueError('region labels are single characters other than ' +
+                                         ' '.join(_SPEC_SEPARATORS))
+                    cells.setdefault(label, []).append((r, c))
+            if len(cells) != n or any(len(region) != n for region in cells.values()):
+                raise ValueError('the board must have ' + str(n) + ' regions of ' + str(n) + ' cells')
+            units.extend(tuple(cells[label]) for label in sorted(cells))
+        if diagonal:
+            units.append(tuple((i, i) for i in range(n)))
+            units.append(tuple((i, n - 1 - i) for i in range(n)))
+        self.units = units
+
+        self.cell_units = [[[] for _ in range(n)] for _ in range(n)]
+        for index, unit in enumerate(units):
+            for r, c in unit:
+                self.cell_units[r][c].append(index)
+        self.peers = [[None] * n for _ in range(n)]
+        for r in range(n):
+            for c in range(n):
+                self.cell_units[r][c] = tuple(self.cell_units[r][c])
+                peers = {cell for index in self.cell_units[r][c] for cell in units[index]}
+                peers.discard((r, c))
+                self.peers[r][c] = tuple(sorted(peers))
+
+        self.spec = self._spec()
+        self._layout = self._make_layout()
+
+    def layout(self):
+        """Return the parts of the text layout of the board which do not depend on its letters.
+
+        These are the column labels, the horizontal divider with the rows it
+        follows, the (first, last + 1) columns of every stack of boxes, and
+        the text shown below the board.
+
+        @type self: Geometry
+        @rtype: (str, str, set[int], list[(int, int)], str)
+        """
+        return self._layout
+
+    def _spec(self):
+        """Return the shape of the board written for a puzzle key: '' for the default shape, otherwise the parts
+        which differ from it, separated by ';'.
+
+        @type self: Geometry
+        @rtype: str
+        """
+        parts = []
+        if self.regions is not None:
+            parts.append('regions=' + '/'.join(self.regions))
+        elif self.box != default_box(self.n):
+            parts.append('box=' + str(self.box[0]) + 'x' + str(self.box[1]))
+        if self.diagonal:
+            parts.append('diagonal')
+        return ';'.join(parts)
+
+    def _make_layout(self):
+        """Return the text layout of the board, as layout returns it.
+
+        Boards with irregular regions have no dividers; their regions are
+        shown below the board instead.
+
+        @type self: Geometry
+        @rtype: (str, str, set[int], list[(int, int)], str)
+        """
+        n = self.n
+        if self.regions is None:
+            rows, cols = self.box
+            stacks = [(start, start + cols) for start in range(0, n, cols)]
+            dividers = set(range(rows, n, rows))
+        else:
+            stacks = [(0, n)]
+            dividers = set()
+        labels = '|'.join(''.join(str(col % 10) for col in range(start, end)) for start, end in stacks)
+        line = ' ' + '-' * (n + len(stacks)) + '\n'
+        header = '  ' + labels + '\n' + line
+        footer = ''
+        if self.regions is not None:
+            footer = 'regions:\n' + ''.join(ROW_LABELS[r % 10] + self.regions[r] + '\n' for r in range(n))
+        if self.diagonal:
+            footer += 'Both diagonals must also hold every letter once.\n'
+        return header, line, dividers, stacks, footer
+
+
+def default_box(n):
+    """Return the (rows, columns) of the boxes of an n-by-n board without any other shape given.
+
+    The boxes are square if n is a square. Otherwise they are as close to
+    square as possible, with fewer rows than columns.
+
+    @type n: int
+    @rtype: (int, int)
+
+    >>> default_box(9), default_box(6), default_box(12)
+    ((3, 3), (2, 3), (3, 4))
+    """
+    rows = int(sqrt(n))
+    while n % rows != 0:
+        rows -= 1
+    return rows, n // rows
+
+
+def geometry(n, box=None, diagonal=False, regions=None):
+    """Return the geometry of an n-by-n board of the given shape, computing it only once per shape.
+
+    Boxes given with their default shape share the default geometry.
+
+    @type n: int
+    @type box: (int, int) | None
+    @type diagonal: bool
+    @type regions: list[str] | tuple[str] | None
+    @rtype: Geometry
+
+    >>> geometry(6) is geometry(6, (2, 3))
+    True
+    >>> len(geometry(9, diagonal=True).peers[0][0])
+    26
+    >>> geometry(4, regions=['aabb', 'aabb', 'cc;;', 'cc;;'])
+    Traceback (most recent call last):
+    ...
+    ValueError: region labels are single characters other than / ; :
+    """
+    if regions is not None:
+        regions = tuple(regions)
+    elif box is None or tuple(box) == default_box(n):
+        box = default_box(n)
+    else:
+        box = tuple(box)
+    shape = (n, box, diagonal, regions)
+    if shape not in _geometries:
+        _geometries[shape] = Geometry(n, box, diagonal, regions)
+    return _geometries[shape]
+
+
+def from_spec(n, spec):
+    """Return the geometry of an n-by-n board whose shape is written as <spec>, as in Geometry.spec.
+
+    @type n: int
+    @type spec: str
+    @rtype: Geometry
+
+    >>> g = from_spec(6, 'box=3x2;diagonal')
+    >>> g.box, g.diagonal, g.spec
+    ((3, 2), True, 'box=3x2;diagonal')
+    """
+    box, diagonal, regions = None, False, None
+    for part in spec.split(';'):
+        if part == 'diagonal':
+            diagonal = True
+        elif part.startswith('box='):
+            rows, cols = part[len('box='):].split('x')
+            box = int(rows), int(cols)
+        elif part.startswith('regions='):
+            regions = part[len('regions='):].split('/')
+        elif part != '':
+            raise ValueError(part + ' is not a board shape')
+    return geometry(n, box, diagonal, regions)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -2,7 +2,7 @@
 
 Here are the rules of Sudoku:
 
-- The puzzle consists of an n-by-n grid, where n = 4, 9, 16, or 25.
+- The puzzle consists of an n-by-n grid, usually where n = 4, 9, 16, or 25.
   Each square contains a uppercase letter between A and the n-th letter
   of the alphabet, or is empty.
   For example, on a 4-by-4 Sudoku board, the available letters are
@@ -15,18 +15,28 @@ Here are the rules of Sudoku:
   A *subsquare* is found by dividing the board evenly into sqrt(n)-by-sqrt(n)
   pieces. For example, a 4-by-4 board would have 4 subsquares: top left,
   top right, bottom left, bottom right.
+
+Boards of other shapes are described by a Geometry (see sudoku_geometry.py):
+rectangular subsquares, such as the 2-by-3 subsquares of a 6-by-6 board,
+irregular regions instead of subsquares, and diagonals which must also hold
+every letter once. Every state of a puzzle shares the geometry of its board.
 """
-from puzzle import Puzzle
+from puzzle import Puzzle, register
+from sudoku_geometry import ROW_LABELS, geometry as board_geometry, from_spec
 from math import sqrt
+import re
 
-CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# A move looks like '(<row>, <column>) -> <letter>'; coordinates may have any number of digits.
+MOVE_PATTERN = re.compile(r'^\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*->\s*(\S)\s*$')
 
 
 class SudokuPuzzle(Puzzle):
     """Implementation of a Sudoku puzzle."""
     # === Private Attributes ===
     # @type _n: int
-    #     The size of the board. Must be 4, 9, 16, or 25.
+    #     The size of the board.
+    # @type _geometry: Geometry
+    #     The shape of the board, shared by every state of the puzzle.
     # @type _grid: list[list[str]]
     #     A representation of the Sudoku grid. Consists of a list of lists,
     #     where each inner list represents a row of the grid.
@@ -34,17 +44,53 @@ class SudokuPuzzle(Puzzle):
     #     Each item of the inner list is either an uppercase letter,
     #     or is the empty string '', representing an empty square.
     #     Each letter must be between 'A' and the n-th letter of the alphabet.
-    def __init__(self, grid):
+    # @type _empty: int
+    #     The number of empty squares in _grid.
+    # @type _conflicts: int
+    #     The number of constraint violations in _grid: for every unit of the
+    #     geometry, the number of repeated letters in it, plus the number
+    #     of letters that are not available on this board. Zero exactly when
+    #     no constraint is violated.
+    def __init__(self, grid, counts=None, geometry=None):
         """Create a new Sudoku puzzle with an initial grid 'grid'.
 
+        <counts> is the (empty squares, conflicts) pair of <grid> when it is
+        already known, as it is for a state derived from another puzzle.
+        Otherwise the whole grid is scanned once to compute it.
+
+        <geometry> is the shape of the board, by default the usual subsquares
+        of a board of its size (see sudoku_geometry.geometry).
+
         Precondition: <grid> is a valid Sudoku grid.
 
         @type self: SudokuPuzzle
         @type grid: list[list[str]]
+        @type counts: (int, int) | None
+        @type geometry: Geometry | None
         @rtype: None
+
+        >>> from sudoku_geometry import geometry
+        >>> print(SudokuPuzzle([['A', 'B', 'C', 'D', 'E', 'F']] + [[''] * 6] * 5, geometry=geometry(6)))
+          012|345
+         --------
+        0|ABC|DEF
+        1|   |
+         --------
+        2|   |
+        3|   |
+         --------
+        4|   |
+        5|   |
+        <BLANKLINE>
         """
         self._n = len(grid)
         self._grid = grid
+        if geometry is None:
+            geometry = board_geometry(self._n)
+        self._geometry = geometry
+        if counts is None:
+            counts = self._count_empty(), self._count_conflicts()
+        self._empty, self._conflicts = counts
 
     def __str__(self):
         """Return a human-readable string representation of <self>.
@@ -68,45 +114,31 @@ class SudokuPuzzle(Puzzle):
         3|  |
         <BLANKLINE>
         """
-        m = int(sqrt(self._n))
-        s = ''
-        # Column label
-        s += '  '
-        for col in range(self._n):
-            s += str(col % 10)
-            # Vertical divider
-            if (col + 1) % m == 0 and col + 1 != self._n:
-                s += '|'
-        # Horizontal divider
-        s += '\n ' + ('-' * (self._n + m)) + '\n'
+        header, divider, divided_rows, stacks, footer = self._geometry.layout()
+        lines = [header]
         for i in range(self._n):
-            # Row label
-            s += str(i % 10) + '|'
-            for j in range(self._n):
-                cell = self._grid[i][j]
-                if cell == '':
-                    s += ' '
-                else:
-                    s += str(cell)
-                # Vertical divider
-                if (j + 1) % m == 0 and j + 1 != self._n:
-                    s += '|'
-            s = s.rstrip()
-            s += '\n'
-
-            # Horizontal divider
-            if (i + 1) % m == 0 and i + 1 != self._n:
-                s += ' ' + ('-' * (self._n + m)) + '\n'
-
-        return s
-
-    def is_solved(self):
+            cells = ''.join([cell or ' ' for cell in self._grid[i]])
+            # Row label, then the cells of each stack of subsquares with a vertical divider in between
+            line = ROW_LABELS[i % 10] + '|'.join([cells[start:end] for start, end in stacks])
+            lines.append(line.rstrip() + '\n')
+            if i + 1 in divided_rows:
+                lines.append(divider)
+        lines.append(footer)
+        return ''.join(lines)
+
+    def is_solved(self, full=False):
         """Return whether <self> is solved.
 
         A Sudoku puzzle is solved if its state matches the criteria
         listed at the end of the puzzle description.
 
+        The answer comes from the empty square and conflict counts kept up to
+        date as moves are made. With <full> set, every unit of the grid is
+        checked again instead, which is useful if the grid was changed from
+        outside of this class.
+
         @type self: SudokuPuzzle
+        @type full: bool
         @rtype: bool
 
         >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
@@ -121,36 +153,80 @@ class SudokuPuzzle(Puzzle):
                               ['D', 'C', 'B', 'A']])
         >>> s.is_solved()
         False
+        >>> s.is_solved(full=True)
+        False
         """
+        if not full:
+            return self._empty == 0 and self._conflicts == 0
+
         # Check for empty cells
         for row in self._grid:
             if '' in row:
                 return False
 
-        # Check rows
-        for row in self._grid:
-            if sorted(row) != list(CHARS[:self._n]):
+        # Check every row, column, subsquare and any other unit
+        letters = list(self._geometry.letters)
+        for unit in self._geometry.units:
+            if sorted([self._grid[r][c] for r, c in unit]) != letters:
                 return False
 
-        # Check cols
-        for i in range(self._n):
-            # Note the use of a list comprehension here.
-            if sorted([row[i] for row in self._grid]) != list(CHARS[:self._n]):
-                return False
+        # All checks passed
+        return True
 
-        # Check all subsquares
-        m = int(sqrt(self._n))
-        for x in range(0, self._n, m):
-            for y in range(0, self._n, m):
-                items = [self._grid[x + i][y + j]
-                         for i in range(m)
-                         for j in range(m)]
+    # ------------------------------------------------------------------------
+    # Helpers for method 'is_solved'
+    # ------------------------------------------------------------------------
+    def _count_empty(self):
+        """Return the number of empty squares in the grid.
 
-                if sorted(items) != list(CHARS[:self._n]):
-                    return False
+        @type self: SudokuPuzzle
+        @rtype: int
+        """
+        return sum(row.count('') for row in self._grid)
 
-        # All checks passed
-        return True
+    def _count_conflicts(self):
+        """Return the number of constraint violations in the grid.
+
+        @type self: SudokuPuzzle
+        @rtype: int
+
+        >>> s = SudokuPuzzle([['A', 'A', '', ''], \
+                              ['', '', '', ''], \
+                              ['A', '', '', ''], \
+                              ['', '', '', 'E']])
+        >>> s._count_conflicts()
+        4
+        """
+        conflicts = 0
+        for unit in self._geometry.units:
+            letters = [self._grid[r][c] for r, c in unit if self._grid[r][c] != '']
+            conflicts += len(letters) - len(set(letters))
+        for row in self._grid:
+            for letter in row:
+                if letter != '' and letter not in self._geometry.letters:
+                    conflicts += 1
+        return conflicts
+
+    def _count_new_conflicts(self, letter, row_index, col_index):
+        """Return the number of constraint violations added by placing <letter> in the empty square at
+        (row_index, col_index).
+
+        @type self: SudokuPuzzle
+        @type letter: str
+        @type row_index: int
+        @type col_index: int
+        @rtype: int
+        """
+        conflicts = 0
+        if letter not in self._geometry.letters:
+            conflicts += 1
+        units = self._geometry.units
+        for index in self._geometry.cell_units[row_index][col_index]:
+            for r, c in units[index]:
+                if self._grid[r][c] == letter:
+                    conflicts += 1
+                    break
+        return conflicts
 
     def extensions(self):
         """Return list of extensions of <self>.
@@ -185,6 +261,21 @@ class SudokuPuzzle(Puzzle):
         3|DC|
         <BLANKLINE>
         """
+        return list(self.iter_extensions())
+
+    def possible_moves(self):
+        """Yield the moves of extensions as (letter, row index, column index) tuples, without building any state.
+
+        @type self: SudokuPuzzle
+        @rtype: iterator[(str, int, int)]
+
+        >>> s = SudokuPuzzle([['A', '', '', ''], ['', '', '', ''], ['', '', '', ''], ['', '', '', '']])
+        >>> list(s.possible_moves())
+        [('B', 0, 1), ('C', 0, 1), ('D', 0, 1)]
+        """
+        if self._empty == 0:
+            return
+
         # Search for the first empty cell
         row_index, col_index = None, None
         for i in range(self._n):
@@ -193,13 +284,19 @@ class SudokuPuzzle(Puzzle):
                 row_index, col_index = i, row.index('')
                 break
 
-        if row_index is None:
-            return []
-        else:
+        if row_index is not None:
             # Calculate possible letter to fill the empty cell
-            letters = self._possible_letters(row_index, col_index)
-            return [self._extend(letter, row_index, col_index)
-                    for letter in letters]
+            for letter in self._possible_letters(row_index, col_index):
+                yield letter, row_index, col_index
+
+    def apply_move(self, move):
+        """Return the new puzzle state after <move>, a (letter, row index, column index) tuple of possible_moves.
+
+        @type self: SudokuPuzzle
+        @type move: (str, int, int)
+        @rtype: SudokuPuzzle
+        """
+        return self._extend(*move)
 
     # ------------------------------------------------------------------------
     # Helpers for method 'extensions'
@@ -215,42 +312,8 @@ class SudokuPuzzle(Puzzle):
         @type col_index: int
         @rtype: list[str]
         """
-        possible_letters = list(CHARS[:self._n])
-        delete_letters = []
-        r, c, m = self._find_subsquare(row_index, col_index)
-        for letter in possible_letters:
-            if letter in self._grid[row_index]:
-                delete_letters.append(letter)
-            else:
-                for i in range(self._n):
-                    if letter == self._grid[i][col_index]:
-                        delete_letters.append(letter)
-                for j in range(0, m):
-                    for k in range(0, m):
-                        if letter == self._grid[r + j][c + k] and letter not in delete_letters:
-                            delete_letters.append(letter)
-        for letter in delete_letters:
-            possible_letters.remove(letter)
-        return possible_letters
-
-    def _find_subsquare(self, row_index, col_index):
-        """Return the first row, first column, and size of the subsquare the <row_index> and <col_index> are in.
-
-        @type self: SudokuPuzzle
-        @type row_index: int
-        @type col_index: int
-        @rtype: (int, int, int)
-        """
-        m = int(sqrt(self._n))
-        for r in range(0, self._n, m):
-            if row_index in range(r, r + m):
-                row = r
-                break
-        for c in range(0, self._n, m):
-            if col_index in range(c, c + m):
-                col = c
-                break
-        return (row, col, m)
+        used = {self._grid[r][c] for r, c in self._geometry.peers[row_index][col_index]}
+        return [letter for letter in self._geometry.letters if letter not in used]
 
     def _extend(self, letter, row_index, col_index):
         """Return a new Sudoku Puzzle obtained after one move.
@@ -282,9 +345,10 @@ class SudokuPuzzle(Puzzle):
         3|DC|
         <BLANKLINE>
         """
+        conflicts = self._conflicts + self._count_new_conflicts(letter, row_index, col_index)
         new_grid = [row.copy() for row in self._grid]
         new_grid[row_index][col_index] = letter
-        return SudokuPuzzle(new_grid)
+        return SudokuPuzzle(new_grid, (self._empty - 1, conflicts), self._geometry)
 
     def move(self, move):
         """Return a new Sudoku Puzzle specified by making the given move.
@@ -295,20 +359,68 @@ class SudokuPuzzle(Puzzle):
         @type self: SudokuPuzzle
         @type move: str
         @rtype: SudokuPuzzle
+
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', '', ''], \
+                              ['D', 'C', '', '']])
+        >>> print(s.move('(2, 2) -> D'))
+          01|23
+         ------
+        0|AB|CD
+        1|CD|AB
+         ------
+        2|BA|D
+        3|DC|
+        <BLANKLINE>
+        >>> s.move('(2, 2) -> C')
+        Traceback (most recent call last):
+        ...
+        ValueError: C cannot be placed at (2, 2)
         """
-        row_index = int(move[1])
-        col_index = int(move[4])
-        letter = move[-1]
-        possible_letters = self._possible_letters(row_index, col_index)
-        if row_index not in range(self._n) or col_index not in range(self._n):
-            raise ValueError
-        elif letter not in possible_letters:
-            raise ValueError
+        row_index, col_index, letter = self.parse_move(move)
+        if row_index >= self._n or col_index >= self._n:
+            raise ValueError('(' + str(row_index) + ', ' + str(col_index) + ') is not on the board')
         elif self._grid[row_index][col_index] != '':
-            raise ValueError
+            raise ValueError('(' + str(row_index) + ', ' + str(col_index) + ') is already filled')
+        elif not self._is_possible_letter(letter, row_index, col_index):
+            raise ValueError(letter + ' cannot be placed at (' + str(row_index) + ', ' + str(col_index) + ')')
         else:
             return self._extend(letter, row_index, col_index)
 
+    def parse_move(self, move):
+        """Return the row index, column index and letter of a move written as '(<row>, <column>) -> <letter>'.
+
+        Raise a ValueError if <move> is not written in this format. The move is
+        not checked against the board.
+
+        @type self: SudokuPuzzle
+        @type move: str
+        @rtype: (int, int, str)
+
+        >>> s = SudokuPuzzle([['']])
+        >>> s.parse_move('(12, 3) -> K')
+        (12, 3, 'K')
+        """
+        match = MOVE_PATTERN.match(move)
+        if match is None:
+            raise ValueError('moves are written as (<row>, <column>) -> <letter>')
+        return int(match.group(1)), int(match.group(2)), match.group(3)
+
+    def _is_possible_letter(self, letter, row_index, col_index):
+        """Return whether <letter> can be placed at (row_index, col_index) without violating any constraint.
+
+        Only the units of the cell are inspected, so this is
+        cheaper than computing every possible letter of the cell.
+
+        @type self: SudokuPuzzle
+        @type letter: str
+        @type row_index: int
+        @type col_index: int
+        @rtype: bool
+        """
+        return self._count_new_conflicts(letter, row_index, col_index) == 0
+
     def generate_strings(self, new_puzzle):
         """Return the move the user should make to get from <self> to <new_puzzle>. Assume there exists a valid move to
         make to reach <new_puzzle> from <self>.
@@ -327,6 +439,76 @@ class SudokuPuzzle(Puzzle):
                     break
         return '(' + str(row_index) + ', ' + str(col_index) + ') -> ' + char
 
+    def grid(self):
+        """Return a copy of the grid of this puzzle.
+
+        @type self: SudokuPuzzle
+        @rtype: list[list[str]]
+        """
+        return [row.copy() for row in self._grid]
+
+    def geometry(self):
+        """Return the shape of the board of this puzzle.
+
+        @type self: SudokuPuzzle
+        @rtype: Geometry
+        """
+        return self._geometry
+
+    def key(self):
+        """Return the grid of this puzzle written on one line, row by row, with '.' for an empty square.
+
+        A board of another shape than the default one of its size has its
+        shape (see Geometry.spec) and a ':' written first.
+
+        @type self: SudokuPuzzle
+        @rtype: str
+
+        >>> SudokuPuzzle([['A', ''], ['', 'B']]).key()
+        'A..B'
+        >>> from sudoku_geometry import geometry
+        >>> SudokuPuzzle([['A', ''], ['', 'B']], geometry=geometry(2, diagonal=True)).key()
+        'diagonal:A..B'
+        """
+        key = ''.join(letter or '.' for row in self._grid for letter in row)
+        if self._geometry.spec:
+            return self._geometry.spec + ':' + key
+        return key
+
+    @classmethod
+    def from_key(cls, key):
+        """Return the Sudoku puzzle whose grid is written on one line as <key>.
+
+        @type cls: type
+        @type key: str
+        @rtype: SudokuPuzzle
+
+        >>> print(SudokuPuzzle.from_key('A..B').key())
+        A..B
+        >>> SudokuPuzzle.from_key('box=2x1:A..B').geometry().box
+        (2, 1)
+        """
+        spec, _, key = key.rpartition(':')
+        n = int(sqrt(len(key)))
+        grid = [[letter if letter != '.' else '' for letter in key[r * n:(r + 1) * n]] for r in range(n)]
+        return cls(grid, geometry=from_spec(n, spec))
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Return the Sudoku puzzle whose grid is written on one line, as by key, in spec['grid'] or spec['key'].
+
+        @type cls: type
+        @type spec: dict
+        @rtype: SudokuPuzzle
+
+        >>> SudokuPuzzle.from_spec({'type': 'sudoku', 'grid': 'A..B'}).key()
+        'A..B'
+        """
+        return cls.from_key(spec['grid'] if 'grid' in spec else spec['key'])
+
+
+register(SudokuPuzzle, 'sudoku', solve='depth', hint='depth', count='bitmask')
+
 
 if __name__ == '__main__':
     # Note: the doctest of 'extensions' currently fails. See Part 1.
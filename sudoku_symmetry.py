@@ -0,0 +1,304 @@
+"""Symmetry-canonical keys for Sudoku boards.
+
+Two boards are equivalent if one can be turned into the other by any mix of
+these transformations, none of which changes whether (or how) a board can
+be solved:
+
+- relabelling the letters,
+- swapping rows within a band, or columns within a stack,
+- swapping whole bands, or whole stacks,
+- transposing the board.
+
+canonical_form maps every board of an equivalence class to the same key, the
+smallest one in the class, along with the Transform from the board to that
+key. A solution found for the canonical board can be mapped back to any
+board of the class with the inverse of its transform, which is what
+SolutionCache does: one search answers for a whole class of boards.
+
+The smallest key is found by building the canonical board row by row while
+keeping only the partial transformations which give the smallest rows so
+far, so the search only branches where the board itself is symmetric.
+"""
+from sudoku_puzzle import SudokuPuzzle
+from sudoku_geometry import CHARS
+from solver import solve
+from math import sqrt
+
+# The most partial transformations canonical_form keeps at once before it gives up on a board.
+MAX_CANDIDATES = 100000
+
+
+class Transform:
+    """A transformation between a Sudoku board and its canonical form.
+
+    === Public attributes ===
+    @type transpose: bool
+        Whether the board is transposed first.
+    @type rows: tuple[int]
+        The row of the (transposed) board that becomes each row of the canonical board.
+    @type cols: tuple[int]
+        The column of the (transposed) board that becomes each column of the canonical board.
+    @type letters: dict[str, str]
+        The letter of the canonical board that replaces each letter of the board.
+    """
+    def __init__(self, transpose, rows, cols, letters):
+        """Create a new transform.
+
+        @type self: Transform
+        @type transpose: bool
+        @type rows: tuple[int]
+        @type cols: tuple[int]
+        @type letters: dict[str, str]
+        @rtype: None
+        """
+        self.transpose = transpose
+        self.rows = rows
+        self.cols = cols
+        self.letters = letters
+
+    def apply(self, grid):
+        """Return <grid> transformed into the canonical board.
+
+        @type self: Transform
+        @type grid: list[list[str]]
+        @rtype: list[list[str]]
+        """
+        if self.transpose:
+            grid = [list(column) for column in zip(*grid)]
+        return [[self.letters.get(grid[r][c], '') for c in self.cols] for r in self.rows]
+
+    def invert(self, grid):
+        """Return the canonical board <grid>, or a solution of it, transformed back into the original board.
+
+        Letters which the original board does not use are given the letters
+        it leaves over, in alphabetical order.
+
+        @type self: Transform
+        @type grid: list[list[str]]
+        @rtype: list[list[str]]
+        """
+        n = len(grid)
+        back = {new: old for old, new in self.letters.items()}
+        unused = [letter for letter in CHARS[:n] if letter not in self.letters]
+        for letter in CHARS[:n]:
+            if letter not in back:
+                back[letter] = unused.pop(0)
+        result = [[''] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(n):
+                result[self.rows[i]][self.cols[j]] = back.get(grid[i][j], '')
+        if self.transpose:
+            result = [list(column) for column in zip(*result)]
+        return result
+
+
+def canonical_form(grid):
+    """Return the canonical key of <grid> and the Transform from <grid> to the canonical board.
+
+    The key is written like SudokuPuzzle.key. Every board equivalent to
+    <grid> has the same key. Raise a ValueError if the search would need
+    more than MAX_CANDIDATES partial transformations at once, which happens
+    on boards with few givens or much symmetry, and on most 25x25 boards, if
+    <grid> has a letter which is not available on the board, or if its
+    subsquares are not square.
+
+    @type grid: list[list[str]]
+    @rtype: (str, Transform)
+
+    >>> grid = [['', '', '', 'A'], ['D', '', 'B', ''], ['C', '', '', ''], ['', 'B', '', 'D']]
+    >>> key, transform = canonical_form(grid)
+    >>> key
+    'A.B..C...B.A..D.'
+    >>> transform.apply(grid)[0]
+    ['A', '', 'B', '']
+    >>> transform.invert(transform.apply(grid)) == grid
+    True
+
+    The same board, transposed, with two pairs of rows swapped and the letters relabelled:
+
+    >>> canonical_form([['', '', '', 'A'], ['', 'C', 'D', ''], ['B', '', '', 'C'], ['', 'A', '', '']])[0] == key
+    True
+    """
+    n = len(grid)
+    m = int(sqrt(n))
+    if m * m != n:
+        raise ValueError('only boards with square subsquares have a canonical form')
+    blank = n + 1
+    for row in grid:
+        for letter in row:
+            if letter and letter not in CHARS[:n]:
+                raise ValueError(letter + ' is not a letter of a ' + str(n) + '-by-' + str(n) + ' board')
+    boards = []
+    for board in (grid, [list(column) for column in zip(*grid)]):
+        boards.append([[CHARS.index(letter) + 1 if letter else 0 for letter in row] for row in board])
+
+    # A candidate is a partial transformation: (board, rows, cols, labels, next label).
+    # labels maps the letter numbers of the board to the letter numbers of the canonical board.
+    candidates = [(b, (r, ), (), {}, 1) for b in range(2) for r in range(n)]
+
+    # The first row also fixes the order of the columns, one column at a time.
+    for j in range(n):
+        best = None
+        extended = []
+        for b, rows, cols, labels, next_label in candidates:
+            if j % m == 0:
+                used = {c // m for c in cols}
+                choices = [c for c in range(n) if c // m not in used]
+            else:
+                stack = cols[j - j % m] // m
+                choices = [c for c in range(stack * m, stack * m + m) if c not in cols]
+            row = boards[b][rows[0]]
+            for c in choices:
+                value = row[c]
+                if value == 0:
+                    symbol, new_labels, new_next = blank, labels, next_label
+                elif value in labels:
+                    symbol, new_labels, new_next = labels[value], labels, next_label
+                else:
+                    symbol, new_next = next_label, next_label + 1
+                    new_labels = dict(labels)
+                    new_labels[value] = symbol
+                if best is None or symbol < best:
+                    best = symbol
+                    extended = []
+                if symbol == best:
+                    extended.append((b, rows, cols + (c, ), new_labels, new_next))
+                    _check_size(extended)
+        candidates = extended
+    key = [_first_row(candidates, boards, blank)]
+
+    # Every other row is chosen whole.
+    for i in range(1, n):
+        best = None
+        extended = []
+        for b, rows, cols, labels, next_label in candidates:
+            if i % m == 0:
+                used = {r // m for r in rows}
+                choices = [r for r in range(n) if r // m not in used]
+            else:
+                band = rows[i - i % m] // m
+                choices = [r for r in range(band * m, band * m + m) if r not in rows]
+            board = boards[b]
+            for r in choices:
+                row = board[r]
+                new_labels, new_next = labels, next_label
+                symbols = []
+                for c in cols:
+                    value = row[c]
+                    if value == 0:
+                        symbols.append(blank)
+                    elif value in new_labels:
+                        symbols.append(new_labels[value])
+                    else:
+                        if new_labels is labels:
+                            new_labels = dict(labels)
+                        new_labels[value] = new_next
+                        symbols.append(new_next)
+                        new_next += 1
+                if best is None or symbols < best:
+                    best = symbols
+                    extended = []
+                if symbols == best:
+                    extended.append((b, rows + (r, ), cols, new_labels, new_next))
+                    _check_size(extended)
+        candidates = extended
+        key.append(best)
+
+    b, rows, cols, labels, _ = candidates[0]
+    letters = {CHARS[value - 1]: CHARS[label - 1] for value, label in labels.items()}
+    text = ''.join(CHARS[symbol - 1] if symbol != blank else '.' for row in key for symbol in row)
+    return text, Transform(b == 1, rows, cols, letters)
+
+
+def _first_row(candidates, boards, blank):
+    """Return the first row of the canonical board, as the candidates left after choosing the columns give it.
+
+    @type candidates: list[(int, tuple[int], tuple[int], dict[int, int], int)]
+    @type boards: list[list[list[int]]]
+    @type blank: int
+    @rtype: list[int]
+    """
+    b, rows, cols, labels, _ = candidates[0]
+    row = boards[b][rows[0]]
+    return [labels[row[c]] if row[c] else blank for c in cols]
+
+
+def _check_size(candidates):
+    """Raise a ValueError if there are more than MAX_CANDIDATES candidates.
+
+    @type candidates: list
+    @rtype: None
+    """
+    if len(candidates) > MAX_CANDIDATES:
+        raise ValueError('the board is too symmetric to find its canonical form')
+
+
+class SolutionCache:
+    """Solutions of Sudoku boards, each saved once for its whole symmetry class.
+
+    === Public attributes ===
+    @type hits: int
+        The number of boards solved from the cache.
+    @type misses: int
+        The number of boards which had to be searched.
+    """
+    # === Private attributes ===
+    # @type _solutions: dict[str, list[list[str]] | None]
+    #     Maps the canonical key of every board solved to the solution of its canonical board, or None if it has none.
+    def __init__(self):
+        """Create an empty cache.
+
+        @type self: SolutionCache
+        @rtype: None
+        """
+        self._solutions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, puzzle):
+        """Return a solution of the Sudoku puzzle, or None if it has none, reusing the solution of any equivalent board.
+
+        Boards without a canonical form, including boards of any other shape
+        than the default one, are solved without the cache.
+
+        @type self: SolutionCache
+        @type puzzle: SudokuPuzzle
+        @rtype: SudokuPuzzle | None
+
+        >>> cache = SolutionCache()
+        >>> print(cache.solve(SudokuPuzzle([['', '', '', 'A'], ['D', '', 'B', ''], ['C', '', '', ''], ['', 'B', '', 'D']])))
+          01|23
+         ------
+        0|BC|DA
+        1|DA|BC
+         ------
+        2|CD|AB
+        3|AB|CD
+        <BLANKLINE>
+        >>> cache.solve(SudokuPuzzle([['', '', '', 'A'], ['', 'C', 'D', ''], ['B', '', '', 'C'], ['', 'A', '', '']])).key()
+        'DBCAACDBBDACCABD'
+        >>> cache.hits, cache.misses
+        (1, 1)
+        """
+        grid = puzzle.grid()
+        try:
+            if puzzle.geometry().spec:
+                raise ValueError('only boards of the default shape have a canonical form')
+            key, transform = canonical_form(grid)
+        except ValueError:
+            self.misses += 1
+            return solve(puzzle)
+        if key in self._solutions:
+            self.hits += 1
+        else:
+            self.misses += 1
+            solution = solve(SudokuPuzzle(transform.apply(grid)))
+            self._solutions[key] = solution.grid() if solution is not None else None
+        if self._solutions[key] is None:
+            return None
+        return SudokuPuzzle(transform.invert(self._solutions[key]))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
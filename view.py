@@ -2,10 +2,8 @@
 This module contains three classes responsible for displaying information
 to the user and reacting to user actions.
 """
-# Extra imports to run a web-based view
-import http.server
-import socketserver
-from urllib.parse import parse_qs, urlparse
+from puzzle import puzzle_type
+import time
 
 
 class View:
@@ -76,11 +74,25 @@ class WebView(View):
     3. Open a web browser, and type in 'localhost:8000' in the URL bar.
     4. Enjoy!
     """
-    def __init__(self, controller):
+    # === Private attributes ===
+    # @type _port: int
+    #     The port the server listens on, or 0 to let the system pick a free one.
+    # @type _ready: (int) -> None | None
+    #     Called with the port the server listens on, once it accepts connections.
+    def __init__(self, controller, port=8000, ready=None):
         View.__init__(self, controller)
+        self._port = port
+        self._ready = ready
 
     def run(self):
         """Start the game with a web view."""
+        # Imported here so that text games start without loading the HTTP stack.
+        import html
+        import http.server
+        import json
+        import socketserver
+        from urllib.parse import parse_qs, urlparse
+
         thisview = self
 
         class GameRequestHandler(http.server.BaseHTTPRequestHandler):
@@ -93,13 +105,22 @@ class WebView(View):
 
             def do_GET(self):
                 """Overridden method for handling GET requests."""
+                if 'events' in self.path:
+                    self.stream_action()
+                    return
+                if urlparse(self.path).path == '/metrics':
+                    self.send_metrics()
+                    return
+                query_params = parse_qs(urlparse(self.path).query)
+                if 'actions' in self.path and query_params.get('format', [''])[0] == 'json':
+                    self.json_action(query_params.get('action', [''])[0])
+                    return
                 self.send_response(200)
                 self.send_header('Content-type', 'text/html')
                 self.end_headers()
                 if 'actions' in self.path:
-                    query_params = parse_qs(urlparse(self.path).query)
                     action = query_params.get('action', [''])[0]
-                    val = self.handle_action(action).replace('\n', '<br>')
+                    val = html.escape(self.handle_action(action)).replace('\n', '<br>')
                     self.wfile.write(bytes(val, 'UTF-8'))
                 else:
                     with open('game.html') as f:
@@ -120,7 +141,147 @@ class WebView(View):
                 else:
                     return ''
 
-        httpd = socketserver.TCPServer(('', 8000), GameRequestHandler)
+            def send_metrics(self):
+                """Answer with the statistics of the actions of the game as JSON, or 404 if profiling is off.
+
+                @type self: GameRequestHandler
+                @rtype: None
+                """
+                stats = thisview._controller.stats()
+                if stats is None:
+                    self.send_error(404, 'Profiling is off')
+                    return
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(bytes(json.dumps(stats.to_dict()), 'UTF-8'))
+
+            def json_action(self, action):
+                """Run <action> and answer in JSON, with the new state in the compact key format of its puzzle type.
+
+                The answer holds the message handle_action would have returned, whether the game is over, and the
+                type and key of the current state, which are much cheaper to send and parse than the rendered text.
+
+                @type self: GameRequestHandler
+                @type action: str
+                @rtype: None
+                """
+                msg = self.handle_action(action)
+                puzzle_name, key = thisview._controller.state_key()
+                body = json.dumps({'message': msg, 'done': GameRequestHandler.done, 'type': puzzle_name, 'key': key})
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(bytes(body, 'UTF-8'))
+
+            def stream_action(self):
+                """Run the action in the query params and push its progress to the client as server-sent events.
+
+                The response stays open while the controller works, so a long search reports the number of states
+                explored, the current depth and every solution as soon as it is found. A final 'done' event carries
+                the same message that handle_action would have returned.
+
+                @type self: GameRequestHandler
+                @rtype: None
+                """
+                self.send_response(200)
+                self.send_header('Content-type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                query_params = parse_qs(urlparse(self.path).query)
+                action = query_params.get('action', [''])[0]
+                stream = _EventStream(self.wfile)
+                try:
+                    if not GameRequestHandler.done:
+                        msg, should_quit = thisview._controller.act(action.strip(), listener=stream)
+                        GameRequestHandler.done = should_quit
+                    else:
+                        msg = ''
+                    stream.send('done', {'nodes': stream.nodes, 'cached': stream.cached, 'message': msg})
+                except (BrokenPipeError, ConnectionResetError):
+                    # The player closed the page; there is nobody left to report to.
+                    pass
+
+        httpd = socketserver.TCPServer(('', self._port), GameRequestHandler)
+        port = httpd.server_address[1]
         print('Server running!')
-        print('Open a web browser and go to "http://localhost:8000"')
+        print('Open a web browser and go to "http://localhost:' + str(port) + '"')
+        if self._ready is not None:
+            self._ready(port)
         httpd.serve_forever()
+
+
+class _EventStream:
+    """Solver listener which writes search progress to an HTTP response as server-sent events.
+
+    Progress events are throttled to one every <interval> seconds, but every
+    solution is sent as soon as the solver reports it.
+    """
+    # === Private attributes ===
+    # @type _wfile: io.BufferedIOBase
+    #     The output stream of the HTTP response.
+    # @type _interval: float
+    #     The minimum number of seconds between two progress events.
+    # @type _last_sent: float
+    #     The time at which the last progress event was sent.
+    # @type _dumps: (object) -> str
+    #     json.dumps, looked up once rather than on every event.
+    # === Public attributes ===
+    # @type nodes: int
+    #     The number of states the solver has explored so far.
+    # @type depth: int
+    #     The depth of the state the solver explored last.
+    # @type cached: bool
+    #     Whether the action was answered from a cache instead of searching.
+    def __init__(self, wfile, interval=0.1):
+        """Create a new event stream writing to <wfile>.
+
+        @type self: _EventStream
+        @type wfile: io.BufferedIOBase
+        @type interval: float
+        @rtype: None
+        """
+        # Imported here, like the HTTP stack, so that text games start without loading it.
+        import json
+        self._wfile = wfile
+        self._interval = interval
+        self._dumps = json.dumps
+        self._last_sent = time.monotonic()
+        self.nodes = 0
+        self.depth = 0
+        self.cached = False
+
+    def __call__(self, event, state, depth):
+        """Record one solver event and push it to the client if it is due.
+
+        @type self: _EventStream
+        @type event: str
+        @type state: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if event == 'expand':
+            self.nodes += 1
+            self.depth = depth
+            now = time.monotonic()
+            if now - self._last_sent >= self._interval:
+                self._last_sent = now
+                self.send('progress', {'nodes': self.nodes, 'depth': depth})
+        elif event == 'solution':
+            self.send('solution', {'nodes': self.nodes, 'depth': depth, 'type': puzzle_type(state).name,
+                                   'key': state.key(), 'text': str(state)})
+        elif event == 'cached':
+            self.cached = True
+            self.send('cached', {'type': puzzle_type(state).name, 'key': state.key()})
+
+    def send(self, event, data):
+        """Write a single server-sent event named <event> with JSON payload <data>.
+
+        @type self: _EventStream
+        @type event: str
+        @type data: dict
+        @rtype: None
+        """
+        message = 'event: ' + event + '\ndata: ' + self._dumps(data) + '\n\n'
+        self._wfile.write(bytes(message, 'UTF-8'))
+        self._wfile.flush()
@@ -0,0 +1,303 @@
+"""Word graph module.
+
+The words of one length form a graph, in which two words are neighbours
+if they differ in exactly one letter: exactly the legal moves of a word
+ladder puzzle. Neighbours are found through an index of *patterns*, which
+are words with one letter replaced by '*'. Two words are neighbours exactly
+when they share a pattern, e.g. 'cat' and 'cot' share 'c*t'.
+
+Words can be added to and removed from a graph in place. The pattern index
+and, once computed, the connected components are updated around the word
+changed rather than rebuilt: adding a word merges the components of its
+neighbours, and removing one only searches its old component for a split.
+"""
+import collections
+
+
+class WordGraph:
+    """The graph of words of the same length that differ in exactly one letter."""
+    # === Private attributes ===
+    # @type _words: set[str]
+    #     The words in the graph.
+    # @type _patterns: dict[str, list[str]]
+    #     Maps every pattern to the words that match it.
+    # @type _components: dict[str, int] | None
+    #     Maps every word to the id of its connected component, or None if
+    #     the components have not been computed yet.
+    # @type _members: list[list[str]]
+    #     The words of every component, indexed by component id. The component of an id merged into another is empty.
+    def __init__(self, words):
+        """Create a new word graph of <words>, which must all have the same length.
+
+        @type self: WordGraph
+        @type words: list[str]
+        @rtype: None
+        """
+        self._words = set(words)
+        self._patterns = {}
+        for word in self._words:
+            for pattern in _patterns(word):
+                self._patterns.setdefault(pattern, []).append(word)
+        self._components = None
+        self._members = []
+
+    def __contains__(self, word):
+        """Return whether <word> is in the graph.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: bool
+        """
+        return word in self._words
+
+    def neighbours(self, word):
+        """Return the sorted list of words which differ from <word> in exactly one letter.
+
+        <word> itself does not need to be in the graph.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: list[str]
+
+        >>> WordGraph(['cat', 'cot', 'cog', 'dog']).neighbours('cot')
+        ['cat', 'cog']
+        """
+        found = set()
+        for pattern in _patterns(word):
+            found.update(self._patterns.get(pattern, ()))
+        found.discard(word)
+        return sorted(found)
+
+    def component(self, word):
+        """Return the id of the connected component of <word>.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: int
+
+        >>> g = WordGraph(['cat', 'cot', 'cog', 'dog', 'emu'])
+        >>> g.component('cat') == g.component('dog')
+        True
+        >>> g.component('cat') == g.component('emu')
+        False
+        """
+        if self._components is None:
+            self._find_components()
+        return self._components[word]
+
+    def components(self):
+        """Return the words of every connected component, largest component first.
+
+        The position of a component in the returned list is not its id.
+
+        @type self: WordGraph
+        @rtype: list[list[str]]
+        """
+        if self._components is None:
+            self._find_components()
+        return sorted([members for members in self._members if members], key=len, reverse=True)
+
+    def add(self, word):
+        """Add <word> to the graph, merging the components it connects.
+
+        The words of the smaller components are relabelled with the id of the
+        largest one. Nothing happens if <word> is already in the graph.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: None
+
+        >>> g = WordGraph(['cat', 'dog'])
+        >>> g.component('cat') == g.component('dog')
+        False
+        >>> g.add('cot')
+        >>> g.add('cog')
+        >>> g.component('cat') == g.component('dog')
+        True
+        """
+        if word in self._words:
+            return
+        self._words.add(word)
+        for pattern in _patterns(word):
+            self._patterns.setdefault(pattern, []).append(word)
+        if self._components is None:
+            return
+        ids = {self._components[neighbour] for neighbour in self.neighbours(word)}
+        if not ids:
+            component = len(self._members)
+            self._members.append([])
+        else:
+            component = max(ids, key=lambda i: len(self._members[i]))
+            for other in ids - {component}:
+                for member in self._members[other]:
+                    self._components[member] = component
+                self._members[component].extend(self._members[other])
+                self._members[other] = []
+        self._components[word] = component
+        self._members[component].append(word)
+
+    def remove(self, word):
+        """Remove <word> from the graph, splitting its component if it was the only link between some of its words.
+
+        Only the old component of <word> is searched, and the search stops as
+        soon as it has found every former neighbour of <word>, which shows
+        that the component is still connected. On a split, the largest part
+        keeps the id of the component. Nothing happens if <word> is not in
+        the graph.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: None
+
+        >>> g = WordGraph(['cat', 'cot', 'cog', 'dog'])
+        >>> g.component('cat') == g.component('dog')
+        True
+        >>> g.remove('cot')
+        >>> g.component('cat') == g.component('dog')
+        False
+        >>> g.neighbours('cat')
+        []
+        """
+        if word not in self._words:
+            return
+        neighbours = self.neighbours(word)
+        self._words.discard(word)
+        for pattern in _patterns(word):
+            words = self._patterns[pattern]
+            words.remove(word)
+            if not words:
+                del self._patterns[pattern]
+        if self._components is None:
+            return
+        component = self._components.pop(word)
+        if not neighbours:
+            self._members[component] = []
+            return
+        first, connected = self._reach(neighbours[0], set(neighbours[1:]))
+        if connected:
+            self._members[component].remove(word)
+            return
+        # The search from the first neighbour ran through its whole part; find the other parts.
+        parts = [first]
+        seen = set(first)
+        for neighbour in neighbours[1:]:
+            if neighbour not in seen:
+                part = self._reach(neighbour)[0]
+                seen.update(part)
+                parts.append(part)
+        parts.sort(key=len, reverse=True)
+        self._members[component] = parts[0]
+        for part in parts[1:]:
+            new_component = len(self._members)
+            self._members.append(part)
+            for member in part:
+                self._components[member] = new_component
+
+    def _reach(self, word, targets=None):
+        """Return the words reachable from <word>, and whether they include all of <targets>.
+
+        If <targets> is given, the search stops early once every word of it
+        has been reached, in which case only some of the reachable words are
+        returned.
+
+        @type self: WordGraph
+        @type word: str
+        @type targets: set[str] | None
+        @rtype: (list[str], bool)
+        """
+        if targets is not None:
+            targets = targets - {word}
+            if not targets:
+                return [word], True
+        found = {word}
+        members = [word]
+        queue = collections.deque([word])
+        while queue and (targets is None or targets):
+            for neighbour in self.neighbours(queue.popleft()):
+                if neighbour not in found:
+                    found.add(neighbour)
+                    members.append(neighbour)
+                    queue.append(neighbour)
+                    if targets is not None:
+                        targets.discard(neighbour)
+        return members, not targets
+
+    def _find_components(self):
+        """Compute the connected component of every word with one breadth-first search per component.
+
+        @type self: WordGraph
+        @rtype: None
+        """
+        self._components = {}
+        self._members = []
+        for word in sorted(self._words):
+            if word not in self._components:
+                component = len(self._members)
+                self._members.append(self._spread(word, component))
+
+    def _spread(self, word, component):
+        """Label every word reachable from <word> with <component> and return the labelled words.
+
+        @type self: WordGraph
+        @type word: str
+        @type component: int
+        @rtype: list[str]
+        """
+        self._components[word] = component
+        members = [word]
+        queue = collections.deque([word])
+        while queue:
+            for neighbour in self.neighbours(queue.popleft()):
+                if neighbour not in self._components:
+                    self._components[neighbour] = component
+                    members.append(neighbour)
+                    queue.append(neighbour)
+        return members
+
+    def distances_from(self, sources):
+        """Return the distance from the nearest word in <sources> to every reachable word, and that nearest source.
+
+        This is a single breadth-first search started from all of <sources> at
+        once. Since every word is reached first from its nearest source, the
+        distance found is also the length of the shortest ladder between the
+        word and the source it is labelled with.
+
+        @type self: WordGraph
+        @type sources: list[str]
+        @rtype: dict[str, (int, str)]
+
+        >>> d = WordGraph(['cat', 'cot', 'cog', 'dog']).distances_from(['cat'])
+        >>> d['dog']
+        (3, 'cat')
+        """
+        found = {}
+        queue = collections.deque()
+        for source in sources:
+            if source not in found:
+                found[source] = (0, source)
+                queue.append(source)
+        while queue:
+            word = queue.popleft()
+            distance, source = found[word]
+            for neighbour in self.neighbours(word):
+                if neighbour not in found:
+                    found[neighbour] = (distance + 1, source)
+                    queue.append(neighbour)
+        return found
+
+
+def _patterns(word):
+    """Return every pattern of <word>, obtained by replacing one of its letters by '*'.
+
+    @type word: str
+    @rtype: list[str]
+
+    >>> _patterns('cat')
+    ['*at', 'c*t', 'ca*']
+    """
+    return [word[:i] + '*' + word[i + 1:] for i in range(len(word))]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,123 @@
+"""Word ladder puzzle generator.
+
+Picks start and target words from one connected component of the word
+graph (see word_graph.py), so that the shortest ladder between them has
+exactly the requested number of moves.
+
+Rather than solving every candidate pair separately, a batch of random
+start words is chosen and a single breadth-first search is run from all of
+them at once. Every word at distance d from its nearest start word forms a
+pair whose shortest ladder has exactly d moves, so one pass over a component
+grades a whole pool of pairs.
+"""
+from word_graph import WordGraph
+from word_ladder_puzzle import WordLadderPuzzle, load_words, on_dictionary_change
+import random
+
+# Maps a word length to the WordGraph of all dictionary words of that length.
+_graphs = {}
+
+
+def word_graph(length):
+    """Return the word graph of all dictionary words with <length> letters.
+
+    The graph is only built once per length.
+
+    @type length: int
+    @rtype: WordGraph
+    """
+    if length not in _graphs:
+        _graphs[length] = WordGraph(load_words(length)[0])
+    return _graphs[length]
+
+
+def _update_graphs(added, removed):
+    """Apply a change to the dictionary to the word graphs already built.
+
+    @type added: list[str]
+    @type removed: list[str]
+    @rtype: None
+    """
+    for word in added:
+        if len(word) in _graphs:
+            _graphs[len(word)].add(word)
+    for word in removed:
+        if len(word) in _graphs:
+            _graphs[len(word)].remove(word)
+
+
+on_dictionary_change(_update_graphs)
+
+
+def generate_pairs(length, moves, count, component=0, rng=random, sources=None):
+    """Return up to <count> (start, target) pairs of <length>-letter words whose shortest ladder has <moves> moves.
+
+    The words are taken from the <component>-th largest connected component
+    of the word graph. Fewer than <count> pairs are returned only if that
+    component has fewer pairs at that distance from the start words tried.
+    <sources> is the number of start words searched from at once; by default
+    enough to make one pass over the component likely to produce <count> pairs.
+
+    @type length: int
+    @type moves: int
+    @type count: int
+    @type component: int
+    @type rng: random.Random
+    @type sources: int | None
+    @rtype: list[(str, str)]
+
+    >>> pairs = generate_pairs(3, 4, 5, rng=random.Random(0))
+    >>> len(pairs)
+    5
+    >>> start, target = pairs[0]
+    >>> word_graph(3).distances_from([start])[target][0]
+    4
+    """
+    if moves < 1:
+        raise ValueError('a word ladder needs at least one move')
+    components = word_graph(length).components()
+    if component >= len(components):
+        raise ValueError('there are only ' + str(len(components)) + ' components of ' + str(length) + '-letter words')
+    words = components[component]
+    if sources is None:
+        sources = min(len(words), 2 * count)
+
+    distances = word_graph(length).distances_from(rng.sample(words, sources))
+    pairs = [(source, word) for word, (distance, source) in distances.items() if distance == moves]
+    pairs.sort()
+    rng.shuffle(pairs)
+    # Spread the pairs over as many start words as possible.
+    used = {}
+    ranked = []
+    for source, word in pairs:
+        used[source] = used.get(source, 0) + 1
+        ranked.append((used[source], source, word))
+    ranked.sort(key=lambda item: item[0])
+    return [(source, word) for _, source, word in ranked[:count]]
+
+
+def generate(length, moves, count, component=0, rng=random):
+    """Return up to <count> word ladder puzzles of <length>-letter words whose shortest solution has <moves> moves.
+
+    @type length: int
+    @type moves: int
+    @type count: int
+    @type component: int
+    @type rng: random.Random
+    @rtype: list[WordLadderPuzzle]
+    """
+    return [WordLadderPuzzle(start, target)
+            for start, target in generate_pairs(length, moves, count, component, rng)]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    # Write a pool of pairs: python word_ladder_generator.py <length> <moves> <count> [<seed>]
+    import sys
+    if len(sys.argv) >= 4:
+        seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        for start_word, target_word in generate_pairs(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]),
+                                                      rng=random.Random(seed)):
+            print(start_word + '\t' + target_word)
@@ -23,18 +23,148 @@ Example:
         cure
 
 """
-from puzzle import Puzzle
+from puzzle import Puzzle, register
+import bisect
+import json
+import threading
 
 
 CHARS = 'abcdefghijklmnopqrstuvwyz'
+# Every character used in wordsEn.txt, which are the letters a new word can differ by.
+_LETTERS = "'abcdefghijklmnopqrstuvwxyz"
+
+# The dictionary file every word list is read from.
+WORDS_FILE = 'wordsEn.txt'
+
+# Every word in WORDS_FILE, once the file has been read.
+_all_words = []
+# Maps a word length to the (sorted list, set) of dictionary words of that length.
+_dictionary = {}
+# The functions called with the (added, removed) words after every change to the dictionary.
+_dictionary_listeners = []
+# Serializes changes to the dictionary; reading it needs no lock.
+_dictionary_lock = threading.Lock()
+
+
+def load_words(length):
+    """Return the list and the set of all words in wordsEn.txt with <length> characters.
+
+    The file is only read the first time a word list is needed, and only once;
+    every puzzle with the same word length shares the result.
+
+    @type length: int
+    @rtype: (list[str], set[str])
+    """
+    if length not in _dictionary:
+        if not _all_words:
+            with open(WORDS_FILE) as wordfile:
+                _all_words.extend(wordfile.read().split())
+        words = [word for word in _all_words if len(word) == length]
+        _dictionary[length] = words, set(words)
+    return _dictionary[length]
+
+
+def on_dictionary_change(listener):
+    """Call <listener> with the lists of words added and removed after every change to the dictionary.
+
+    @type listener: (list[str], list[str]) -> None
+    @rtype: None
+    """
+    _dictionary_listeners.append(listener)
+
+
+def add_words(words):
+    """Add <words> to the loaded dictionary, so that every puzzle can use them at once.
+
+    The word lists are updated in place; the file is not changed. Return the words which were not in the dictionary yet.
+
+    @type words: list[str]
+    @rtype: list[str]
+
+    >>> add_words(['zzt'])
+    ['zzt']
+    >>> WordLadderPuzzle('zzz', 'cat').neighbours('zzz')
+    ['zzt']
+    >>> remove_words(['zzt'])
+    ['zzt']
+    >>> WordLadderPuzzle('zzz', 'cat').neighbours('zzz')
+    []
+    """
+    return _change_words(words, [])[0]
+
+
+def remove_words(words):
+    """Remove <words> from the loaded dictionary, as add_words adds them. Return the words which were removed.
+
+    @type words: list[str]
+    @rtype: list[str]
+    """
+    return _change_words([], words)[1]
+
+
+def reload_words():
+    """Read WORDS_FILE again and apply the words added to and removed from it to the loaded dictionary.
+
+    Return the words added and removed. Nothing is read if the dictionary
+    has not been loaded yet, since it is then read in full when first needed.
+    The file is read without the lock, but the loaded words are compared with
+    it under the lock, so that no other change is lost in between.
+
+    @rtype: (list[str], list[str])
+    """
+    if not _all_words:
+        return [], []
+    with open(WORDS_FILE) as wordfile:
+        words = set(wordfile.read().split())
+    with _dictionary_lock:
+        old_words = set(_all_words)
+        return _apply_changes(sorted(words - old_words), sorted(old_words - words))
+
+
+def _change_words(added, removed):
+    """Add the words <added> to and remove the words <removed> from the loaded dictionary, and tell the listeners.
+
+    Return the words actually added and removed.
+
+    @type added: list[str]
+    @type removed: list[str]
+    @rtype: (list[str], list[str])
+    """
+    with _dictionary_lock:
+        return _apply_changes(added, removed)
+
+
+def _apply_changes(added, removed):
+    """Make the changes of _change_words. _dictionary_lock must be held.
+
+    @type added: list[str]
+    @type removed: list[str]
+    @rtype: (list[str], list[str])
+    """
+    added = [word for word in dict.fromkeys(added) if word not in load_words(len(word))[1]]
+    removed = [word for word in dict.fromkeys(removed) if word in load_words(len(word))[1]]
+    for word in added:
+        word_list, word_set = _dictionary[len(word)]
+        bisect.insort(word_list, word)
+        word_set.add(word)
+        _all_words.append(word)
+    for word in removed:
+        word_list, word_set = _dictionary[len(word)]
+        word_set.discard(word)
+        del word_list[bisect.bisect_left(word_list, word)]
+    if removed:
+        gone = set(removed)
+        _all_words[:] = [word for word in _all_words if word not in gone]
+    if added or removed:
+        for listener in _dictionary_listeners:
+            listener(added, removed)
+    return added, removed
 
 
 class WordLadderPuzzle(Puzzle):
     """A word ladder puzzle."""
 
     # === Private attributes ===
-    # @type _words: list[str]
-    #     List of allowed English words.
     # @type _start: str
     #     The starting word of this puzzle. Every character of the starting word must be a lowercase letter.
     # @type _target: str
@@ -55,12 +185,6 @@ class WordLadderPuzzle(Puzzle):
         @type used_words: tuple
         @rtype: None
         """
-        # Code to initialize _words - you don't need to change this.
-        self._words = []
-        with open('wordsEn.txt') as wordfile:
-            for line in wordfile:
-                if len(line.strip()) == len(start):
-                    self._words.append(line.strip())
         self._start = start
         self._target = target
         self._used_words = used_words + (start, )
@@ -73,16 +197,12 @@ class WordLadderPuzzle(Puzzle):
         @rtype: str
             A string representation of the word ladder.
         >>> w = WordLadderPuzzle('house', 'party', ('mouse', ))
-        >>> str(w)
+        >>> print(w)  # doctest: +NORMALIZE_WHITESPACE
         word chain:
-        house -> mouse
+        mouse -> house
         target word: party
         """
-        s = 'word chain: ' + '\n'
-        for word in self._used_words[:-1]:
-            s += word + ' -> '
-        s += self._used_words[-1] + '\ntarget word: ' + self._target
-        return s
+        return 'word chain: \n' + ' -> '.join(self._used_words) + '\ntarget word: ' + self._target
 
     def is_solved(self):
         """Return whether <self> is solved.
@@ -105,8 +225,8 @@ class WordLadderPuzzle(Puzzle):
         """Return a list of possible new states after a valid move.
 
         The valid move must change exactly one character of the
-        current word, and must result in an English word stored in
-        self._words.
+        current word, and must result in an English word listed in
+        wordsEn.txt.
 
         You should *not* perform any moves which produce a word
         that is already in the ladder.
@@ -117,11 +237,27 @@ class WordLadderPuzzle(Puzzle):
         @type self: WordLadderPuzzle
         @rtype: list[WordLadderPuzzle]
         """
-        new_words = self._possible_words()
-        new_states = []
-        for word in new_words:
-            new_states.append(self._extend(word))
-        return new_states
+        return list(self.iter_extensions())
+
+    def possible_moves(self):
+        """Yield the new words of extensions in alphabetical order, without building any state.
+
+        @type self: WordLadderPuzzle
+        @rtype: iterator[str]
+
+        >>> list(WordLadderPuzzle('cat', 'dog', ('bat', )).possible_moves())[:4]
+        ['cab', 'cad', 'cal', 'cam']
+        """
+        return iter(self._possible_words())
+
+    def apply_move(self, move):
+        """Return the new puzzle state after changing the current word to <move>, a word of possible_moves.
+
+        @type self: WordLadderPuzzle
+        @type move: str
+        @rtype: WordLadderPuzzle
+        """
+        return self._extend(move)
 
     def _possible_words(self):
         """Return a list of possible new words in alphabetical order by changing one letter of the current word.
@@ -130,14 +266,30 @@ class WordLadderPuzzle(Puzzle):
         @rtype: List[str]
             The list of possible words.
         """
-        new_words = []
-        for word in self._words:
-            if word not in (self._used_words + tuple(self._tried_words)):
-                for i in range(len(self._start)):
-                    if word[:i] + word[i+1:] == self._start[:i] + self._start[i+1:]:
-                        new_words.append(word)
-        new_words.sort()
-        return new_words
+        return [word for word in self.neighbours(self._start) if word not in self._tried_words]
+
+    def neighbours(self, word):
+        """Return, in alphabetical order, the dictionary words one letter away from <word> which are not in the ladder.
+
+        <word> need not be the current word, so that a search can explore
+        the words around the ladder without building a puzzle for each.
+
+        @type self: WordLadderPuzzle
+        @type word: str
+        @rtype: list[str]
+
+        >>> WordLadderPuzzle('cot', 'dog', ('cat', )).neighbours('cat')[:4]
+        ['bat', 'cab', 'cad', 'cal']
+        """
+        word_set = load_words(len(word))[1]
+        new_words = set()
+        for i in range(len(word)):
+            prefix, suffix = word[:i], word[i + 1:]
+            for letter in _LETTERS:
+                new_word = prefix + letter + suffix
+                if new_word != word and new_word in word_set and new_word not in self._used_words:
+                    new_words.add(new_word)
+        return sorted(new_words)
 
     def _extend(self, word):
         """Return a new Word Ladder Puzzle obtained after changing the current word to <word>.
@@ -148,7 +300,7 @@ class WordLadderPuzzle(Puzzle):
         @rtype: WordLadderPuzzle
             The new word ladder puzzle.
         """
-        return WordLadderPuzzle(word, self._target, self._used_words)
+        return type(self)(word, self._target, self._used_words)
 
     def move(self, move):
         """Return a new Word Ladder Puzzle specified by making the given move.
@@ -159,13 +311,62 @@ class WordLadderPuzzle(Puzzle):
         @type self: WordLadderPuzzle
         @type move: str
         @rtype: WordLadderPuzzlePuzzle
+
+        >>> w = WordLadderPuzzle('cat', 'dog')
+        >>> w.move('cot').start_word()
+        'cot'
+        >>> w.move('cog')
+        Traceback (most recent call last):
+        ...
+        ValueError: cog is not a one-letter change from cat
         """
-        possible_words = self._possible_words()
-        if move not in possible_words:
-            raise ValueError
+        move = self.parse_move(move)[0]
+        if not self._is_possible_word(move):
+            raise ValueError(move + ' is not a one-letter change from ' + self._start)
         else:
             return self._extend(move)
 
+    def parse_move(self, move):
+        """Return the word of a move, which is written as the word itself.
+
+        Raise a ValueError if <move> is not a word of lowercase letters and
+        apostrophes, the characters of the dictionary. The move is not checked
+        against the puzzle.
+
+        @type self: WordLadderPuzzle
+        @type move: str
+        @rtype: (str)
+
+        >>> WordLadderPuzzle('cat', 'dog').parse_move(' cot ')
+        ('cot',)
+        >>> WordLadderPuzzle('weave', "we're").move("we've").start_word()
+        "we've"
+        """
+        word = move.strip()
+        if not word or any(letter not in _LETTERS for letter in word):
+            raise ValueError('moves are written as a lowercase word')
+        return word,
+
+    def _is_possible_word(self, word):
+        """Return whether <word> is one of the words _possible_words would return.
+
+        Only <word> itself is checked, instead of building the whole list of
+        possible words.
+
+        @type self: WordLadderPuzzle
+        @type word: str
+        @rtype: bool
+        """
+        if len(word) != len(self._start) or word not in load_words(len(word))[1]:
+            return False
+        if word in self._used_words or word in self._tried_words:
+            return False
+        differences = 0
+        for i in range(len(word)):
+            if word[i] != self._start[i]:
+                differences += 1
+        return differences == 1
+
     def generate_strings(self, new_puzzle):
         """Return a string representation of the move the user should make to get from <self> to <new_puzzle>.
 
@@ -203,3 +404,81 @@ class WordLadderPuzzle(Puzzle):
         @rtype: str
         """
         return self._start
+
+    def target_word(self):
+        """Returns the target word of this puzzle.
+
+        @type self: WordLadderPuzzle
+        @rtype: str
+        """
+        return self._target
+
+    def position(self):
+        """Return the current word and the target word, which is all a search needs to know about this state.
+
+        Two states with the same current word have the same shortest ladders
+        to the target, except for words already in their ladders, so a
+        breadth-first search only needs the first of them.
+
+        @type self: WordLadderPuzzle
+        @rtype: str
+
+        >>> WordLadderPuzzle('cot', 'dog', ('cat', )).position()
+        'cot dog'
+        """
+        return self._start + ' ' + self._target
+
+    def estimate(self):
+        """Return the number of letters of the current word which differ from the target word.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+
+        >>> WordLadderPuzzle('cat', 'dog').estimate(), WordLadderPuzzle('cat', 'coast').estimate()
+        (3, 4)
+        """
+        return sum(1 for a, b in zip(self._start, self._target) if a != b) + abs(len(self._start) - len(self._target))
+
+    def key(self):
+        """Return the word chain and the target word of this puzzle, written as JSON.
+
+        @type self: WordLadderPuzzle
+        @rtype: str
+
+        >>> WordLadderPuzzle('cot', 'dog', ('cat', )).key()
+        '[["cat", "cot"], "dog"]'
+        """
+        return json.dumps([list(self._used_words), self._target])
+
+    @classmethod
+    def from_key(cls, key):
+        """Return the word ladder puzzle whose word chain and target word are written as JSON in <key>.
+
+        @type cls: type
+        @type key: str
+        @rtype: WordLadderPuzzle
+
+        >>> WordLadderPuzzle.from_key('[["cat", "cot"], "dog"]').used_words()
+        ('cat', 'cot')
+        """
+        chain, target = json.loads(key)
+        return cls(chain[-1], target, tuple(chain[:-1]))
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Return the word ladder puzzle from spec['start'] to spec['target'], or the one with key spec['key'].
+
+        @type cls: type
+        @type spec: dict
+        @rtype: WordLadderPuzzle
+
+        >>> WordLadderPuzzle.from_spec({'type': 'word ladder', 'start': 'cat', 'target': 'dog'}).key()
+        '[["cat"], "dog"]'
+        """
+        if 'key' in spec:
+            return cls.from_key(spec['key'])
+        return cls(spec['start'], spec['target'])
+
+
+register(WordLadderPuzzle, 'word ladder', solve='breadth', solve_all='shortest ladders', hint='breadth',
+         count='shortest ladders')